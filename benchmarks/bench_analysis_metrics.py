@@ -0,0 +1,111 @@
+"""Analysis metrics benchmark
+
+Generates synthetic trusted users/videos/events at several scales in DuckDB and
+times each AnalysisMetrics metric (Q1 first-session watch, Q2 genre retention,
+Q3 device drop-off) two ways:
+
+- shared: the first-session temp tables are built once and every metric reuses them
+- recomputed: the temp tables are rebuilt before every metric, as each notebook
+  query recomputed its own first-sessions CTE
+
+    python benchmarks/bench_analysis_metrics.py --users 1000 10000 100000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from loguru import logger  # noqa: E402
+
+from src.analytics.metrics import AnalysisMetrics  # noqa: E402
+from src.connect.duckdb_client import DuckDBClient  # noqa: E402
+
+GENRES = ['Comedy', 'Drama', 'Action', 'Documentary', 'Kids']
+DEVICE_OS = ['iOS', 'Android', 'Web']
+APP_VERSIONS = ['2.0.0', '2.0.1', '2.1.0', '2.2.0']
+METRICS = {
+    'Q1 first_session_watch': lambda m: m.first_session_watch(30),
+    'Q2 genre_retention': lambda m: m.genre_retention(3),
+    'Q3 device_dropoff': lambda m: m.device_dropoff(5),
+}
+
+
+def generate(duckdb: DuckDBClient, users: int, videos: int = 2000, seed: float = 0.42) -> int:
+    """Create trusted_users/videos/events for `users` users over 4 ingestion dates; returns event rows"""
+    duckdb.execute_query(f"SELECT setseed({seed})")
+    duckdb.execute_query(f"""
+        CREATE OR REPLACE TABLE trusted_users AS
+        SELECT 'user_' || i AS user_id, '2025-09-09' AS ingestion_date FROM range({users}) t(i)
+    """)
+    duckdb.execute_query(f"""
+        CREATE OR REPLACE TABLE trusted_videos AS
+        SELECT 'video_' || i AS video_id, {GENRES}[1 + i % {len(GENRES)}] AS genre,
+               '2025-09-09' AS ingestion_date
+        FROM range({videos}) t(i)
+    """)
+    # Per user 1-4 active days with 1-3 sessions each, ~12 events per session
+    duckdb.execute_query(f"""
+        CREATE OR REPLACE TABLE trusted_events AS
+        WITH sessions AS (
+            SELECT
+                u.i AS user_index, d.day, s.sub,
+                {DEVICE_OS}[1 + CAST(hash(u.i) % {len(DEVICE_OS)} AS BIGINT)] AS device_os,
+                {APP_VERSIONS}[1 + CAST(hash(u.i * 7) % {len(APP_VERSIONS)} AS BIGINT)] AS app_version
+            FROM range({users}) u(i), range(4) d(day), range(3) s(sub)
+            WHERE d.day = 0 AND s.sub = 0 OR random() < 0.25
+        )
+        SELECT
+            TIMESTAMP '2025-09-09 08:00:00' + to_days(CAST(day AS INTEGER))
+                + to_minutes(CAST(sub * 90 + e.n AS INTEGER)) AS "timestamp",
+            'user_' || user_index AS user_id,
+            'user_' || user_index || '_sess_' || day || '_' || sub AS session_id,
+            CASE WHEN random() < 0.6 THEN 'watch_time' ELSE 'click' END AS event_name,
+            round(random() * 10, 1) AS value,
+            'video_' || CAST(floor(random() * {videos}) AS INTEGER) AS video_id,
+            device_os,
+            app_version,
+            strftime(DATE '2025-09-09' + CAST(day AS INTEGER), '%Y-%m-%d') AS ingestion_date
+        FROM sessions, range(12) e(n)
+    """)
+    return duckdb.execute_query("SELECT COUNT(*) FROM trusted_events").fetchone()[0]
+
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Q1/Q2/Q3 analysis metrics")
+    parser.add_argument("--users", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="User counts to generate (default: 1000 10000 100000)")
+    args = parser.parse_args()
+    logger.remove()
+
+    print(f"{'users':>8} {'events':>11} {'metric':<24} {'shared':>9} {'recomputed':>11}")
+    for users in args.users:
+        duckdb = DuckDBClient()
+        events = generate(duckdb, users)
+        metrics = AnalysisMetrics(duckdb)
+
+        build_seconds = timed(metrics.materialize)
+        shared = {name: timed(lambda: fn(metrics)) for name, fn in METRICS.items()}
+        recomputed = {}
+        for name, fn in METRICS.items():
+            metrics.refresh()
+            recomputed[name] = timed(lambda: fn(metrics))
+
+        print(f"{users:>8,} {events:>11,} {'first-session tables':<24} {build_seconds:>8.3f}s {'':>11}")
+        for name in METRICS:
+            print(f"{'':>8} {'':>11} {name:<24} {shared[name]:>8.3f}s {recomputed[name]:>10.3f}s")
+        print(f"{'':>8} {'':>11} {'all metrics':<24} {build_seconds + sum(shared.values()):>8.3f}s "
+              f"{sum(recomputed.values()):>10.3f}s")
+        duckdb.close()
+
+
+if __name__ == "__main__":
+    main()
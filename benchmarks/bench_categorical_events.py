@@ -0,0 +1,80 @@
+"""Categorical events columns benchmark
+
+Decodes one events file with the low-cardinality columns as Python strings (the
+old frames) and as categoricals (dictionary_columns), then reports frame memory
+and the time of a pandas group-by on device_os/app_version. Both frames are
+then loaded into DuckDB tables, as setup_trusted_tables_from_parquet does
+(categoricals become ENUM columns, strings VARCHAR), and grouped there.
+
+    python benchmarks/bench_categorical_events.py --rows 2000000
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from loguru import logger  # noqa: E402
+
+from bench_raw_compression import generate_events  # noqa: E402
+from src.connect.duckdb_client import DuckDBClient  # noqa: E402
+from src.utils.jsonl_parser import decode_lines  # noqa: E402
+from src.utils.schema_registry import get_table_categorical_cols  # noqa: E402
+
+GROUP_COLS = ['device_os', 'app_version']
+REPEATS = 5
+
+
+def best_of(fn) -> float:
+    """Fastest of REPEATS runs, in seconds"""
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark categorical events columns")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic event rows (default: 1000000)")
+    args = parser.parse_args()
+    logger.remove()
+
+    categorical_cols = get_table_categorical_cols('trusted_events')
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "events.jsonl"
+        generate_events(source, args.rows)
+        data = source.read_bytes()
+
+        frames = {
+            'object': decode_lines(data).to_pandas(),
+            'category': decode_lines(data, categorical_cols).to_pandas(),
+        }
+        columns = [col for col in categorical_cols if col in frames['object'].columns]
+        print(f"{args.rows:,} events, categorical columns: {', '.join(columns)}")
+        print(f"{'pandas':<10} {'frame MB':>9} {'columns MB':>11} {'group-by':>9}")
+        for name, df in frames.items():
+            frame_mb = df.memory_usage(deep=True, index=False).sum() / 1e6
+            columns_mb = df[columns].memory_usage(deep=True, index=False).sum() / 1e6
+            seconds = best_of(lambda: df.groupby(GROUP_COLS, observed=True)['watch_time_sec'].agg(['count', 'mean']))
+            print(f"{name:<10} {frame_mb:>9.1f} {columns_mb:>11.1f} {seconds * 1000:>7.1f}ms")
+
+    duckdb = DuckDBClient()
+    print(f"{'duckdb':<10} {'group-by':>9}")
+    for name, df in frames.items():
+        duckdb.conn.register('events_df', df)
+        duckdb.execute_query("CREATE OR REPLACE TABLE events AS SELECT * FROM events_df")
+        duckdb.conn.unregister('events_df')
+        column_type = duckdb.execute_query(f"SELECT typeof({GROUP_COLS[0]}) FROM events LIMIT 1").fetchone()[0]
+        group_sql = f"SELECT {', '.join(GROUP_COLS)}, COUNT(*), AVG(watch_time_sec) FROM events GROUP BY ALL"
+        seconds = best_of(lambda: duckdb.execute_query(group_sql).fetchall())
+        print(f"{column_type.split('(')[0]:<10} {seconds * 1000:>7.1f}ms")
+    duckdb.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Events JSONL decoding benchmark
+
+Decodes one events file the way the trusted stage used to (json.loads per line
+into pandas), in-process with the fast decoder, and with ParallelJsonlParser at
+increasing worker counts, and reports rows/s and the speedup over the baseline.
+Worker counts above the machine's CPU count cannot scale.
+
+    python benchmarks/bench_jsonl_parse.py --rows 2000000 --workers 1 2 4 8
+    python benchmarks/bench_jsonl_parse.py --source landing/events_2025-09-09.jsonl --unordered
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+import pandas as pd  # noqa: E402
+
+from bench_raw_compression import generate_events  # noqa: E402
+from src.utils.jsonl_parser import ParallelJsonlParser, decode_lines, loads  # noqa: E402
+
+
+def timed(fn):
+    started = time.perf_counter()
+    rows = fn()
+    return rows, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark events JSONL decoding")
+    parser.add_argument("--source", type=str, help="JSONL file to decode (default: synthetic events)")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic event rows (default: 1000000)")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+                        help="Worker counts to try (default: 1 2 4 and the CPU count)")
+    parser.add_argument("--unordered", action="store_true", help="Take ranges as they finish")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(args.source) if args.source else Path(tmp) / "events.jsonl"
+        if not args.source:
+            generate_events(source, args.rows)
+        data = source.read_bytes()
+
+    print(f"{len(data) / 1e6:.0f} MB, {os.cpu_count()} CPUs, decoder: {loads.__module__}")
+    results = [
+        ("json.loads + DataFrame",
+         timed(lambda: len(pd.DataFrame([json.loads(line) for line in data.splitlines() if line.strip()])))),
+        ("in-process", timed(lambda: decode_lines(data).to_pandas().shape[0])),
+    ]
+    for workers in args.workers:
+        pool = ParallelJsonlParser(workers=workers, ordered=not args.unordered, min_parallel_bytes=0)
+        results.append((f"{workers} workers",
+                        timed(lambda: pool.read_table(io.BytesIO(data), len(data)).to_pandas().shape[0])))
+
+    baseline = results[0][1][1]
+    print(f"{'parser':<24} {'rows':>10} {'seconds':>8} {'rows/s':>12} {'speedup':>8}")
+    for name, (rows, seconds) in results:
+        print(f"{name:<24} {rows:>10,} {seconds:>8.2f} {rows / seconds:>12,.0f} {baseline / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Raw-layer compression benchmark
+
+Compresses a JSONL events file with each raw codec the way to_raw --raw_compression
+does (streaming, chunk by chunk), reads it back the way the trusted stage does
+(streaming decompression + JSON parsing), and reports stored bytes and wall time.
+The transfer column adds the time to move the stored bytes at --network_mbps, to
+show where compression pays for itself.
+
+    python benchmarks/bench_raw_compression.py --rows 500000 --network_mbps 1000
+    python benchmarks/bench_raw_compression.py --source landing/events_2025-09-09.jsonl
+"""
+import argparse
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+from src.utils.compression import CompressingReader, open_decompressed  # noqa: E402
+
+EVENT_NAMES = ["app_open", "video_start", "video_pause", "video_complete", "app_close"]
+DEVICE_OS = ["iOS", "Android", "Web"]
+
+
+def generate_events(path: Path, rows: int, seed: int = 42) -> None:
+    """Write rows synthetic events shaped like landing events_<date>.jsonl"""
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        for i in range(rows):
+            user = rng.randint(1, 50_000)
+            f.write(json.dumps({
+                "event_id": f"evt_{i}",
+                "timestamp": f"2025-09-09T{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:"
+                             f"{rng.randint(0, 59):02d}.{rng.randint(0, 999):03d}Z",
+                "user_id": f"user_{user}",
+                "session_id": f"user_{user}_sess_{rng.randint(1, 5)}_{rng.randint(1, 9)}",
+                "video_id": f"video_{rng.randint(1, 2_000)}",
+                "event_name": rng.choice(EVENT_NAMES),
+                "watch_time_sec": round(rng.expovariate(1 / 40), 1),
+                "device_os": rng.choice(DEVICE_OS),
+                "app_version": f"2.{rng.randint(0, 3)}.{rng.randint(0, 9)}",
+            }) + "\n")
+
+
+def run_codec(source: Path, codec: str):
+    """(stored bytes, compress seconds, read seconds, rows read) for one codec"""
+    if codec == "none":
+        stored = source.read_bytes()
+        compress_seconds = 0.0
+    else:
+        started = time.perf_counter()
+        with open(source, "rb") as f:
+            reader = CompressingReader(f, codec)
+            stored = reader.read()
+        compress_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with io.TextIOWrapper(open_decompressed(io.BytesIO(stored), None if codec == "none" else codec),
+                          encoding="utf-8") as stream:
+        rows = sum(1 for line in stream if line.strip() and json.loads(line))
+    read_seconds = time.perf_counter() - started
+    return len(stored), compress_seconds, read_seconds, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark raw-layer compression codecs")
+    parser.add_argument("--source", type=str, help="JSONL file to compress (default: synthetic events)")
+    parser.add_argument("--rows", type=int, default=200_000, help="Synthetic event rows (default: 200000)")
+    parser.add_argument("--codecs", nargs="+", default=["none", "gzip", "zstd"],
+                        help="Codecs to compare (default: none gzip zstd)")
+    parser.add_argument("--network_mbps", type=float, default=1000,
+                        help="Bandwidth used for the transfer column, in Mbit/s (default: 1000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(args.source) if args.source else Path(tmp) / "events.jsonl"
+        if not args.source:
+            generate_events(source, args.rows)
+        raw_bytes = source.stat().st_size
+        print(f"source: {source.name}, {raw_bytes / 1e6:.1f} MB")
+        print(f"{'codec':<6} {'stored MB':>10} {'ratio':>6} {'compress s':>11} {'read s':>7} "
+              f"{'transfer s':>11} {'write+transfer s':>17}")
+
+        for codec in args.codecs:
+            try:
+                stored, compress_seconds, read_seconds, rows = run_codec(source, codec)
+            except ImportError as e:
+                print(f"{codec:<6} skipped: {e}")
+                continue
+            transfer_seconds = stored * 8 / (args.network_mbps * 1e6)
+            print(f"{codec:<6} {stored / 1e6:>10.2f} {raw_bytes / stored:>5.1f}x {compress_seconds:>11.2f} "
+                  f"{read_seconds:>7.2f} {transfer_seconds:>11.2f} {compress_seconds + transfer_seconds:>17.2f}"
+                  f"  ({rows:,} rows)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
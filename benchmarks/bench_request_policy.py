@@ -0,0 +1,218 @@
+"""Object-store tail-latency benchmark
+
+Starts a local S3 stand-in that injects faults into GETs (slow responses, 503
+SlowDown errors and stalls that never finish in time), then reads objects from it
+in "stages" of --stage_reads parallel GETs, like the trusted stage downloading a
+partition. Each request policy is compared on per-GET latency, stage duration
+and failed reads:
+
+- library: minio-py defaults (urllib3 retries 5xx, 5 minute read timeout)
+- retries: per-operation read timeout + jittered exponential retries
+- hedged: retries plus a duplicate GET after the p95 latency
+
+    python benchmarks/bench_request_policy.py --stages 40 --stage_reads 50
+    python benchmarks/bench_request_policy.py --stall_rate 0.005 --stall_seconds 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(ROOT))
+
+BUCKET = "bench"
+SLOWDOWN = (b'<?xml version="1.0" encoding="UTF-8"?><Error><Code>SlowDown</Code>'
+            b'<Message>Please reduce your request rate.</Message><Resource>/</Resource>'
+            b'<RequestId>bench</RequestId><HostId>bench</HostId></Error>')
+LOCATION = b'<LocationConstraint xmlns="http://s3.amazonaws.com/doc/2006-03-01/"></LocationConstraint>'
+
+
+class FaultyS3Handler(BaseHTTPRequestHandler):
+    """Minimal S3 endpoint: bucket HEAD/location and object GETs with injected faults"""
+    protocol_version = "HTTP/1.1"
+    faults = None
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body=b"", content_type="application/xml", send_body=True):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", '"bench"')
+        self.send_header("Last-Modified", "Thu, 09 Oct 2025 00:00:00 GMT")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._reply(200, send_body=False)
+
+    def do_GET(self):
+        if "location" in self.path:
+            return self._reply(200, LOCATION)
+        faults = self.faults
+        draw = random.random()
+        if draw < faults["error_rate"]:
+            return self._reply(503, SLOWDOWN)
+        draw -= faults["error_rate"]
+        if draw < faults["stall_rate"]:
+            delay = faults["stall_seconds"]
+        elif draw < faults["stall_rate"] + faults["slow_rate"]:
+            delay = faults["slow_seconds"]
+        else:
+            delay = random.uniform(0.5, 1.5) * faults["base_seconds"]
+        time.sleep(delay)
+        try:
+            self._reply(200, faults["body"], "application/octet-stream")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def start_server(faults):
+    FaultyS3Handler.faults = faults
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FaultyS3Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def library_reader(endpoint):
+    """GET with minio-py's own http client"""
+    from minio import Minio
+    client = Minio(endpoint, access_key="bench", secret_key="benchbench", secure=False)
+
+    def read(object_name):
+        response = client.get_object(BUCKET, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+    return read, None
+
+
+def policy_reader(policy):
+    """GET through MinIOClient with a request policy"""
+    from src.connect.minio_client import MinIOClient
+    client = MinIOClient(policy=policy)
+
+    def read(object_name):
+        data = client.read_bytes(object_name)
+        if data is None:
+            raise RuntimeError(f"read of {object_name} failed")
+        return data
+    return read, client
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))]
+
+
+def run(read, stages, stage_reads, workers):
+    """(per-GET seconds, per-stage seconds, failed reads)"""
+    latencies, durations, failures = [], [], 0
+    lock = threading.Lock()
+
+    def timed_read(i):
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            read(f"raw/object_{i}.jsonl")
+        except Exception:
+            with lock:
+                failures += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _ in range(stages):
+            started = time.perf_counter()
+            list(pool.map(timed_read, range(stage_reads)))
+            durations.append(time.perf_counter() - started)
+    return latencies, durations, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark object-store retry/timeout/hedging policies")
+    parser.add_argument("--stages", type=int, default=30, help="Stages to run per policy (default: 30)")
+    parser.add_argument("--stage_reads", type=int, default=50, help="GETs per stage (default: 50)")
+    parser.add_argument("--workers", type=int, default=8, help="Parallel GETs (default: 8)")
+    parser.add_argument("--base_ms", type=float, default=5, help="Typical GET latency (default: 5)")
+    parser.add_argument("--slow_rate", type=float, default=0.03, help="Share of slow GETs (default: 0.03)")
+    parser.add_argument("--slow_ms", type=float, default=400, help="Latency of slow GETs (default: 400)")
+    parser.add_argument("--error_rate", type=float, default=0.02, help="Share of 503 SlowDown (default: 0.02)")
+    parser.add_argument("--stall_rate", type=float, default=0.002, help="Share of stalled GETs (default: 0.002)")
+    parser.add_argument("--stall_seconds", type=float, default=5, help="Stall duration (default: 5)")
+    parser.add_argument("--read_timeout", type=float, default=1.0,
+                        help="GET read timeout of the retries/hedged policies (default: 1.0)")
+    parser.add_argument("--hedge_percentile", type=float, default=95, help="Hedging threshold (default: 95)")
+    parser.add_argument("--policies", nargs="+", default=["library", "retries", "hedged"],
+                        help="Policies to compare (default: library retries hedged)")
+    args = parser.parse_args()
+
+    faults = {
+        "base_seconds": args.base_ms / 1000,
+        "slow_rate": args.slow_rate,
+        "slow_seconds": args.slow_ms / 1000,
+        "error_rate": args.error_rate,
+        "stall_rate": args.stall_rate,
+        "stall_seconds": args.stall_seconds,
+        "body": os.urandom(64 * 1024),
+    }
+    server = start_server(faults)
+    endpoint = f"127.0.0.1:{server.server_address[1]}"
+    os.environ.update({
+        "MINIO_ENDPOINT": endpoint,
+        "MINIO_ACCESS_KEY": "bench",
+        "MINIO_SECRET_KEY": "benchbench",
+        "MINIO_SECURE": "false",
+        "MINIO_BUCKET": BUCKET,
+        "LOG_LEVEL": "WARNING",
+    })
+    from loguru import logger
+    logger.remove()
+    from src.connect.request_policy import RequestPolicy
+
+    timeouts = {"get": args.read_timeout, "head": args.read_timeout}
+    readers = {
+        "library": lambda: library_reader(endpoint),
+        "retries": lambda: policy_reader(RequestPolicy(timeouts=timeouts)),
+        "hedged": lambda: policy_reader(RequestPolicy(timeouts=timeouts, hedge_percentile=args.hedge_percentile,
+                                                      hedge_min_samples=100)),
+    }
+
+    print(f"faults: {args.base_ms:.0f}ms base, {args.slow_rate:.1%} slow ({args.slow_ms:.0f}ms), "
+          f"{args.error_rate:.1%} 503, {args.stall_rate:.1%} stalled ({args.stall_seconds:.0f}s); "
+          f"{args.stages} stages x {args.stage_reads} GETs, {args.workers} workers")
+    print(f"{'policy':<8} {'GET p50':>8} {'GET p99':>8} {'GET max':>8} {'stage p50':>10} {'stage p99':>10} "
+          f"{'total s':>8} {'failed':>7}")
+    for name in args.policies:
+        random.seed(7)
+        read, client = readers[name]()
+        started = time.perf_counter()
+        latencies, durations, failures = run(read, args.stages, args.stage_reads, args.workers)
+        total = time.perf_counter() - started
+        print(f"{name:<8} {statistics.median(latencies) * 1000:>6.1f}ms {percentile(latencies, 99) * 1000:>6.0f}ms "
+              f"{max(latencies) * 1000:>6.0f}ms {statistics.median(durations):>9.2f}s "
+              f"{percentile(durations, 99):>9.2f}s {total:>8.1f} {failures:>7}")
+        if client is not None:
+            get = client.request_stats().get("get", {})
+            print(f"{'':<8} requests={get.get('requests')} retries={get.get('retries')} "
+                  f"hedges={get.get('hedges')} hedge_wins={get.get('hedge_wins')} errors={get.get('errors')}")
+            client.requests.close()
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
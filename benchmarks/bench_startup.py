@@ -0,0 +1,86 @@
+"""Startup-time benchmark for the job CLIs
+
+Times `to_raw.py --help` and a no-op `to_raw.py --dry_run` in fresh interpreters,
+reports which heavy modules each one imported, and fails when the median wall
+time is over the target.
+
+    python benchmarks/bench_startup.py --runs 10 --target_ms 300
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+JOBS_DIR = ROOT / "src" / "jobs"
+
+HEAVY_MODULES = ["pandas", "pyarrow", "duckdb", "minio", "trino", "pydantic_settings"]
+
+CASES = {
+    "to_raw --help": [str(JOBS_DIR / "to_raw.py"), "--help"],
+    "to_raw --dry_run": [str(JOBS_DIR / "to_raw.py"), "--dry_run"],
+    "to_trusted --help": [str(JOBS_DIR / "to_trusted.py"), "--help"],
+}
+
+# Runs a job script as __main__ and reports the heavy modules it left in sys.modules
+_PROBE = """
+import atexit, json, runpy, sys
+heavy = {heavy}
+atexit.register(lambda: sys.stderr.write(
+    "HEAVY_MODULES=" + json.dumps(sorted(m for m in heavy if m in sys.modules)) + "\\n"))
+sys.argv = {argv}
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+
+def time_command(argv, runs):
+    """Wall time in ms of each run of argv in a fresh interpreter"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + argv, cwd=ROOT, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL, check=False)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def heavy_imports(argv):
+    """Heavy modules imported by one run of a job script"""
+    probe = _PROBE.format(heavy=repr(HEAVY_MODULES), argv=repr(argv))
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True,
+                            text=True, check=False)
+    for line in result.stderr.splitlines():
+        if line.startswith("HEAVY_MODULES="):
+            return json.loads(line[len("HEAVY_MODULES="):])
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark job CLI startup time")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per command (default: 10)")
+    parser.add_argument("--target_ms", type=float, default=300,
+                        help="Maximum median wall time per command in ms (default: 300)")
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_command(["-c", "pass"], args.runs))
+    print(f"interpreter baseline: {baseline:.0f}ms median")
+
+    failed = False
+    for name, argv in CASES.items():
+        timings = time_command(argv, args.runs)
+        median = statistics.median(timings)
+        over = median > args.target_ms
+        failed = failed or over
+        print(f"{name:<20} median {median:6.0f}ms  min {min(timings):6.0f}ms  "
+              f"max {max(timings):6.0f}ms  heavy imports: {heavy_imports(argv)}"
+              f"{'  OVER TARGET' if over else ''}")
+
+    print(f"target: {args.target_ms:.0f}ms median -> {'FAIL' if failed else 'OK'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
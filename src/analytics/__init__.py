@@ -0,0 +1,4 @@
+# Analytics package
+
+from .cohort import CohortEngine
+from .metrics import AnalysisMetrics
@@ -0,0 +1,321 @@
+import json
+from typing import Dict, List, Optional
+from loguru import logger
+import pandas as pd
+
+try:
+    from src.utils.config import settings
+except ImportError:
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+    from src.utils.config import settings
+
+from src.analytics.first_session import dominant_genre_select, first_session_value, starts_before
+from src.connect.duckdb_client import DataLakeManager
+
+# Retention dimensions -> first-session fact columns
+DIMENSIONS = {
+    'genre': 'dominant_genre',
+    'device_os': 'device_os',
+    'app_version': 'app_version',
+    'country': 'country'
+}
+
+FACT_COLUMNS = [
+    'user_id',
+    'first_session_id',
+    'first_session_start',
+    'first_session_date',
+    'device_os',
+    'app_version',
+    'country',
+    'dominant_genre',
+    'first_session_watch_time',
+    'first_return_date'
+]
+
+
+class CohortEngine:
+    """Per-user first-session facts and N-day retention by any dimension
+
+    The facts hold one row per user: their first session, the device/app/country
+    it was on, the genre they watched most in it (both as defined in
+    src/analytics/first_session.py, shared with AnalysisMetrics), and the date
+    of their first later session. They are built from trusted_events one
+    ingestion_date at a time, so each new day only reads that day's partition,
+    and any N-day retention split is a scan of the facts alone.
+    """
+
+    def __init__(self, datalake: Optional[DataLakeManager] = None, state_prefix: Optional[str] = None):
+        """Initialize the engine
+
+        Args:
+            datalake: Data lake manager to read trusted tables with (created if omitted)
+            state_prefix: Object prefix the facts are saved under
+                (default: <TRUSTED_PREFIX>/analytics/cohort_facts)
+        """
+        self.datalake = datalake or DataLakeManager()
+        self.duckdb = self.datalake.duckdb
+        self.state_prefix = state_prefix or f"{settings.TRUSTED_PREFIX}/analytics/cohort_facts"
+        self.processed_dates: List[str] = []
+        self._genre_lookup: Optional[Dict[str, str]] = None
+        self._reset_facts()
+
+    def _reset_facts(self):
+        self.duckdb.execute_query("""
+            CREATE OR REPLACE TEMP TABLE cohort_facts (
+                user_id VARCHAR,
+                first_session_id VARCHAR,
+                first_session_start TIMESTAMP,
+                first_session_date DATE,
+                device_os VARCHAR,
+                app_version VARCHAR,
+                country VARCHAR,
+                dominant_genre VARCHAR,
+                first_session_watch_time DOUBLE,
+                first_return_date DATE
+            )
+        """)
+        self.processed_dates = []
+
+    def genre_lookup(self) -> Dict[str, str]:
+        """video_id -> genre from the latest trusted_videos partition (or SCD2 current rows), loaded once"""
+        if self._genre_lookup is None:
+            if self.datalake.uses_scd2_history('trusted_videos'):
+                videos = f"({self.datalake.scd2_current_select('trusted_videos')})"
+            else:
+                videos = self.duckdb.read_parquet_expr(
+                    self.datalake.trusted_table_source('trusted_videos'),
+                    hive_partitioning=True,
+                    hive_types={'ingestion_date': 'VARCHAR'}
+                )
+            df = self.duckdb.query_to_df(
+                f"SELECT video_id, arg_max(genre, ingestion_date) AS genre FROM {videos} GROUP BY video_id"
+            )
+            self._genre_lookup = dict(zip(df['video_id'], df['genre']))
+            logger.info(f"Loaded genres for {len(self._genre_lookup)} videos")
+        return self._genre_lookup
+
+    def build(self, start_date: str, end_date: str) -> int:
+        """Rebuild the facts from every ingestion_date in [start_date, end_date]"""
+        self._reset_facts()
+        self._genre_lookup = None
+
+        for ingestion_date in pd.date_range(start_date, end_date).strftime("%Y-%m-%d"):
+            self.update(ingestion_date)
+        return self.user_count()
+
+    def update(self, ingestion_date: str, force: bool = False) -> int:
+        """Fold one ingestion_date of trusted_events into the facts
+
+        Returns the number of users whose first session was set or moved earlier.
+        Dates already folded in are skipped unless force is set.
+        """
+        if ingestion_date in self.processed_dates and not force:
+            logger.info(f"Cohort facts already include ingestion_date={ingestion_date}")
+            return 0
+
+        files = self.datalake.list_trusted_partition_files('trusted_events', ingestion_date, ingestion_date)
+        if not files:
+            logger.warning(f"No trusted_events partition for ingestion_date={ingestion_date}")
+            return 0
+        events = self.duckdb.read_parquet_expr(files)
+
+        # One row per session in the batch
+        self.duckdb.execute_query(f"""
+            CREATE OR REPLACE TEMP TABLE cohort_batch_sessions AS
+            SELECT
+                user_id,
+                session_id,
+                CAST(MIN("timestamp") AS TIMESTAMP) AS session_start,
+                arg_min(device_os, "timestamp") AS device_os,
+                arg_min(app_version, "timestamp") AS app_version,
+                arg_min(country, "timestamp") AS country
+            FROM {events}
+            GROUP BY user_id, session_id
+        """)
+
+        # Users whose first session is in this batch: new users, or late data
+        # with a session earlier than the one on record
+        earlier = starts_before('b.first_session_start', 'b.first_session_id',
+                                'f.first_session_start', 'f.first_session_id')
+        self.duckdb.execute_query(f"""
+            CREATE OR REPLACE TEMP TABLE cohort_batch_first AS
+            SELECT b.*
+            FROM (
+                SELECT
+                    user_id,
+                    {first_session_value('session_id')} AS first_session_id,
+                    MIN(session_start) AS first_session_start,
+                    {first_session_value('device_os')} AS device_os,
+                    {first_session_value('app_version')} AS app_version,
+                    {first_session_value('country')} AS country
+                FROM cohort_batch_sessions
+                GROUP BY user_id
+            ) b
+            LEFT JOIN cohort_facts f USING (user_id)
+            WHERE f.user_id IS NULL OR {earlier}
+        """)
+
+        first_session_watch = self._first_session_watch(events)
+        self.duckdb.conn.register('cohort_batch_watch', first_session_watch)
+        try:
+            self.duckdb.execute_query("""
+                CREATE OR REPLACE TEMP TABLE cohort_facts_next AS
+                WITH merged AS (
+                    SELECT
+                        COALESCE(b.user_id, f.user_id) AS user_id,
+                        COALESCE(b.first_session_id, f.first_session_id) AS first_session_id,
+                        COALESCE(b.first_session_start, f.first_session_start) AS first_session_start,
+                        COALESCE(b.device_os, f.device_os) AS device_os,
+                        COALESCE(b.app_version, f.app_version) AS app_version,
+                        COALESCE(b.country, f.country) AS country,
+                        CASE WHEN b.user_id IS NOT NULL THEN w.dominant_genre ELSE f.dominant_genre END
+                            AS dominant_genre,
+                        CASE WHEN b.user_id IS NOT NULL THEN COALESCE(w.first_session_watch_time, 0)
+                             ELSE f.first_session_watch_time END AS first_session_watch_time,
+                        -- A replaced first session becomes a return session
+                        LEAST(
+                            f.first_return_date,
+                            CASE WHEN b.user_id IS NOT NULL THEN f.first_session_date END
+                        ) AS previous_return_date
+                    FROM cohort_batch_first b
+                    FULL OUTER JOIN cohort_facts f USING (user_id)
+                    LEFT JOIN cohort_batch_watch w ON w.user_id = b.user_id
+                ),
+                batch_returns AS (
+                    SELECT s.user_id, MIN(CAST(s.session_start AS DATE)) AS return_date
+                    FROM cohort_batch_sessions s
+                    JOIN merged m ON m.user_id = s.user_id AND s.session_id <> m.first_session_id
+                    GROUP BY s.user_id
+                )
+                SELECT
+                    m.user_id,
+                    m.first_session_id,
+                    m.first_session_start,
+                    CAST(m.first_session_start AS DATE) AS first_session_date,
+                    m.device_os,
+                    m.app_version,
+                    m.country,
+                    m.dominant_genre,
+                    m.first_session_watch_time,
+                    LEAST(m.previous_return_date, r.return_date) AS first_return_date
+                FROM merged m
+                LEFT JOIN batch_returns r USING (user_id)
+            """)
+            self.duckdb.execute_query("CREATE OR REPLACE TEMP TABLE cohort_facts AS SELECT * FROM cohort_facts_next")
+        finally:
+            self.duckdb.conn.unregister('cohort_batch_watch')
+            self.duckdb.execute_query("DROP TABLE IF EXISTS cohort_facts_next")
+
+        changed_users = len(first_session_watch)
+        if ingestion_date not in self.processed_dates:
+            self.processed_dates.append(ingestion_date)
+            self.processed_dates.sort()
+        logger.info(f"Cohort facts updated for ingestion_date={ingestion_date}: "
+                    f"{changed_users} first sessions set, {self.user_count()} users")
+        return changed_users
+
+    def _first_session_watch(self, events: str) -> pd.DataFrame:
+        """Dominant genre and total watch time of each first session in the batch
+
+        Only the first sessions' watch time per video leaves DuckDB; genres are
+        attached through the in-memory video lookup instead of a join per query.
+        """
+        per_video = self.duckdb.query_to_df(f"""
+            SELECT
+                e.user_id,
+                e.video_id,
+                SUM(CASE WHEN e.event_name = 'watch_time' THEN e.value ELSE 0 END) AS watch_time
+            FROM {events} e
+            JOIN cohort_batch_first b
+                ON e.user_id = b.user_id AND e.session_id = b.first_session_id
+            GROUP BY e.user_id, e.video_id
+        """)
+        if per_video.empty:
+            return pd.DataFrame({
+                'user_id': pd.Series(dtype='object'),
+                'dominant_genre': pd.Series(dtype='object'),
+                'first_session_watch_time': pd.Series(dtype='float64')
+            })
+
+        per_video['genre'] = per_video['video_id'].map(self.genre_lookup())
+        per_genre = per_video.groupby(['user_id', 'genre'], as_index=False)['watch_time'].sum()
+        self.duckdb.conn.register('cohort_batch_genres', per_genre)
+        try:
+            dominant = self.duckdb.query_to_df(
+                f"SELECT user_id, dominant_genre FROM ({dominant_genre_select('cohort_batch_genres')})"
+            )
+        finally:
+            self.duckdb.conn.unregister('cohort_batch_genres')
+        totals = (
+            per_video.groupby('user_id', as_index=False)['watch_time'].sum()
+            .rename(columns={'watch_time': 'first_session_watch_time'})
+        )
+        return totals.merge(dominant, on='user_id', how='left')
+
+    def user_count(self) -> int:
+        """Number of users with first-session facts"""
+        return self.duckdb.execute_query("SELECT COUNT(*) FROM cohort_facts").fetchone()[0]
+
+    def facts(self) -> pd.DataFrame:
+        """First-session facts, one row per user"""
+        return self.duckdb.query_to_df("SELECT * FROM cohort_facts ORDER BY user_id")
+
+    def retention(self, days: int = 3, by: str = 'genre') -> pd.DataFrame:
+        """N-day retention of first-session cohorts split by a dimension
+
+        A user is retained when another session starts within `days` days of the
+        first session's date.
+
+        Args:
+            days: Retention window in days
+            by: One of genre, device_os, app_version, country
+        """
+        if by not in DIMENSIONS:
+            raise ValueError(f"Unknown retention dimension: {by} (expected one of {list(DIMENSIONS)})")
+        column = DIMENSIONS[by]
+
+        return self.duckdb.query_to_df(f"""
+            SELECT
+                {column} AS {by},
+                COUNT(*) AS cohort_users,
+                COUNT(*) FILTER (
+                    WHERE first_return_date <= first_session_date + INTERVAL {int(days)} DAY
+                ) AS retained_users,
+                ROUND(100.0 * retained_users / cohort_users, 1) AS retention_pct,
+                ROUND(AVG(first_session_watch_time), 1) AS avg_first_session_watch_time
+            FROM cohort_facts
+            GROUP BY 1
+            ORDER BY retention_pct DESC, cohort_users DESC
+        """)
+
+    def save(self) -> bool:
+        """Write the facts and the dates they cover to the trusted layer"""
+        if not self.datalake.minio.upload_dataframe(self.facts(), f"{self.state_prefix}/data.parquet"):
+            return False
+        state = json.dumps({'processed_dates': self.processed_dates}).encode()
+        return self.datalake.minio.upload_bytes(state, f"{self.state_prefix}/_state.json",
+                                                content_type="application/json")
+
+    def load(self) -> bool:
+        """Restore facts saved by save(); returns False when none exist yet"""
+        state = self.datalake.minio.read_bytes(f"{self.state_prefix}/_state.json")
+        facts = self.datalake.minio.read_parquet(f"{self.state_prefix}/data.parquet") if state else None
+        if facts is None:
+            return False
+
+        self._reset_facts()
+        self.duckdb.conn.register('cohort_saved_facts', facts)
+        try:
+            self.duckdb.execute_query(f"""
+                INSERT INTO cohort_facts
+                SELECT {', '.join(FACT_COLUMNS)} FROM cohort_saved_facts
+            """)
+        finally:
+            self.duckdb.conn.unregister('cohort_saved_facts')
+        self.processed_dates = json.loads(state)['processed_dates']
+        logger.info(f"Loaded cohort facts for {self.user_count()} users "
+                    f"through {self.processed_dates[-1] if self.processed_dates else 'n/a'}")
+        return True
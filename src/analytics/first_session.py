@@ -0,0 +1,30 @@
+"""First-session facts shared by AnalysisMetrics and CohortEngine
+
+A user's first session is the one with the earliest start (its first event);
+sessions starting at the same instant are ordered by session_id. The dominant
+genre of a session is the genre with the most watch time in it; equal watch
+times go to the alphabetically first genre, and videos without a genre are
+left out.
+"""
+
+def first_session_value(column: str, start: str = 'session_start', session_id: str = 'session_id') -> str:
+    """Aggregate taking column from each group's first session, e.g. per user_id"""
+    return f"first({column} ORDER BY {start}, {session_id})"
+
+
+def starts_before(start: str, session_id: str, other_start: str, other_session_id: str) -> str:
+    """Condition: the session (start, session_id) comes before (other_start, other_session_id)"""
+    return f"({start} < {other_start} OR ({start} = {other_start} AND {session_id} < {other_session_id}))"
+
+
+def dominant_genre_select(genre_watch: str) -> str:
+    """SELECT of user_id, dominant_genre and genre_watch_time from rows of (user_id, genre, watch_time)"""
+    return f"""
+        SELECT
+            user_id,
+            first(genre ORDER BY watch_time DESC, genre) AS dominant_genre,
+            MAX(watch_time) AS genre_watch_time
+        FROM {genre_watch}
+        WHERE genre IS NOT NULL
+        GROUP BY user_id
+    """
@@ -0,0 +1,317 @@
+from typing import Any, List, Optional, Tuple
+from loguru import logger
+import pandas as pd
+
+from src.analytics.first_session import dominant_genre_select, first_session_value
+from src.connect.duckdb_client import DuckDBClient
+
+# Temp tables shared by the metrics, in build order
+SESSION_DAYS_TABLE = 'analysis_session_days'
+FIRST_SESSIONS_TABLE = 'analysis_first_sessions'
+FIRST_SESSION_GENRES_TABLE = 'analysis_first_session_genres'
+
+GENRE_MODES = ['dominant', 'exposure']
+# Q3 composite drop-off score weights: single session, low first-session watch time, no day-1 return
+DEFAULT_DROPOFF_WEIGHTS = (0.4, 0.3, 0.3)
+
+
+class AnalysisMetrics:
+    """Q1/Q2/Q3 analysis metrics over the trusted tables
+
+    Every metric starts from the same per-user first-session facts. They are
+    materialized once per snapshot as DuckDB temp tables and shared by all
+    metrics until the snapshot changes or refresh() is called:
+
+    - analysis_session_days: one row per user, session and event date with the
+      session's device/app and its watch time that day
+    - analysis_first_sessions: one row per user with their first session (as
+      defined in src/analytics/first_session.py, shared with CohortEngine), its
+      date, device/app and watch time, and their session count
+    - analysis_first_session_genres: watch time per genre in each first session
+      (built on first use by genre_retention)
+
+    A snapshot is a range of ingestion_date partitions; without one every
+    partition in the tables is read.
+    """
+
+    def __init__(self, duckdb: DuckDBClient, events: str = 'trusted_events',
+                 videos: str = 'trusted_videos', users: str = 'trusted_users'):
+        """Initialize the metrics
+
+        Args:
+            duckdb: Client whose connection holds the tables (e.g. from setup_trusted_views)
+            events, videos, users: Tables or views to read
+        """
+        self.duckdb = duckdb
+        self.events = events
+        self.videos = videos
+        self.users = users
+        self.start_date: Optional[str] = None
+        self.end_date: Optional[str] = None
+        self._materialized: List[str] = []
+
+    def snapshot(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> 'AnalysisMetrics':
+        """Analyze the ingestion_date partitions in [start_date, end_date] (end defaults to start)"""
+        end_date = end_date or start_date
+        if (start_date, end_date) != (self.start_date, self.end_date):
+            self.start_date, self.end_date = start_date, end_date
+            self.refresh()
+        return self
+
+    def refresh(self) -> None:
+        """Drop the shared temp tables; the next metric rebuilds them, e.g. after new data landed"""
+        for table in reversed(self._materialized):
+            self.duckdb.execute_query(f"DROP TABLE IF EXISTS {table}")
+        self._materialized = []
+
+    def materialize(self) -> None:
+        """Build every shared temp table for the snapshot now instead of on first use"""
+        for table in (SESSION_DAYS_TABLE, FIRST_SESSIONS_TABLE, FIRST_SESSION_GENRES_TABLE):
+            self._materialize(table)
+
+    def _snapshot_filter(self, alias: str = '') -> Tuple[str, List[Any]]:
+        """WHERE clause restricting a trusted table to the snapshot, with its parameters"""
+        if not self.start_date:
+            return "", []
+        column = f"{alias}.ingestion_date" if alias else "ingestion_date"
+        return f"WHERE {column} BETWEEN ? AND ?", [self.start_date, self.end_date]
+
+    def _materialize(self, table: str) -> None:
+        """Build one shared temp table (and those it depends on) unless it exists for this snapshot"""
+        if table in self._materialized:
+            return
+        if table == SESSION_DAYS_TABLE:
+            where, parameters = self._snapshot_filter()
+            self.duckdb.execute_query(f"""
+                CREATE OR REPLACE TEMP TABLE {SESSION_DAYS_TABLE} AS
+                SELECT
+                    user_id,
+                    session_id,
+                    CAST("timestamp" AS DATE) AS event_date,
+                    MIN("timestamp") AS first_event_at,
+                    arg_min(device_os, "timestamp") AS device_os,
+                    arg_min(app_version, "timestamp") AS app_version,
+                    SUM(CASE WHEN event_name = 'watch_time' THEN value ELSE 0 END) AS watch_time,
+                    SUM(CASE WHEN event_name = 'watch_time' AND value > 0 THEN value ELSE 0 END)
+                        AS positive_watch_time
+                FROM {self.events}
+                {where}
+                GROUP BY user_id, session_id, event_date
+            """, parameters)
+        elif table == FIRST_SESSIONS_TABLE:
+            self._materialize(SESSION_DAYS_TABLE)
+            self.duckdb.execute_query(f"""
+                CREATE OR REPLACE TEMP TABLE {FIRST_SESSIONS_TABLE} AS
+                WITH sessions AS (
+                    SELECT
+                        user_id,
+                        session_id,
+                        MIN(first_event_at) AS session_start,
+                        arg_min(device_os, first_event_at) AS device_os,
+                        arg_min(app_version, first_event_at) AS app_version,
+                        SUM(watch_time) AS watch_time,
+                        SUM(positive_watch_time) AS positive_watch_time
+                    FROM {SESSION_DAYS_TABLE}
+                    GROUP BY user_id, session_id
+                )
+                SELECT
+                    user_id,
+                    {first_session_value('session_id')} AS first_session_id,
+                    CAST(MIN(session_start) AS DATE) AS first_session_date,
+                    {first_session_value('device_os')} AS device_os,
+                    {first_session_value('app_version')} AS app_version,
+                    {first_session_value('watch_time')} AS first_session_watch_time,
+                    {first_session_value('positive_watch_time')} AS first_session_positive_watch_time,
+                    COUNT(*) AS total_sessions
+                FROM sessions
+                GROUP BY user_id
+            """)
+        elif table == FIRST_SESSION_GENRES_TABLE:
+            self._materialize(FIRST_SESSIONS_TABLE)
+            videos_where, videos_parameters = self._snapshot_filter()
+            events_where, events_parameters = self._snapshot_filter('e')
+            self.duckdb.execute_query(f"""
+                CREATE OR REPLACE TEMP TABLE {FIRST_SESSION_GENRES_TABLE} AS
+                WITH videos AS (
+                    SELECT video_id, arg_max(genre, ingestion_date) AS genre
+                    FROM {self.videos}
+                    {videos_where}
+                    GROUP BY video_id
+                )
+                SELECT
+                    f.user_id,
+                    v.genre,
+                    SUM(CASE WHEN e.event_name = 'watch_time' THEN e.value ELSE 0 END) AS watch_time
+                FROM {self.events} e
+                JOIN {FIRST_SESSIONS_TABLE} f
+                    ON e.user_id = f.user_id AND e.session_id = f.first_session_id
+                JOIN videos v ON e.video_id = v.video_id
+                {events_where}
+                GROUP BY f.user_id, v.genre
+            """, videos_parameters + events_parameters)
+        else:
+            raise ValueError(f"Unknown analysis table: {table}")
+        self._materialized.append(table)
+        logger.debug(f"Materialized {table}")
+
+    def first_session_watch(self, min_seconds: float = 30) -> pd.DataFrame:
+        """Q1: share of users whose first session reaches min_seconds of watch time
+
+        Counts positive watch_time values; the denominator is every user in the
+        users table (users without events count as not reaching it).
+        """
+        self._materialize(FIRST_SESSIONS_TABLE)
+        where, parameters = self._snapshot_filter()
+        return self.duckdb.query_to_df(f"""
+            WITH users AS (
+                SELECT DISTINCT user_id FROM {self.users} {where}
+            )
+            SELECT
+                COUNT(*) AS total_users,
+                COUNT(*) FILTER (WHERE f.first_session_positive_watch_time > 0) AS users_with_watch_time,
+                COUNT(*) FILTER (WHERE f.first_session_positive_watch_time >= ?) AS users_reaching_threshold,
+                ROUND(100.0 * users_reaching_threshold / NULLIF(total_users, 0), 2) AS pct_reaching_threshold
+            FROM users u
+            LEFT JOIN {FIRST_SESSIONS_TABLE} f USING (user_id)
+        """, parameters + [min_seconds])
+
+    def first_session_watch_users(self, min_seconds: float = 30) -> pd.DataFrame:
+        """Users whose first session reached min_seconds of watch time, most watched first"""
+        self._materialize(FIRST_SESSIONS_TABLE)
+        return self.duckdb.query_to_df(f"""
+            SELECT user_id, first_session_id, first_session_positive_watch_time AS total_watch_time
+            FROM {FIRST_SESSIONS_TABLE}
+            WHERE first_session_positive_watch_time >= ?
+            ORDER BY total_watch_time DESC, user_id
+        """, [min_seconds])
+
+    def genre_retention(self, days: int = 3, mode: str = 'dominant') -> pd.DataFrame:
+        """Q2: return rate and later engagement of users by first-session genre
+
+        A user returned when another session has events within `days` days of the
+        first session's date; their watch time and sessions in that window measure
+        how well they were retained. engagement_quality_score is the average later
+        watch time times the average later sessions.
+
+        Args:
+            days: Retention window in days
+            mode: dominant: each user counts once, for the genre they watched most in
+                their first session (ties as in src/analytics/first_session.py);
+                exposure: for every genre they watched in it
+        """
+        if mode not in GENRE_MODES:
+            raise ValueError(f"Unknown genre mode: {mode} (expected one of {GENRE_MODES})")
+        self._materialize(FIRST_SESSION_GENRES_TABLE)
+        if mode == 'dominant':
+            genres = (f"SELECT user_id, dominant_genre AS genre, genre_watch_time "
+                      f"FROM ({dominant_genre_select(FIRST_SESSION_GENRES_TABLE)})")
+        else:
+            genres = f"SELECT user_id, genre, watch_time AS genre_watch_time FROM {FIRST_SESSION_GENRES_TABLE}"
+        return self.duckdb.query_to_df(f"""
+            WITH genres AS ({genres}),
+            returns AS (
+                SELECT
+                    d.user_id,
+                    SUM(d.watch_time) AS subsequent_watch_time,
+                    COUNT(DISTINCT d.session_id) AS subsequent_sessions
+                FROM {SESSION_DAYS_TABLE} d
+                JOIN {FIRST_SESSIONS_TABLE} f USING (user_id)
+                WHERE d.session_id <> f.first_session_id
+                    AND d.event_date <= f.first_session_date + CAST(? AS INTEGER)
+                GROUP BY d.user_id
+            )
+            SELECT
+                g.genre,
+                COUNT(DISTINCT g.user_id) AS users,
+                COUNT(DISTINCT r.user_id) AS users_returned,
+                ROUND(100.0 * users_returned / users, 1) AS return_rate_pct,
+                ROUND(AVG(g.genre_watch_time), 1) AS avg_first_session_genre_watch_time,
+                ROUND(AVG(r.subsequent_watch_time), 1) AS avg_subsequent_watch_time,
+                ROUND(AVG(r.subsequent_sessions), 1) AS avg_subsequent_sessions,
+                ROUND(AVG(r.subsequent_watch_time) * AVG(r.subsequent_sessions), 1) AS engagement_quality_score
+            FROM genres g
+            LEFT JOIN returns r USING (user_id)
+            GROUP BY g.genre
+            ORDER BY avg_subsequent_watch_time DESC NULLS LAST, g.genre
+        """, [days])
+
+    def _dropoff_groups(self, low_watch_seconds: float) -> str:
+        """SQL of drop-off counts per (device_os, app_version) plus an overall row (is_overall)"""
+        self._materialize(FIRST_SESSIONS_TABLE)
+        return f"""
+            WITH day1_returns AS (
+                SELECT DISTINCT d.user_id
+                FROM {SESSION_DAYS_TABLE} d
+                JOIN {FIRST_SESSIONS_TABLE} f USING (user_id)
+                WHERE d.session_id <> f.first_session_id AND d.event_date = f.first_session_date + 1
+            ),
+            counts AS (
+                SELECT
+                    f.device_os,
+                    f.app_version,
+                    GROUPING(f.device_os, f.app_version) = 3 AS is_overall,
+                    COUNT(*) AS total_users,
+                    COUNT(*) FILTER (WHERE f.total_sessions = 1) AS users_single_session,
+                    COUNT(*) FILTER (WHERE f.first_session_watch_time < {float(low_watch_seconds)})
+                        AS users_low_watch_time,
+                    COUNT(*) FILTER (WHERE r.user_id IS NULL) AS users_no_day1_return,
+                    ROUND(AVG(f.first_session_watch_time), 1) AS avg_first_session_watch_time,
+                    ROUND(AVG(f.total_sessions), 1) AS avg_total_sessions
+                FROM {FIRST_SESSIONS_TABLE} f
+                LEFT JOIN day1_returns r USING (user_id)
+                GROUP BY GROUPING SETS ((f.device_os, f.app_version), ())
+            )
+            SELECT
+                *,
+                ROUND(100.0 * users_single_session / total_users, 1) AS single_session_rate_pct,
+                ROUND(100.0 * users_low_watch_time / total_users, 1) AS low_watch_time_rate_pct,
+                ROUND(100.0 * users_no_day1_return / total_users, 1) AS no_day1_return_rate_pct
+            FROM counts
+        """
+
+    def dropoff_overall(self, low_watch_seconds: float = 5) -> pd.DataFrame:
+        """Q3 baseline: drop-off rates over all users (one row)"""
+        return self.duckdb.query_to_df(f"""
+            SELECT * EXCLUDE (device_os, app_version, is_overall)
+            FROM ({self._dropoff_groups(low_watch_seconds)})
+            WHERE is_overall
+        """)
+
+    def device_dropoff(self, min_users: int = 5, low_watch_seconds: float = 5,
+                       weights: Tuple[float, float, float] = DEFAULT_DROPOFF_WEIGHTS) -> pd.DataFrame:
+        """Q3: drop-off per (device_os, app_version) of the first session, worst first
+
+        Each rate (single session, first-session watch time under low_watch_seconds,
+        no session the next day) is compared with the overall rate in percentage
+        points; composite_dropoff_score weighs the three deviations.
+
+        Args:
+            min_users: Smallest group reported
+            low_watch_seconds: First-session watch time counted as low
+            weights: Weights of the single-session, low-watch and no-day-1 deviations
+        """
+        single_weight, low_watch_weight, day1_weight = weights
+        return self.duckdb.query_to_df(f"""
+            WITH groups AS ({self._dropoff_groups(low_watch_seconds)}),
+            overall AS (SELECT * FROM groups WHERE is_overall)
+            SELECT
+                g.device_os,
+                g.app_version,
+                g.total_users,
+                g.users_single_session,
+                g.single_session_rate_pct,
+                g.users_low_watch_time,
+                g.low_watch_time_rate_pct,
+                g.users_no_day1_return,
+                g.no_day1_return_rate_pct,
+                g.avg_first_session_watch_time,
+                g.avg_total_sessions,
+                g.single_session_rate_pct - o.single_session_rate_pct AS single_session_deviation,
+                g.low_watch_time_rate_pct - o.low_watch_time_rate_pct AS low_watch_deviation,
+                g.no_day1_return_rate_pct - o.no_day1_return_rate_pct AS no_day1_deviation,
+                ROUND(? * single_session_deviation + ? * low_watch_deviation + ? * no_day1_deviation, 1)
+                    AS composite_dropoff_score
+            FROM groups g, overall o
+            WHERE NOT g.is_overall AND g.total_users >= ?
+            ORDER BY composite_dropoff_score DESC, g.total_users DESC
+        """, [single_weight, low_watch_weight, day1_weight, min_users])
@@ -0,0 +1,260 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, List, Optional, Union
+from loguru import logger
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# User metadata of copied objects lives beside the data, outside any listed prefix
+METADATA_DIR = ".metadata"
+
+
+class LocalObjectStore:
+    """MinIOClient stand-in that keeps objects as files under a local directory
+
+    Object names map to paths below root. Writes go through a temporary file and
+    a rename, so readers never see a partial object. Used to run jobs (e.g.
+    to_trusted --stream --local_root DIR) against the local filesystem.
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.bucket = self.root.name
+
+    def _path(self, object_name: str) -> Path:
+        return self.root / object_name
+
+    def _metadata_path(self, object_name: str) -> Path:
+        return self.root / METADATA_DIR / f"{object_name}.json"
+
+    def _write_metadata(self, object_name: str, metadata: Dict[str, str]) -> None:
+        metadata_path = self._metadata_path(object_name)
+        metadata_path.parent.mkdir(parents=True, exist_ok=True)
+        metadata_path.write_text(json.dumps(metadata))
+
+    def _write(self, object_name: str, write_fn) -> None:
+        path = self._path(object_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=path.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write_fn(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        self._metadata_path(object_name).unlink(missing_ok=True)
+
+    def upload_file(self, local_path: Union[str, Path], object_name: str) -> bool:
+        try:
+            with open(local_path, 'rb') as source:
+                self._write(object_name, lambda f: shutil.copyfileobj(source, f))
+            logger.info(f"Uploaded {local_path} to {object_name}")
+            return True
+        except OSError as e:
+            logger.error(f"Error uploading {local_path}: {e}")
+            return False
+
+    def upload_dataframe(self, df: "pd.DataFrame", object_name: str, format: str = "parquet") -> bool:
+        try:
+            buffer = BytesIO()
+            if format.lower() == "parquet":
+                df.to_parquet(buffer, index=False)
+            elif format.lower() == "csv":
+                df.to_csv(buffer, index=False)
+            self._write(object_name, lambda f: f.write(buffer.getvalue()))
+            logger.info(f"Uploaded dataframe to {object_name} as {format}")
+            return True
+        except Exception as e:
+            logger.error(f"Error uploading dataframe: {e}")
+            return False
+
+    def download_file(self, object_name: str, local_path: Union[str, Path]) -> bool:
+        try:
+            shutil.copyfile(self._path(object_name), local_path)
+            logger.info(f"Downloaded {object_name} to {local_path}")
+            return True
+        except OSError as e:
+            logger.error(f"Error downloading {object_name}: {e}")
+            return False
+
+    def read_parquet(self, object_name: str) -> Optional["pd.DataFrame"]:
+        import pandas as pd
+        try:
+            return pd.read_parquet(self._path(object_name))
+        except Exception as e:
+            logger.error(f"Error reading parquet {object_name}: {e}")
+            return None
+
+    def open_object(self, object_name: str):
+        """Readable stream of an object; the caller closes it"""
+        return open(self._path(object_name), 'rb')
+
+    def upload_stream(self, stream: BinaryIO, object_name: str,
+                      content_type: str = "application/octet-stream",
+                      metadata: Optional[Dict[str, str]] = None) -> bool:
+        try:
+            self._write(object_name, lambda f: shutil.copyfileobj(stream, f))
+            if metadata:
+                self._write_metadata(object_name, metadata)
+            logger.info(f"Uploaded stream to {object_name}")
+            return True
+        except OSError as e:
+            logger.error(f"Error uploading {object_name}: {e}")
+            return False
+
+    def read_bytes(self, object_name: str) -> Optional[bytes]:
+        try:
+            return self._path(object_name).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.error(f"Error reading {object_name}: {e}")
+            return None
+
+    def upload_bytes(self, data: bytes, object_name: str,
+                     content_type: str = "application/octet-stream") -> bool:
+        try:
+            self._write(object_name, lambda f: f.write(data))
+            logger.info(f"Uploaded {len(data):,} bytes to {object_name}")
+            return True
+        except OSError as e:
+            logger.error(f"Error uploading {object_name}: {e}")
+            return False
+
+    def create_object(self, data: bytes, object_name: str,
+                      content_type: str = "application/octet-stream") -> bool:
+        """Write an object only if it does not exist yet; False when it already exists"""
+        path = self._path(object_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=path.parent)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # link() fails if the target exists, so exactly one racing writer wins
+            os.link(tmp_path, path)
+            logger.info(f"Created {object_name} ({len(data):,} bytes)")
+            return True
+        except FileExistsError:
+            logger.debug(f"{object_name} already exists")
+            return False
+        except OSError as e:
+            logger.error(f"Error creating {object_name}: {e}")
+            return False
+        finally:
+            Path(tmp_path).unlink(missing_ok=True)
+
+    def replace_object(self, data: bytes, object_name: str, etag: Optional[str],
+                       content_type: str = "application/octet-stream") -> bool:
+        """Overwrite an object only if it still has etag; with etag None only create it
+
+        Returns False when another writer changed (or created) the object first.
+        """
+        if etag is None:
+            return self.create_object(data, object_name, content_type)
+        path = self._path(object_name)
+        try:
+            # The etag check and the rename happen under one lock, like S3's If-Match
+            with self._object_lock(object_name):
+                if not path.is_file() or self._info(object_name, path)['etag'] != etag:
+                    logger.debug(f"{object_name} was changed by another writer")
+                    return False
+                self._write(object_name, lambda f: f.write(data))
+            logger.info(f"Wrote {object_name} ({len(data):,} bytes)")
+            return True
+        except OSError as e:
+            logger.error(f"Error writing {object_name}: {e}")
+            return False
+
+    @contextmanager
+    def _object_lock(self, object_name: str) -> Iterator[None]:
+        lock_path = self.root / METADATA_DIR / f"{object_name}.lock"
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_csv(self, object_name: str) -> Optional["pd.DataFrame"]:
+        import pandas as pd
+        try:
+            return pd.read_csv(self._path(object_name))
+        except Exception as e:
+            logger.error(f"Error reading CSV {object_name}: {e}")
+            return None
+
+    def list_objects(self, prefix: str = "") -> List[str]:
+        return [obj['name'] for obj in self.list_object_info(prefix)]
+
+    def list_object_info(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """List objects with their size, etag and last-modified time"""
+        # Walk only the directory the prefix points into
+        base = self._path(prefix) if not prefix or prefix.endswith('/') else self._path(prefix).parent
+        if not base.is_dir():
+            return []
+
+        objects = []
+        for path in base.rglob('*'):
+            if not path.is_file() or path.name.startswith('.tmp-'):
+                continue
+            object_name = path.relative_to(self.root).as_posix()
+            if object_name.startswith(METADATA_DIR + '/') or not object_name.startswith(prefix):
+                continue
+            objects.append(self._info(object_name, path))
+        return sorted(objects, key=lambda obj: obj['name'])
+
+    def _info(self, object_name: str, path: Path) -> Dict[str, Any]:
+        stat = path.stat()
+        return {
+            'name': object_name,
+            'size': stat.st_size,
+            # Cheap stand-in for an etag: every write renames a new file (inode) into place
+            'etag': hashlib.md5(f"{stat.st_ino}-{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest(),
+            'last_modified': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+        }
+
+    def stat_object(self, object_name: str) -> Optional[Dict[str, Any]]:
+        """Get size, etag and user metadata of an object, or None if it does not exist"""
+        path = self._path(object_name)
+        if not path.is_file():
+            return None
+        info = self._info(object_name, path)
+        metadata_path = self._metadata_path(object_name)
+        info['metadata'] = json.loads(metadata_path.read_text()) if metadata_path.exists() else {}
+        return info
+
+    def copy_object(self, source_key: str, target_key: str,
+                    metadata: Optional[Dict[str, str]] = None) -> bool:
+        """Copy object within the store, optionally replacing its user metadata"""
+        try:
+            with open(self._path(source_key), 'rb') as source:
+                self._write(target_key, lambda f: shutil.copyfileobj(source, f))
+            if metadata:
+                self._write_metadata(target_key, metadata)
+            logger.info(f"Copied {source_key} -> {target_key}")
+            return True
+        except OSError as e:
+            logger.error(f"Error copying {source_key} to {target_key}: {e}")
+            return False
+
+    def delete_object(self, object_name: str) -> bool:
+        self._path(object_name).unlink(missing_ok=True)
+        self._metadata_path(object_name).unlink(missing_ok=True)
+        logger.info(f"Deleted object: {object_name}")
+        return True
+
+    def get_object_url(self, object_name: str) -> str:
+        """Local path of the object, readable by DuckDB without httpfs"""
+        return str(self._path(object_name))
@@ -1,8 +1,7 @@
 import os
 from io import BytesIO
-from typing import List, Optional, Union
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, Union
 from pathlib import Path
-import pandas as pd
 from minio import Minio
 from minio.error import S3Error
 from loguru import logger
@@ -13,90 +12,208 @@ except ImportError:
     from pathlib import Path
     sys.path.append(str(Path(__file__).parent.parent.parent))
     from src.utils.config import settings
+from src.connect.request_policy import RequestExecutor, RequestFailed, RequestPolicy
+
+if TYPE_CHECKING:
+    # pandas is only imported by the DataFrame helpers that need it
+    import pandas as pd
+
+# Part size of streaming uploads; each part is buffered in memory while it is sent
+UPLOAD_PART_SIZE = 16 * 1024 * 1024
 
 
 class MinIOClient:
-    def __init__(self):
+    def __init__(self, policy: Optional[RequestPolicy] = None):
+        """Connect to MinIO; policy sets timeouts, retries and hedging (default: from settings)"""
+        self.requests = RequestExecutor(policy or RequestPolicy.from_settings(settings))
         self.client = Minio(
             settings.MINIO_ENDPOINT,
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
-            secure=settings.MINIO_SECURE
+            secure=settings.MINIO_SECURE,
+            http_client=self.requests.http_client()
         )
         self.bucket = settings.MINIO_BUCKET
         self._ensure_bucket()
     
     def _ensure_bucket(self):
         try:
-            if not self.client.bucket_exists(self.bucket):
-                self.client.make_bucket(self.bucket)
+            if not self.requests.call('head', lambda: self.client.bucket_exists(self.bucket), bucket=self.bucket):
+                self.requests.call('put', lambda: self.client.make_bucket(self.bucket), bucket=self.bucket)
                 logger.info(f"Created bucket: {self.bucket}")
-        except S3Error as e:
+        except (S3Error, RequestFailed) as e:
             logger.error(f"Error creating bucket: {e}")
             raise
     
     def upload_file(self, local_path: Union[str, Path], object_name: str) -> bool:
         try:
-            self.client.fput_object(self.bucket, object_name, str(local_path))
+            self.requests.call('put', lambda: self.client.fput_object(self.bucket, object_name, str(local_path)),
+                               key=object_name)
             logger.info(f"Uploaded {local_path} to {object_name}")
             return True
-        except S3Error as e:
+        except (S3Error, RequestFailed) as e:
             logger.error(f"Error uploading {local_path}: {e}")
             return False
     
-    def upload_dataframe(self, df: pd.DataFrame, object_name: str, format: str = "parquet") -> bool:
+    def upload_dataframe(self, df: "pd.DataFrame", object_name: str, format: str = "parquet") -> bool:
         try:
             if format.lower() == "parquet":
                 buffer = BytesIO()
                 df.to_parquet(buffer, index=False)
-                buffer.seek(0)
-                self.client.put_object(
-                    self.bucket, 
-                    object_name, 
-                    buffer, 
-                    length=buffer.getbuffer().nbytes,
-                    content_type="application/octet-stream"
-                )
+                self._put_buffer(buffer, object_name, "application/octet-stream")
             elif format.lower() == "csv":
                 csv_buffer = BytesIO()
                 df.to_csv(csv_buffer, index=False)
-                csv_buffer.seek(0)
-                self.client.put_object(
-                    self.bucket,
-                    object_name,
-                    csv_buffer,
-                    length=csv_buffer.getbuffer().nbytes,
-                    content_type="text/csv"
-                )
+                self._put_buffer(csv_buffer, object_name, "text/csv")
             logger.info(f"Uploaded dataframe to {object_name} as {format}")
             return True
         except Exception as e:
             logger.error(f"Error uploading dataframe: {e}")
             return False
     
+    def _put_buffer(self, buffer: BytesIO, object_name: str, content_type: str) -> None:
+        """Upload an in-memory buffer, rewinding it for every attempt"""
+        def put():
+            buffer.seek(0)
+            self.client.put_object(self.bucket, object_name, buffer,
+                                   length=buffer.getbuffer().nbytes, content_type=content_type)
+        self.requests.call('put', put, key=object_name, bytes=buffer.getbuffer().nbytes)
+    
+    def _get(self, object_name: str) -> bytes:
+        """Body of an object, read in full inside one (retried, possibly hedged) request"""
+        def get():
+            response = self.client.get_object(self.bucket, object_name)
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        return self.requests.call('get', get, hedge=True, key=object_name)
+    
     def download_file(self, object_name: str, local_path: Union[str, Path]) -> bool:
         try:
-            self.client.fget_object(self.bucket, object_name, str(local_path))
+            self.requests.call('get', lambda: self.client.fget_object(self.bucket, object_name, str(local_path)),
+                               key=object_name)
             logger.info(f"Downloaded {object_name} to {local_path}")
             return True
-        except S3Error as e:
+        except (S3Error, RequestFailed) as e:
             logger.error(f"Error downloading {object_name}: {e}")
             return False
     
-    def read_parquet(self, object_name: str) -> Optional[pd.DataFrame]:
+    def read_parquet(self, object_name: str) -> Optional["pd.DataFrame"]:
+        import pandas as pd
         try:
-            response = self.client.get_object(self.bucket, object_name)
-            df = pd.read_parquet(BytesIO(response.data))
+            df = pd.read_parquet(BytesIO(self._get(object_name)))
             logger.info(f"Read parquet file: {object_name}")
             return df
         except Exception as e:
             logger.error(f"Error reading parquet {object_name}: {e}")
             return None
     
-    def read_csv(self, object_name: str) -> Optional[pd.DataFrame]:
+    def open_object(self, object_name: str):
+        """Readable streaming response for an object; the caller closes it
+        
+        Opening the response is retried; reading the body streams outside the policy.
+        """
+        return self.requests.call('get', lambda: self.client.get_object(self.bucket, object_name), key=object_name)
+    
+    def upload_stream(self, stream: BinaryIO, object_name: str,
+                      content_type: str = "application/octet-stream",
+                      metadata: Optional[Dict[str, str]] = None) -> bool:
+        """Upload a readable stream of unknown length as a multipart upload"""
         try:
-            response = self.client.get_object(self.bucket, object_name)
-            df = pd.read_csv(BytesIO(response.data))
+            # A consumed stream cannot be sent again, so this request is not retried
+            self.requests.call('put', lambda: self.client.put_object(
+                self.bucket,
+                object_name,
+                stream,
+                length=-1,
+                part_size=UPLOAD_PART_SIZE,
+                content_type=content_type,
+                metadata=metadata
+            ), retry=False, key=object_name)
+            logger.info(f"Uploaded stream to {object_name}")
+            return True
+        except (S3Error, RequestFailed) as e:
+            logger.error(f"Error uploading {object_name}: {e}")
+            return False
+    
+    def read_bytes(self, object_name: str) -> Optional[bytes]:
+        try:
+            return self._get(object_name)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return None
+            logger.error(f"Error reading {object_name}: {e}")
+            return None
+        except RequestFailed as e:
+            logger.error(f"Error reading {object_name}: {e}")
+            return None
+    
+    def upload_bytes(self, data: bytes, object_name: str,
+                     content_type: str = "application/octet-stream") -> bool:
+        try:
+            self._put_buffer(BytesIO(data), object_name, content_type)
+            logger.info(f"Uploaded {len(data):,} bytes to {object_name}")
+            return True
+        except (S3Error, RequestFailed) as e:
+            logger.error(f"Error uploading {object_name}: {e}")
+            return False
+    
+    def create_object(self, data: bytes, object_name: str,
+                      content_type: str = "application/octet-stream") -> bool:
+        """Write an object only if it does not exist yet (conditional PUT with If-None-Match)
+        
+        Returns False when the object already exists, so concurrent writers racing
+        for the same key learn that exactly one of them won.
+        
+        Raises:
+            RequestFailed: The request failed in transit; the object may or may not have
+                been written, so the caller has to read it back to find out
+        """
+        return self._put_conditional(data, object_name, {"If-None-Match": "*"}, content_type)
+    
+    def replace_object(self, data: bytes, object_name: str, etag: Optional[str],
+                       content_type: str = "application/octet-stream") -> bool:
+        """Overwrite an object only if it still has etag (conditional PUT with If-Match)
+        
+        With etag None the object is only created if it does not exist yet. Returns
+        False when another writer changed (or created) the object first, so a
+        read-modify-write can start over from the new version.
+        
+        Raises:
+            RequestFailed: The request failed in transit; the object may or may not have
+                been written
+        """
+        if etag is None:
+            return self.create_object(data, object_name, content_type)
+        return self._put_conditional(data, object_name, {"If-Match": f'"{etag.strip(chr(34))}"'}, content_type)
+    
+    def _put_conditional(self, data: bytes, object_name: str, condition: Dict[str, str],
+                         content_type: str) -> bool:
+        """PUT with a precondition header; False when the precondition does not hold"""
+        try:
+            # Sent once: a retry after a lost response would see PreconditionFailed for its own write.
+            # Private _put_object (minio pinned to 7.2.x): put_object sends its metadata as x-amz-meta-*
+            self.requests.call('put', lambda: self.client._put_object(
+                self.bucket,
+                object_name,
+                data,
+                headers={"Content-Type": content_type, **condition}
+            ), retry=False, key=object_name, bytes=len(data))
+            logger.info(f"Wrote {object_name} ({len(data):,} bytes)")
+            return True
+        except S3Error as e:
+            if e.code in ("PreconditionFailed", "ConditionalRequestConflict"):
+                logger.debug(f"{object_name} was changed by another writer")
+                return False
+            logger.error(f"Error writing {object_name}: {e}")
+            return False
+    
+    def read_csv(self, object_name: str) -> Optional["pd.DataFrame"]:
+        import pandas as pd
+        try:
+            df = pd.read_csv(BytesIO(self._get(object_name)))
             logger.info(f"Read CSV file: {object_name}")
             return df
         except Exception as e:
@@ -105,32 +222,93 @@ class MinIOClient:
     
     def list_objects(self, prefix: str = "") -> List[str]:
         try:
-            objects = self.client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            objects = self.requests.call('list', lambda: list(
+                self.client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            ), prefix=prefix)
             return [obj.object_name for obj in objects]
-        except S3Error as e:
+        except (S3Error, RequestFailed) as e:
+            logger.error(f"Error listing objects: {e}")
+            return []
+    
+    def list_object_info(self, prefix: str = "") -> List[Dict[str, Any]]:
+        """List objects with their size, etag and last-modified time"""
+        try:
+            objects = self.requests.call('list', lambda: list(
+                self.client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            ), prefix=prefix)
+            return [
+                {
+                    'name': obj.object_name,
+                    'size': obj.size,
+                    'etag': obj.etag,
+                    'last_modified': obj.last_modified
+                }
+                for obj in objects
+            ]
+        except (S3Error, RequestFailed) as e:
             logger.error(f"Error listing objects: {e}")
             return []
     
-    def copy_object(self, source_key: str, target_key: str) -> bool:
-        """Copy object within the same bucket"""
+    def stat_object(self, object_name: str) -> Optional[Dict[str, Any]]:
+        """Get size, etag and user metadata of an object, or None if it does not exist"""
         try:
-            from minio.commonconfig import CopySource
+            obj = self.requests.call('head', lambda: self.client.stat_object(self.bucket, object_name),
+                                     hedge=True, key=object_name)
+        except S3Error as e:
+            if e.code in ("NoSuchKey", "NoSuchObject", "ResourceNotFound"):
+                return None
+            logger.error(f"Error reading object info for {object_name}: {e}")
+            return None
+        except RequestFailed as e:
+            logger.error(f"Error reading object info for {object_name}: {e}")
+            return None
+        
+        user_metadata = {}
+        for key, value in (obj.metadata or {}).items():
+            key = key.lower()
+            if key.startswith("x-amz-meta-"):
+                user_metadata[key[len("x-amz-meta-"):]] = value
+        
+        return {
+            'name': object_name,
+            'size': obj.size,
+            'etag': obj.etag,
+            'last_modified': obj.last_modified,
+            'metadata': user_metadata
+        }
+    
+    def copy_object(self, source_key: str, target_key: str,
+                    metadata: Optional[Dict[str, str]] = None) -> bool:
+        """Copy object within the same bucket, optionally replacing its user metadata"""
+        try:
+            from minio.commonconfig import CopySource, REPLACE
             copy_source = CopySource(self.bucket, source_key)
-            self.client.copy_object(self.bucket, target_key, copy_source)
+            if metadata:
+                self.requests.call('copy', lambda: self.client.copy_object(
+                    self.bucket, target_key, copy_source, metadata=metadata, metadata_directive=REPLACE
+                ), key=target_key)
+            else:
+                self.requests.call('copy', lambda: self.client.copy_object(self.bucket, target_key, copy_source),
+                                   key=target_key)
             logger.info(f"Copied {source_key} -> {target_key}")
             return True
-        except S3Error as e:
+        except (S3Error, RequestFailed) as e:
             logger.error(f"Error copying {source_key} to {target_key}: {e}")
             return False
 
     def delete_object(self, object_name: str) -> bool:
         try:
-            self.client.remove_object(self.bucket, object_name)
+            self.requests.call('delete', lambda: self.client.remove_object(self.bucket, object_name),
+                                   key=object_name)
             logger.info(f"Deleted object: {object_name}")
             return True
-        except S3Error as e:
+        except (S3Error, RequestFailed) as e:
             logger.error(f"Error deleting {object_name}: {e}")
             return False
     
+    def request_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation request counts, retries, hedges and latency percentiles (ms)"""
+        return self.requests.summary()
+    
     def get_object_url(self, object_name: str) -> str:
         return f"s3://{self.bucket}/{object_name}"
\ No newline at end of file
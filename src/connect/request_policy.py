@@ -0,0 +1,317 @@
+"""Timeouts, retries and hedged requests for object-store calls
+
+MinIOClient runs every S3 call through a RequestExecutor:
+
+- each operation ('get', 'head', 'list', 'put', 'copy', 'delete') has its own
+  read timeout, applied by the urllib3 pool the Minio client sends through;
+- transient failures (timeouts, dropped connections, 5xx/SlowDown) are retried
+  with full-jitter exponential backoff;
+- idempotent reads can be hedged: when a GET has not finished after the
+  operation's hedge_percentile latency, a duplicate is sent and the first
+  response wins, so one stalled request no longer sets a stage's duration.
+
+Latencies are kept per operation in log-bucketed histograms, which also supply
+the hedging threshold.
+"""
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+import urllib3
+from loguru import logger
+
+from minio.error import InvalidResponseError, S3Error, ServerError
+
+from src.utils.tracing import span
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_TIMEOUTS = {
+    'get': 30.0,
+    'head': 10.0,
+    'list': 30.0,
+    'put': 120.0,
+    'copy': 120.0,
+    'delete': 10.0,
+}
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BACKOFF_BASE = 0.1
+DEFAULT_BACKOFF_MAX = 5.0
+# Latencies seen before the hedging threshold is trusted
+DEFAULT_HEDGE_MIN_SAMPLES = 50
+DEFAULT_HEDGE_MIN_DELAY = 0.02
+HEDGE_WORKERS = 64
+POOL_MAXSIZE = 32
+
+RETRYABLE_S3_CODES = {'InternalError', 'ServiceUnavailable', 'SlowDown', 'RequestTimeout',
+                      'XMinioServerNotInitialized'}
+
+# Histogram buckets grow by 2**(1/4) (~19%) from 0.5ms to ~2 minutes
+BUCKET_GROWTH = 2 ** 0.25
+BUCKET_START = 0.0005
+BUCKET_COUNT = 72
+
+
+class RequestFailed(Exception):
+    """A request kept failing with transport errors until its attempts ran out"""
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram; percentiles are accurate to one bucket (~19%)"""
+
+    def __init__(self):
+        self.counts = [0] * (BUCKET_COUNT + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(seconds: float) -> int:
+        bucket, bound = 0, BUCKET_START
+        while seconds > bound and bucket < BUCKET_COUNT:
+            bucket += 1
+            bound *= BUCKET_GROWTH
+        return bucket
+
+    def record(self, seconds: float) -> None:
+        bucket = self._bucket(seconds)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th percentile (q in 0-100), None when empty"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = q / 100 * self.count
+            seen = 0
+            for bucket, count in enumerate(self.counts):
+                seen += count
+                if seen >= target and count:
+                    return min(BUCKET_START * BUCKET_GROWTH ** bucket, self.max)
+            return self.max
+
+
+class RequestPolicy:
+    """Timeouts, retry and hedging settings for object-store requests"""
+
+    def __init__(self, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX,
+                 hedge_percentile: Optional[float] = None,
+                 hedge_min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+                 hedge_min_delay: float = DEFAULT_HEDGE_MIN_DELAY):
+        """Initialize the policy
+
+        Args:
+            connect_timeout: Seconds to establish a connection
+            timeouts: Operation -> read timeout in seconds, merged over DEFAULT_TIMEOUTS
+            max_attempts: Attempts per request, including the first
+            backoff_base: Backoff cap after the first failure; doubles per attempt
+            backoff_max: Largest backoff between attempts
+            hedge_percentile: Send a duplicate GET/HEAD once a request is slower than
+                this percentile of its operation's latencies, e.g. 95; None disables hedging
+            hedge_min_samples: Latencies needed before hedging starts
+            hedge_min_delay: Never hedge earlier than this many seconds
+        """
+        self.connect_timeout = connect_timeout
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+
+    @classmethod
+    def from_settings(cls, settings) -> "RequestPolicy":
+        """Policy from MINIO_* settings, with defaults for those left unset"""
+        timeouts = {}
+        if settings.MINIO_READ_TIMEOUT:
+            timeouts.update({op: settings.MINIO_READ_TIMEOUT for op in ('get', 'head', 'list', 'delete')})
+        if settings.MINIO_WRITE_TIMEOUT:
+            timeouts.update({op: settings.MINIO_WRITE_TIMEOUT for op in ('put', 'copy')})
+        return cls(
+            connect_timeout=settings.MINIO_CONNECT_TIMEOUT or DEFAULT_CONNECT_TIMEOUT,
+            timeouts=timeouts,
+            max_attempts=settings.MINIO_MAX_ATTEMPTS or DEFAULT_MAX_ATTEMPTS,
+            hedge_percentile=settings.MINIO_HEDGE_PERCENTILE
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter delay before retry number attempt (1-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+class _OperationTimeoutPoolManager(urllib3.PoolManager):
+    """PoolManager applying the read timeout of the operation running on this thread"""
+
+    def __init__(self, executor: "RequestExecutor", **kwargs):
+        super().__init__(**kwargs)
+        self._executor = executor
+
+    def urlopen(self, method, url, redirect=True, **kwargs):
+        kwargs['timeout'] = self._executor.current_timeout()
+        return super().urlopen(method, url, redirect=redirect, **kwargs)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed request may succeed when sent again"""
+    if isinstance(error, S3Error):
+        return error.code in RETRYABLE_S3_CODES
+    if isinstance(error, ServerError):
+        return True
+    if isinstance(error, InvalidResponseError):
+        # Non-XML error bodies, e.g. a 502/503 from a proxy in front of MinIO
+        return True
+    return isinstance(error, (urllib3.exceptions.HTTPError, ConnectionError, TimeoutError))
+
+
+class RequestExecutor:
+    """Run object-store calls under a RequestPolicy and record their latencies"""
+
+    def __init__(self, policy: RequestPolicy):
+        self.policy = policy
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+
+    def http_client(self) -> urllib3.PoolManager:
+        """urllib3 pool for the Minio client; retries are left to the executor"""
+        return _OperationTimeoutPoolManager(
+            self,
+            timeout=urllib3.Timeout(connect=self.policy.connect_timeout, read=self.policy.timeouts['get']),
+            maxsize=POOL_MAXSIZE,
+            retries=False
+        )
+
+    def current_timeout(self) -> urllib3.Timeout:
+        operation = getattr(self._local, 'operation', 'get')
+        return urllib3.Timeout(connect=self.policy.connect_timeout, read=self.policy.timeouts[operation])
+
+    def _count(self, operation: str, counter: str) -> None:
+        with self._lock:
+            counters = self.counters.setdefault(
+                operation, {'requests': 0, 'errors': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0}
+            )
+            counters[counter] += 1
+
+    def _histogram(self, operation: str) -> LatencyHistogram:
+        with self._lock:
+            return self.histograms.setdefault(operation, LatencyHistogram())
+
+    def call(self, operation: str, fn: Callable[[], Any], hedge: bool = False, retry: bool = True,
+             **attributes: Any) -> Any:
+        """Run fn as one request of operation, retrying transient failures
+
+        Args:
+            operation: Key of the policy's timeouts, e.g. 'get'
+            fn: Issues the request and consumes its response; must be safe to run twice
+                when retry or hedge is set
+            hedge: Allow a duplicate request once this one is slower than the hedging threshold
+            retry: Retry transient failures (disable for requests whose body cannot be resent)
+            attributes: Added to the request's tracing span, e.g. key=object_name
+
+        Raises:
+            The request's S3Error when it is not transient, RequestFailed when transient
+            failures outlast the attempts.
+        """
+        with span(f"s3.{operation}", **attributes) as request_span:
+            result = self._call(operation, fn, hedge, retry, request_span)
+            if isinstance(result, bytes):
+                request_span.set(bytes=len(result))
+            return result
+
+    def _call(self, operation: str, fn: Callable[[], Any], hedge: bool, retry: bool, request_span) -> Any:
+        attempts = self.policy.max_attempts if retry else 1
+        for attempt in range(1, attempts + 1):
+            request_span.set(attempts=attempt)
+            try:
+                if hedge and self.policy.hedge_percentile:
+                    return self._hedged(operation, fn)
+                return self._timed(operation, fn)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt == attempts:
+                    raise RequestFailed(f"{operation} failed after {attempts} attempts: {e}") from e
+                delay = self.policy.backoff(attempt)
+                self._count(operation, 'retries')
+                logger.debug(f"Retrying {operation} in {delay:.2f}s after: {e}")
+                time.sleep(delay)
+
+    def _timed(self, operation: str, fn: Callable[[], Any]) -> Any:
+        self._local.operation = operation
+        self._count(operation, 'requests')
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except S3Error as e:
+            # Answered requests (e.g. NoSuchKey) still tell how fast the store responds
+            if not is_retryable(e):
+                self._histogram(operation).record(time.perf_counter() - started)
+            self._count(operation, 'errors')
+            raise
+        except Exception:
+            self._count(operation, 'errors')
+            raise
+        self._histogram(operation).record(time.perf_counter() - started)
+        return result
+
+    def _hedged(self, operation: str, fn: Callable[[], Any]) -> Any:
+        histogram = self._histogram(operation)
+        if histogram.count < self.policy.hedge_min_samples:
+            return self._timed(operation, fn)
+        delay = max(histogram.percentile(self.policy.hedge_percentile), self.policy.hedge_min_delay)
+
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+        primary = self._hedge_pool.submit(self._timed, operation, fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        self._count(operation, 'hedges')
+        hedge = self._hedge_pool.submit(self._timed, operation, fn)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count(operation, 'hedge_wins')
+                    # The slower request finishes in the background and is discarded
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-operation request counts and latency percentiles in ms"""
+        summary = {}
+        for operation, histogram in sorted(self.histograms.items()):
+            def ms(q: float) -> Optional[float]:
+                value = histogram.percentile(q)
+                return round(value * 1000, 1) if value is not None else None
+            summary[operation] = {
+                **self.counters.get(operation, {}),
+                'p50_ms': ms(50),
+                'p95_ms': ms(95),
+                'p99_ms': ms(99),
+                'max_ms': round(histogram.max * 1000, 1)
+            }
+        return summary
+
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
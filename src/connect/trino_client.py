@@ -1,6 +1,7 @@
-import trino
-import pandas as pd
-from typing import Optional, List, Dict, Any, Union
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, List, Dict, Any, Tuple, Union
 from pathlib import Path
 from loguru import logger
 
@@ -14,34 +15,116 @@ except ImportError:
 
 from src.connect.minio_client import MinIOClient
 
+if TYPE_CHECKING:
+    # trino and pandas are imported on first use to keep job startup fast
+    import pandas as pd
+    import trino
+
+# Catalog lookups are answered from the cache for this long
+DEFAULT_METADATA_TTL_SECONDS = 300
+# Statements that change the catalog; they drop the metadata cache
+DDL_PATTERN = re.compile(r"^\s*(CREATE|DROP|ALTER|COMMENT|CALL)\b", re.IGNORECASE)
+
+
+class MetadataCache:
+    """TTL-bounded cache of table lists and table columns per schema"""
+    
+    def __init__(self, ttl_seconds: float = DEFAULT_METADATA_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._tables: Dict[str, Tuple[float, List[str]]] = {}
+        self._columns: Dict[Tuple[str, str], Tuple[float, List[Dict[str, str]]]] = {}
+        self._lock = threading.Lock()
+    
+    def tables(self, schema: str) -> Optional[List[str]]:
+        """Cached table names of schema, None when not cached or expired"""
+        with self._lock:
+            entry = self._tables.get(schema)
+            if entry and entry[0] > time.monotonic():
+                return list(entry[1])
+            return None
+    
+    def put_tables(self, schema: str, tables: List[str]) -> None:
+        with self._lock:
+            self._tables[schema] = (time.monotonic() + self.ttl_seconds, list(tables))
+    
+    def columns(self, schema: str, names: List[str]) -> Tuple[Dict[str, List[Dict[str, str]]], List[str]]:
+        """(cached columns by table, names not cached); missing tables are cached as []"""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for name in dict.fromkeys(names):
+                entry = self._columns.get((schema, name))
+                if entry and entry[0] > now:
+                    found[name] = [dict(column) for column in entry[1]]
+                else:
+                    missing.append(name)
+        return found, missing
+    
+    def put_columns(self, schema: str, columns: Dict[str, List[Dict[str, str]]]) -> None:
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            for name, table_columns in columns.items():
+                self._columns[(schema, name)] = (expires, [dict(column) for column in table_columns])
+    
+    def invalidate(self, schema: str, name: str) -> None:
+        with self._lock:
+            self._tables.pop(schema, None)
+            self._columns.pop((schema, name), None)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._tables.clear()
+            self._columns.clear()
+
 
 class TrinoClient:
     """Trino client for querying data lake - Athena-like functionality"""
     
     def __init__(self, host: str = "localhost", port: int = 8081, catalog: str = "hive", 
-                 user: str = "admin", minio_client: Optional[MinIOClient] = None):
+                 user: str = "admin", minio_client: Optional[MinIOClient] = None,
+                 schema: str = "default", connection: Any = None,
+                 metadata_ttl_seconds: float = DEFAULT_METADATA_TTL_SECONDS):
+        """Initialize Trino client
+        
+        Args:
+            schema: Schema of unqualified table names
+            connection: DB-API connection to use instead of connecting to Trino
+            metadata_ttl_seconds: How long table lists and columns are cached
+        """
         self.host = host
         self.port = port
         self.catalog = catalog
         self.user = user
+        self.schema = schema
         self.minio_client = minio_client
+        self.metadata = MetadataCache(metadata_ttl_seconds)
         
-        # Create Trino connection
-        self.conn = trino.dbapi.connect(
-            host=self.host,
-            port=self.port,
-            user=self.user,
-            catalog=self.catalog,
-            schema="default"
-        )
-        
-        logger.info(f"Connected to Trino at {host}:{port} (catalog: {catalog})")
+        # Trino connection, opened on first query
+        self._conn = connection
+    
+    @property
+    def conn(self) -> "trino.dbapi.Connection":
+        """Trino connection, created (and the trino driver imported) on first use"""
+        if self._conn is None:
+            import trino
+            self._conn = trino.dbapi.connect(
+                host=self.host,
+                port=self.port,
+                user=self.user,
+                catalog=self.catalog,
+                schema=self.schema
+            )
+            logger.info(f"Connected to Trino at {self.host}:{self.port} (catalog: {self.catalog})")
+        return self._conn
         
-    def execute_query(self, query: str, parameters: Optional[List[Any]] = None) -> trino.dbapi.Cursor:
+    def execute_query(self, query: str, parameters: Optional[List[Any]] = None) -> "trino.dbapi.Cursor":
         """Execute SQL query and return cursor"""
         try:
             cursor = self.conn.cursor()
             cursor.execute(query, parameters)
+            if DDL_PATTERN.match(query):
+                # Catalog changed; cached lookups may be stale
+                self.metadata.clear()
             logger.debug(f"Executed Trino query: {query[:100]}...")
             return cursor
         except Exception as e:
@@ -49,8 +132,9 @@ class TrinoClient:
             logger.error(f"Query: {query}")
             raise
     
-    def query_to_df(self, query: str, parameters: Optional[List[Any]] = None) -> pd.DataFrame:
+    def query_to_df(self, query: str, parameters: Optional[List[Any]] = None) -> "pd.DataFrame":
         """Execute query and return results as DataFrame"""
+        import pandas as pd
         try:
             cursor = self.execute_query(query, parameters)
             
@@ -141,66 +225,103 @@ class TrinoClient:
             logger.error(f"Error dropping table {table_name}: {e}")
             return False
     
-    def table_exists(self, table_name: str, schema: str = "default") -> bool:
-        """Check if table exists"""
+    def _cached_columns(self, schema: str, names: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        """Columns of names from the cache, fetching all uncached tables in one query"""
+        found, missing = self.metadata.columns(schema, names)
+        if missing:
+            placeholders = ", ".join("?" for _ in missing)
+            cursor = self.execute_query(f"""
+                SELECT table_name, column_name, data_type, is_nullable
+                FROM information_schema.columns
+                WHERE table_schema = ?
+                AND table_name IN ({placeholders})
+                ORDER BY table_name, ordinal_position
+            """, [schema] + missing)
+            fetched: Dict[str, List[Dict[str, str]]] = {name: [] for name in missing}
+            for table_name, column_name, data_type, is_nullable in cursor.fetchall():
+                fetched.setdefault(table_name, []).append(
+                    {"column": column_name, "type": data_type, "nullable": is_nullable}
+                )
+            # Tables without columns do not exist; that is cached too
+            self.metadata.put_columns(schema, fetched)
+            found.update(fetched)
+        return found
+    
+    def describe_tables(self, table_names: List[str], schema: Optional[str] = None) -> Dict[str, List[Dict[str, str]]]:
+        """Columns of several tables in one round trip
+        
+        Returns table name -> [{'column', 'type', 'nullable'}] in column order; tables
+        that do not exist map to an empty list. Answers from the metadata cache where
+        it can and fetches the rest with a single information_schema query.
+        """
+        schema, names = self._split_names(table_names, schema)
         try:
-            result_df = self.query_to_df(f"""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = '{schema}' 
-                AND table_name = '{table_name}'
-            """)
-            return len(result_df) > 0
+            columns = self._cached_columns(schema, names)
         except Exception as e:
-            logger.error(f"Error checking if table exists: {e}")
-            return False
+            logger.error(f"Error describing tables: {e}")
+            return {}
+        return {original: columns.get(name, []) for original, name in zip(table_names, names)}
+    
+    def table_exists(self, table_name: str, schema: Optional[str] = None) -> bool:
+        """Check if table exists"""
+        return bool(self.describe_tables([table_name], schema).get(table_name))
     
-    def list_tables(self, schema: str = "default") -> List[str]:
+    def list_tables(self, schema: Optional[str] = None) -> List[str]:
         """List all tables in schema"""
+        schema = (schema or self.schema).lower()
+        tables = self.metadata.tables(schema)
+        if tables is not None:
+            return tables
         try:
-            result_df = self.query_to_df(f"""
+            cursor = self.execute_query("""
                 SELECT table_name 
                 FROM information_schema.tables 
-                WHERE table_schema = '{schema}'
+                WHERE table_schema = ?
                 ORDER BY table_name
-            """)
-            return result_df['table_name'].tolist() if not result_df.empty else []
+            """, [schema])
+            tables = [row[0] for row in cursor.fetchall()]
         except Exception as e:
             logger.error(f"Error listing tables: {e}")
             return []
+        self.metadata.put_tables(schema, tables)
+        return list(tables)
     
-    def get_table_schema(self, table_name: str, schema: str = "default") -> List[Dict[str, str]]:
+    def get_table_schema(self, table_name: str, schema: Optional[str] = None) -> List[Dict[str, str]]:
         """Get table schema information"""
-        try:
-            result_df = self.query_to_df(f"""
-                SELECT column_name, data_type, is_nullable
-                FROM information_schema.columns 
-                WHERE table_schema = '{schema}' 
-                AND table_name = '{table_name}'
-                ORDER BY ordinal_position
-            """)
-            
-            if result_df.empty:
-                return []
-            
-            return [
-                {
-                    "column": row["column_name"],
-                    "type": row["data_type"],
-                    "nullable": row["is_nullable"]
-                }
-                for _, row in result_df.iterrows()
-            ]
-        except Exception as e:
-            logger.error(f"Error getting table schema: {e}")
-            return []
+        return self.describe_tables([table_name], schema).get(table_name, [])
+    
+    def _split_names(self, table_names: List[str], schema: Optional[str] = None):
+        """Schema and bare lowercase table names; names may be qualified as schema.table"""
+        schemas = set()
+        names = []
+        for table_name in table_names:
+            table_schema, name = self._split_name(table_name, schema)
+            schemas.add(table_schema)
+            names.append(name)
+        if len(schemas) > 1:
+            raise ValueError(f"Tables from several schemas in one lookup: {sorted(schemas)}")
+        return (schemas.pop() if schemas else (schema or self.schema).lower()), names
+    
+    def _split_name(self, table_name: str, schema: Optional[str] = None):
+        parts = table_name.lower().split(".")
+        if len(parts) > 1:
+            return parts[-2], parts[-1]
+        return (schema or self.schema).lower(), parts[0]
+    
+    def invalidate_metadata(self, table_name: Optional[str] = None) -> None:
+        """Forget cached metadata of one table (and its schema's table list), or of everything"""
+        if table_name is None:
+            self.metadata.clear()
+        else:
+            self.metadata.invalidate(*self._split_name(table_name))
     
-    def show_partitions(self, table_name: str) -> pd.DataFrame:
+    def show_partitions(self, table_name: str) -> "pd.DataFrame":
         """Show table partitions (if partitioned)"""
         try:
             return self.query_to_df(f"SHOW PARTITIONS {table_name}")
         except Exception as e:
             logger.warning(f"Could not show partitions for {table_name}: {e}")
+            import pandas as pd
             return pd.DataFrame()
     
     def analyze_table(self, table_name: str) -> bool:
@@ -215,8 +336,9 @@ class TrinoClient:
     
     def close(self):
         """Close Trino connection"""
-        if hasattr(self, 'conn') and self.conn:
-            self.conn.close()
+        if self._conn:
+            self._conn.close()
+            self._conn = None
             logger.info("Trino connection closed")
 
 
@@ -296,8 +418,12 @@ class DataLakeManager:
             }
         }
         
-        # Create external tables
+        # One catalog lookup for all tables; only missing ones are created
+        existing = self.trino.describe_tables(list(table_configs))
         for table_name, config in table_configs.items():
+            if existing.get(table_name):
+                logger.debug(f"External table {table_name} already exists")
+                continue
             self.trino.create_external_table(
                 table_name=table_name,
                 schema_dict=config["schema"],
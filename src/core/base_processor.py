@@ -1,9 +1,12 @@
+import time
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 from datetime import datetime
 from loguru import logger
 
+from src.utils.tracing import span
+
 from enum import Enum
 
 
@@ -55,6 +58,7 @@ class BaseProcessor(ABC):
         self.description = description
         self._start_time: Optional[datetime] = None
         self._end_time: Optional[datetime] = None
+        self.phase_seconds: Dict[str, float] = {}
         self.args = None  # Will be set by job manager if needed
     
     def set_args(self, args):
@@ -65,14 +69,15 @@ class BaseProcessor(ABC):
         """Template method that orchestrates the ETL process"""
         logger.info(f"Starting processor: {self.processor_id}")
         self._start_time = datetime.now()
+        self.phase_seconds = {}
         
         try:
             # Template method pattern - define the algorithm
-            self._pre_process()
-            extracted_data = self._extract()
-            transformed_data = self._transform(extracted_data)
-            load_result = self._load(transformed_data)
-            self._post_process(load_result)
+            self._timed_phase('pre_process', self._pre_process)
+            extracted_data = self._timed_phase('extract', self._extract)
+            transformed_data = self._timed_phase('transform', self._transform, extracted_data)
+            load_result = self._timed_phase('load', self._load, transformed_data)
+            self._timed_phase('post_process', self._post_process, load_result)
             
             self._end_time = datetime.now()
             duration = (self._end_time - self._start_time).total_seconds()
@@ -89,7 +94,8 @@ class BaseProcessor(ABC):
                 metadata={
                     **load_result.metadata,
                     "rows_processed": load_result.rows_processed,
-                    "tables_created": load_result.tables_created
+                    "tables_created": load_result.tables_created,
+                    "phase_seconds": dict(self.phase_seconds)
                 }
             )
             
@@ -105,9 +111,19 @@ class BaseProcessor(ABC):
                 start_time=self._start_time,
                 end_time=self._end_time,
                 duration_seconds=duration,
-                error=str(e)
+                error=str(e),
+                metadata={"phase_seconds": dict(self.phase_seconds)}
             )
     
+    def _timed_phase(self, phase: str, fn, *args) -> Any:
+        """Run one ETL phase and record its wall time in phase_seconds"""
+        started = time.perf_counter()
+        try:
+            with span(f"phase.{phase}", processor=self.processor_id):
+                return fn(*args)
+        finally:
+            self.phase_seconds[phase] = time.perf_counter() - started
+    
     def _pre_process(self) -> None:
         """Hook for pre-processing setup (optional override)"""
         pass
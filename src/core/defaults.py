@@ -0,0 +1,31 @@
+"""Stage defaults shared by processors and their job CLIs
+
+Kept free of heavy imports so job scripts can build their argument parsers
+without loading the processors behind them.
+"""
+
+# landing -> raw
+RAW_COMPRESSIONS = ['none', 'gzip', 'zstd']
+DEFAULT_RAW_COMPRESSION = 'none'
+
+# raw -> trusted
+ENGINES = ['pandas', 'duckdb']
+DEFAULT_ENGINE = 'pandas'
+DEFAULT_PIPELINE_WORKERS = 4
+DEFAULT_PIPELINE_QUEUE_SIZE = 2
+DIMENSION_MODES = ['snapshot', 'scd2']
+DEFAULT_DIMENSION_MODE = 'snapshot'
+# Processes decoding the events JSONL; 0 = one per CPU, 1 = decode in-process
+DEFAULT_PARSE_WORKERS = 0
+
+# Streaming landing -> trusted
+DEFAULT_STREAM_POLL_SECONDS = 10
+DEFAULT_STREAM_BATCH_FILES = 50
+
+# Trusted compaction
+DEFAULT_TARGET_FILE_SIZE_MB = 128
+# Replaced trusted files are kept this long for readers of older manifest versions
+DEFAULT_RETENTION_HOURS = 1
+
+# Run history (every job run; compared by src/jobs/compare_runs.py)
+DEFAULT_RUN_HISTORY_PATH = 'run_history/runs.sqlite'
@@ -1,11 +1,13 @@
 import argparse
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 from datetime import datetime
 import sys
 from pathlib import Path
 from loguru import logger
 
+from src.utils.tracing import finish_tracing, span, start_tracing
+
 
 class BaseJobManager(ABC):
     """Base job manager class that handles arguments and logging"""
@@ -15,6 +17,9 @@ class BaseJobManager(ABC):
         self.args: Optional[argparse.Namespace] = None
         self.start_time: Optional[datetime] = None
         self.end_time: Optional[datetime] = None
+        # Metadata and error of the run, appended to the run history when it ends
+        self.run_metadata: Dict[str, Any] = {}
+        self.run_error: Optional[str] = None
         
     def setup_args(self) -> argparse.ArgumentParser:
         """Setup command line arguments"""
@@ -31,6 +36,15 @@ class BaseJobManager(ABC):
                           help="Target S3 path")
         parser.add_argument("--debug", action="store_true", 
                           help="Enable debug logging")
+        parser.add_argument("--dry_run", action="store_true",
+                          help="Parse arguments and set up logging, then exit without running")
+        parser.add_argument("--run_history", type=str,
+                          help="Run history database to append this run to "
+                               "(default: RUN_HISTORY_PATH or run_history/runs.sqlite)")
+        parser.add_argument("--no_run_history", action="store_true",
+                          help="Do not record this run in the run history")
+        parser.add_argument("--trace_dir", type=str,
+                          help="Write a Chrome trace of this run's spans to this directory")
         
         # Allow subclasses to add more arguments
         self.add_custom_args(parser)
@@ -75,6 +89,26 @@ class BaseJobManager(ABC):
         else:
             self.logger.error(f"{self.job_name} failed after {duration:.2f}s")
     
+    def record_run(self, success: bool):
+        """Append this run, its metrics and environment to the run history
+        
+        A history that cannot be written is logged and never fails the job.
+        """
+        if self.args.no_run_history:
+            return
+        try:
+            from src.utils.run_history import open_run_history
+            history = open_run_history(self.args.run_history)
+            try:
+                run_id = history.record(self.job_name, success, self.start_time, self.end_time,
+                                        args=vars(self.args), metadata=self.run_metadata,
+                                        error=self.run_error)
+            finally:
+                history.conn.close()
+            self.logger.debug(f"Recorded run {run_id} in {history.path}")
+        except Exception as e:
+            self.logger.warning(f"Could not record run history: {e}")
+    
     @abstractmethod
     def run(self) -> bool:
         """Override this method to implement job logic"""
@@ -93,15 +127,30 @@ class BaseJobManager(ABC):
         self.setup_logging()
         self.log_job_start()
         
+        if self.args.dry_run:
+            self.logger.info("Dry run: skipping job execution")
+            self.log_job_end(True)
+            return 0
+        
+        tracer = start_tracing(self.job_name, self.args.trace_dir)
         try:
-            success = self.run()
+            with span(f"job.{self.job_name}", env=self.args.env,
+                      ingestion_date=self.args.ingestion_date) as job_span:
+                success = self.run()
+                job_span.set(success=success)
             self.log_job_end(success)
+            self.record_run(success)
             return 0 if success else 1
             
         except Exception as e:
             self.logger.error(f"💥 {self.job_name} crashed: {e}")
+            self.run_error = str(e)
             self.log_job_end(False)
+            self.record_run(False)
             return 1
+        finally:
+            if tracer:
+                self.logger.info(f"Trace {tracer.trace_id} written to {finish_tracing()}")
 
 
 class JobManager(BaseJobManager):
@@ -110,13 +159,32 @@ class JobManager(BaseJobManager):
     def __init__(self, job_name: str):
         super().__init__(job_name)
         self.processor = None
+        self.processor_factory: Optional[Callable[[], Any]] = None
     
     def set_processor(self, processor):
         """Set the processor for this job"""
         self.processor = processor
     
+    def set_processor_factory(self, factory: Callable[[], Any]):
+        """Set a callable that builds the processor when the job runs
+        
+        Lets job scripts defer importing the processor (and its pandas, DuckDB and
+        client dependencies) until after arguments are parsed, so --help and
+        --dry_run start quickly and ENV from --env is in place before any client
+        reads settings.
+        """
+        self.processor_factory = factory
+    
     def run(self) -> bool:
         """Run the processor"""
+        if not self.processor and self.processor_factory:
+            try:
+                self.processor = self.processor_factory()
+            except Exception as e:
+                self.logger.error(f"Failed to create processor: {e}")
+                self.run_error = f"Failed to create processor: {e}"
+                return False
+        
         if not self.processor:
             self.logger.error("No processor set for this job")
             return False
@@ -127,6 +195,8 @@ class JobManager(BaseJobManager):
                 self.processor.set_args(self.args)
             
             result = self.processor.run()
+            self.run_metadata = getattr(result, 'metadata', None) or {}
+            self.run_error = getattr(result, 'error', None)
             
             if hasattr(result, 'is_success'):
                 success = result.is_success
@@ -146,6 +216,7 @@ class JobManager(BaseJobManager):
                 
         except Exception as e:
             self.logger.error(f"Processor execution failed: {e}")
+            self.run_error = str(e)
             return False
         finally:
             if hasattr(self.processor, 'cleanup'):
@@ -1,10 +1,10 @@
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from loguru import logger
-import pandas as pd
 
 from src.core.base_processor import BaseProcessor, ProcessingResult
+from src.core.defaults import DEFAULT_RAW_COMPRESSION
 
 try:
     from src.utils.config import settings
@@ -15,6 +15,7 @@ except ImportError:
     from src.utils.config import settings
 
 from src.connect.trino_client import DataLakeManager
+from src.utils.compression import CompressingReader, compressed_key, uncompressed_key, raw_key_variants
 
 
 class LandingToRawProcessor(BaseProcessor):
@@ -40,6 +41,8 @@ class LandingToRawProcessor(BaseProcessor):
         self.landing_prefix = settings.LANDING_PREFIX  # MinIO landing bucket path
         self.raw_prefix = settings.RAW_PREFIX
         self.ingestion_date = datetime.now().strftime("%Y-%m-%d")  # Default to current date
+        self.force_copy = False
+        self.raw_compression = DEFAULT_RAW_COMPRESSION
         self._start_time = None
         self._end_time = None
         self.args = None
@@ -54,6 +57,58 @@ class LandingToRawProcessor(BaseProcessor):
         else:
             logger.info(f"Using current date as ingestion_date: {self.ingestion_date}")
         
+        if args and getattr(args, 'force_copy', False):
+            self.force_copy = True
+            logger.info("Forcing copy of all files, even if unchanged in raw")
+        if args and getattr(args, 'raw_compression', None):
+            self.raw_compression = args.raw_compression
+            if self.raw_compression != 'none':
+                logger.info(f"Recompressing raw files with {self.raw_compression}")
+        
+    def _is_unchanged(self, file_info: Dict[str, Any], raw_object: Optional[Dict[str, Any]]) -> bool:
+        """Check whether the raw object already holds the same content as the landing file"""
+        if raw_object is None:
+            return False
+        
+        # Single-part server-side copies keep the source etag
+        if raw_object['etag'] == file_info['etag'] and raw_object['size'] == file_info['size']:
+            return True
+        
+        # Otherwise compare against the fingerprint recorded when the object was copied
+        raw_stat = self.datalake.minio.stat_object(raw_object['name'])
+        if raw_stat is None:
+            return False
+        metadata = raw_stat['metadata']
+        return (metadata.get('source-etag') == file_info['etag']
+                and metadata.get('source-size') == str(file_info['size']))
+    
+    def _copy_compressed(self, file_info: Dict[str, Any], metadata: Dict[str, str]) -> Tuple[bool, int]:
+        """Stream a landing file through the compressor into raw; returns (success, bytes written)
+        
+        The landing object is read and compressed chunk by chunk while the upload
+        sends fixed-size parts, so memory stays bounded for any file size.
+        """
+        source = self.datalake.minio.open_object(file_info['landing_key'])
+        try:
+            reader = CompressingReader(source, self.raw_compression)
+            success = self.datalake.minio.upload_stream(
+                reader, file_info['raw_key'],
+                metadata={**metadata, 'raw-codec': self.raw_compression}
+            )
+        finally:
+            source.close()
+            if hasattr(source, 'release_conn'):
+                source.release_conn()
+        if success:
+            logger.info(f"Compressed {file_info['name']}: {reader.bytes_in:,} -> {reader.bytes_out:,} bytes")
+        return success, reader.bytes_out
+    
+    def _remove_other_variants(self, raw_key: str) -> None:
+        """Delete copies of the same raw file stored with another codec, so readers find one"""
+        for variant in raw_key_variants(uncompressed_key(raw_key)):
+            if variant != raw_key and self.datalake.minio.stat_object(variant) is not None:
+                self.datalake.minio.delete_object(variant)
+    
     def _extract(self) -> Dict[str, Any]:
         """Extract: List files from MinIO landing bucket"""
         logger.info("Extracting files from MinIO landing bucket")
@@ -63,11 +118,12 @@ class LandingToRawProcessor(BaseProcessor):
         
         extracted_files = {}
         
-        # List files in MinIO landing bucket
+        # List files in MinIO landing bucket (the listing already carries size and etag)
         try:
-            files_in_landing = self.datalake.minio.list_objects(prefix=self.landing_prefix)
+            files_in_landing = self.datalake.minio.list_object_info(prefix=self.landing_prefix)
             
-            for object_key in files_in_landing:
+            for landing_object in files_in_landing:
+                object_key = landing_object['name']
                 file_name = object_key.split('/')[-1]  # Get filename from full path
                 if file_name.endswith(('.csv', '.json', '.jsonl')):
                     # Extract table type and date from filename
@@ -91,8 +147,10 @@ class LandingToRawProcessor(BaseProcessor):
                         'name': file_name,
                         'table_type': table_type,
                         'file_date': file_date,
-                        'size': 0,
-                        'raw_key': f"{self.raw_prefix}/ingestion_date={file_date}/{file_name}"
+                        'size': landing_object['size'],
+                        'etag': landing_object['etag'],
+                        'raw_key': compressed_key(f"{self.raw_prefix}/ingestion_date={file_date}/{file_name}",
+                                                  self.raw_compression)
                     }
                     extracted_files[table_type] = file_info
                     logger.debug(f"Found file: {file_name} -> {table_type} ({file_date})")
@@ -121,19 +179,50 @@ class LandingToRawProcessor(BaseProcessor):
             return super()._load(transformed_data)
         
         successful_copies = 0
+        skipped_copies = 0
+        bytes_copied = 0
+        bytes_written = 0
+        bytes_skipped = 0
         failed_copies = []
         
+        # One listing of the raw partition gives the current fingerprint of every target
+        raw_objects = {}
+        if not self.force_copy:
+            raw_partition = f"{self.raw_prefix}/ingestion_date={self.ingestion_date}/"
+            raw_objects = {
+                obj['name']: obj for obj in self.datalake.minio.list_object_info(prefix=raw_partition)
+            }
+        
         for table_type, file_info in transformed_data.items():
             try:
-                # Simple copy operation: landing -> raw with partition
-                success = self.datalake.minio.copy_object(
-                    source_key=file_info['landing_key'],
-                    target_key=file_info['raw_key']
-                )
+                if self._is_unchanged(file_info, raw_objects.get(file_info['raw_key'])):
+                    logger.info(f"Skipped {file_info['name']} - unchanged in {file_info['raw_key']}")
+                    skipped_copies += 1
+                    bytes_skipped += file_info['size']
+                    continue
+                
+                # Record the source fingerprint for future reruns
+                metadata = {
+                    'source-etag': file_info['etag'],
+                    'source-size': str(file_info['size'])
+                }
+                if self.raw_compression == 'none':
+                    # Simple copy operation: landing -> raw with partition
+                    success = self.datalake.minio.copy_object(
+                        source_key=file_info['landing_key'],
+                        target_key=file_info['raw_key'],
+                        metadata=metadata
+                    )
+                    written = file_info['size']
+                else:
+                    success, written = self._copy_compressed(file_info, metadata)
                 
                 if success:
                     logger.info(f"Copied {file_info['name']} -> {file_info['raw_key']}")
+                    self._remove_other_variants(file_info['raw_key'])
                     successful_copies += 1
+                    bytes_copied += file_info['size']
+                    bytes_written += written
                 else:
                     failed_copies.append({
                         'file': file_info['name'],
@@ -149,7 +238,8 @@ class LandingToRawProcessor(BaseProcessor):
                 logger.error(f"Failed to copy {file_info['name']}: {e}")
         
         success = len(failed_copies) == 0
-        message = f"Copied {successful_copies} files to raw layer with ingestion_date partitioning"
+        message = (f"Copied {successful_copies} files to raw layer with ingestion_date partitioning, "
+                   f"skipped {skipped_copies} unchanged")
         if failed_copies:
             message += f", {len(failed_copies)} failed"
         
@@ -158,6 +248,11 @@ class LandingToRawProcessor(BaseProcessor):
             message=message,
             metadata={
                 'successful_copies': successful_copies,
+                'skipped_copies': skipped_copies,
+                'bytes_copied': bytes_copied,
+                'bytes_written': bytes_written,
+                'raw_compression': self.raw_compression,
+                'bytes_skipped': bytes_skipped,
                 'failed_copies': failed_copies,
                 'files_processed': list(transformed_data.keys()),
                 'raw_prefix': self.raw_prefix,
@@ -173,7 +268,14 @@ class LandingToRawProcessor(BaseProcessor):
         logger.info("Raw layer copy summary")
         
         logger.info(f"Landing to Raw Copy Complete:")
-        logger.info(f"Files copied: {load_result.metadata['successful_copies']}")
+        logger.info(f"Files copied: {load_result.metadata['successful_copies']} "
+                    f"({load_result.metadata['bytes_copied']:,} bytes)")
+        if load_result.metadata['raw_compression'] != 'none' and load_result.metadata['bytes_written']:
+            logger.info(f"Stored as {load_result.metadata['raw_compression']}: "
+                        f"{load_result.metadata['bytes_written']:,} bytes "
+                        f"({load_result.metadata['bytes_copied'] / load_result.metadata['bytes_written']:.1f}x smaller)")
+        logger.info(f"Files skipped (unchanged): {load_result.metadata['skipped_copies']} "
+                    f"({load_result.metadata['bytes_skipped']:,} bytes)")
         logger.info(f"Partition: ingestion_date={load_result.metadata['ingestion_date']}")
         logger.info(f"Raw path: {self.raw_prefix}/ingestion_date={self.ingestion_date}/")
         
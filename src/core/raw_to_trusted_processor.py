@@ -1,10 +1,27 @@
+import io
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import Dict, Any, List
-from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+from datetime import date, datetime, timedelta
 from loguru import logger
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from src.core.base_processor import BaseProcessor, ProcessingResult
+from src.core.table_pipeline import TablePipeline, TableOutcome
+from src.core.defaults import (
+    DEFAULT_ENGINE,
+    DEFAULT_PIPELINE_WORKERS,
+    DEFAULT_PIPELINE_QUEUE_SIZE,
+    DEFAULT_DIMENSION_MODE,
+    DEFAULT_PARSE_WORKERS,
+)
 
 try:
     from src.utils.config import settings
@@ -15,22 +32,78 @@ except ImportError:
     from src.utils.config import settings
 
 from src.connect.duckdb_client import DataLakeManager
-from src.utils.schema_registry import get_all_trusted_tables
+from src.utils.schema_registry import (
+    get_all_trusted_tables,
+    get_raw_trusted_tables,
+    get_enriched_tables,
+    get_scd2_tables,
+    get_scd2_location_suffix,
+    get_table_sort_cols,
+    get_table_index_cols,
+    get_table_derived_cols,
+    get_table_categorical_cols,
+    get_trusted_schema,
+    build_trusted_select,
+    build_scd2_merge,
+    SCD2_SUFFIX,
+)
+from src.utils.memory import parse_memory_size, format_bytes, peak_rss_bytes
+from src.utils.broadcast_join import BroadcastJoin, decode_dictionary
+from src.utils.compression import codec_for_key, open_decompressed, raw_key_variants
+from src.utils.jsonl_parser import ParallelJsonlParser, loads
+
+# Arrow types of registry types, as the DuckDB engine writes them
+ARROW_TYPES = {
+    'VARCHAR': pa.string(),
+    'INTEGER': pa.int32(),
+    'BIGINT': pa.int64(),
+    'DOUBLE': pa.float64(),
+    'TIMESTAMP': pa.timestamp('us')
+}
+ENRICH_BATCH_ROWS = 256_000
+# Rough in-memory size of one pandas event row, used to size chunks under a memory budget
+ESTIMATED_ROW_BYTES = 1024
+MIN_CHUNK_ROWS = 10_000
+# Below this DuckDB cannot hold the buffers a spilling sort needs
+MIN_DUCKDB_MEMORY_BYTES = 128 * 1024 * 1024
+
+
+def arrow_type(dtype: str) -> pa.DataType:
+    """Arrow type of a registry column type"""
+    decimal = re.fullmatch(r"DECIMAL\((\d+),\s*(\d+)\)", dtype)
+    if decimal:
+        return pa.decimal128(int(decimal.group(1)), int(decimal.group(2)))
+    return ARROW_TYPES[dtype]
 
 
 class RawToTrustedProcessor(BaseProcessor):
     """Process raw data to trusted layer with parquet format conversion"""
     
-    def __init__(self, processor_id: str = "raw_to_trusted_processor"):
+    def __init__(self, processor_id: str = "raw_to_trusted_processor", minio_client=None):
         self.processor_id = processor_id
         self.description = "Transform raw data to trusted layer with parquet format"
         
-        self.datalake = DataLakeManager()
+        self.datalake = DataLakeManager(minio_client=minio_client)
         logger.info("DuckDB Data Lake Manager initialized")
             
         self.raw_prefix = settings.RAW_PREFIX
         self.trusted_prefix = settings.TRUSTED_PREFIX
         self.ingestion_date = datetime.now().strftime("%Y-%m-%d")
+        self.engine = DEFAULT_ENGINE
+        self.workers = DEFAULT_PIPELINE_WORKERS
+        self.queue_size = DEFAULT_PIPELINE_QUEUE_SIZE
+        self._table_plan: Dict[str, Any] = {}
+        self.memory_budget: Optional[int] = None
+        self.chunk_rows: Optional[int] = None
+        self.spill_dir: Optional[Path] = None
+        self.enrich = False
+        # Local copies of written enrichment sources, read back instead of downloaded
+        self.local_copy_dir: Optional[Path] = None
+        self.dimension_mode = DEFAULT_DIMENSION_MODE
+        self.parse_workers = DEFAULT_PARSE_WORKERS
+        self._duckdb_lock = threading.Lock()
+        # Names this run's files; they stay unread until the table's manifest commits them
+        self.write_token = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
         self._start_time = None
         self._end_time = None
         self.args = None
@@ -44,33 +117,76 @@ class RawToTrustedProcessor(BaseProcessor):
             logger.info(f"Using specified ingestion_date: {self.ingestion_date}")
         else:
             logger.info(f"Using current date as ingestion_date: {self.ingestion_date}")
+        
+        if args and getattr(args, 'engine', None):
+            self.engine = args.engine
+            logger.info(f"Using {self.engine} engine for raw -> trusted conversion")
+        if args and getattr(args, 'workers', None):
+            self.workers = args.workers
+        if args and getattr(args, 'queue_size', None):
+            self.queue_size = args.queue_size
+        if args and getattr(args, 'enrich', False):
+            self.enrich = True
+            logger.info(f"Writing enriched tables: {', '.join(get_enriched_tables())}")
+        if args and getattr(args, 'dimension_mode', None):
+            self.dimension_mode = args.dimension_mode
+            logger.info(f"Writing dimension snapshots in {self.dimension_mode} mode")
+        if args and getattr(args, 'parse_workers', None) is not None:
+            self.parse_workers = args.parse_workers
+        
+        max_memory = getattr(args, 'max_memory', None) or settings.MAX_MEMORY
+        if max_memory:
+            self._configure_memory_budget(max_memory)
+    
+    def _configure_memory_budget(self, max_memory: str):
+        """Switch to chunked, spill-to-disk processing bounded by max_memory"""
+        self.memory_budget = parse_memory_size(max_memory)
+        self.spill_dir = Path(tempfile.mkdtemp(prefix="streampro-spill-", dir=settings.SPILL_DIRECTORY))
+        
+        # Half of the budget goes to DuckDB sorting/writing, the rest to in-flight pandas chunks
+        duckdb_budget = max(self.memory_budget // 2, MIN_DUCKDB_MEMORY_BYTES)
+        if duckdb_budget >= self.memory_budget:
+            logger.warning(f"Memory budget {format_bytes(self.memory_budget)} is below the "
+                           f"{format_bytes(2 * MIN_DUCKDB_MEMORY_BYTES)} minimum; it may be exceeded")
+        self.datalake.duckdb.configure_memory(
+            memory_limit=f"{max(duckdb_budget // 1_000_000, 1)}MB",
+            temp_directory=str(self.spill_dir / "duckdb")
+        )
+        self.chunk_rows = max(
+            MIN_CHUNK_ROWS,
+            max(self.memory_budget - duckdb_budget, 0) // (ESTIMATED_ROW_BYTES * self.workers)
+        )
+        logger.info(f"Memory budget {format_bytes(self.memory_budget)}: "
+                    f"chunks of {self.chunk_rows:,} rows, spilling to {self.spill_dir}")
     
     def extract_csv(self, raw_file_path: str):
         """Extract data from CSV file"""
         raw_file = f"{raw_file_path}.csv"
-        df = self.datalake.minio.read_csv(raw_file)
+        try:
+            with self._open_raw_stream(raw_file) as stream:
+                # Values as text, like the DuckDB engine; the registry types are applied on write
+                df = pd.read_csv(stream, dtype=str)
+        except Exception as e:
+            logger.error(f"Could not read {raw_file}: {e}")
+            return None
         
-        if df is None or df.empty:
+        if df.empty:
             logger.error(f"Could not read {raw_file} or file is empty")
             return None
         else:
             logger.info(f"Read {len(df)} rows from {raw_file}")
             return df
     
-    def extract_jsonl(self, raw_file_path: str):
-        """Extract data from JSONL file"""
-        import json
-        
+    def extract_jsonl(self, raw_file_path: str, categorical_cols: Optional[List[str]] = None):
+        """Extract data from JSONL file; categorical_cols are read as pandas categoricals"""
         raw_file = f"{raw_file_path}.jsonl"
         try:
-            response = self.datalake.minio.client.get_object(
-                self.datalake.minio.bucket, 
-                raw_file
-            )
-            
-            lines = response.data.decode('utf-8').strip().split('\n')
-            data = [json.loads(line) for line in lines if line]
-            df = pd.DataFrame(data)
+            # Decoded in parallel worker processes for large objects
+            parser = ParallelJsonlParser(workers=self.parse_workers or None,
+                                         dictionary_columns=categorical_cols or ())
+            stream, size = self._open_raw_binary(raw_file)
+            with stream:
+                df = parser.read_table(stream, size).to_pandas()
             
             logger.info(f"Read {len(df)} rows from {raw_file}")
             return df
@@ -78,117 +194,447 @@ class RawToTrustedProcessor(BaseProcessor):
             logger.error(f"Could not read {raw_file}: {e}")
             return None
     
+    def _resolve_raw_object(self, raw_file: str) -> str:
+        """Name raw_file is stored under: as is, or with a .gz/.zst suffix from to_raw --raw_compression"""
+        for variant in raw_key_variants(raw_file):
+            if self.datalake.minio.stat_object(variant) is not None:
+                return variant
+        raise FileNotFoundError(f"{raw_file} not found in raw")
+    
+    def _open_raw_binary(self, raw_file: str):
+        """Open a raw object as a streaming binary reader, decompressing on the fly
+        
+        Returns (stream, size); size is None for compressed objects, whose decompressed
+        size is unknown until read.
+        """
+        object_name = self._resolve_raw_object(raw_file)
+        codec = codec_for_key(object_name)
+        size = None
+        if codec is None:
+            info = self.datalake.minio.stat_object(object_name)
+            size = info['size'] if info else None
+        response = self.datalake.minio.open_object(object_name)
+        return open_decompressed(io.BufferedReader(response), codec), size
+    
+    def _open_raw_stream(self, raw_file: str) -> io.TextIOWrapper:
+        """Open a raw object as a streaming text reader, decompressing on the fly"""
+        stream, _ = self._open_raw_binary(raw_file)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+    
+    def iter_csv_chunks(self, raw_file_path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Stream a CSV file from MinIO in chunks of chunk_rows rows"""
+        raw_file = f"{raw_file_path}.csv"
+        with self._open_raw_stream(raw_file) as stream:
+            for chunk in pd.read_csv(stream, chunksize=chunk_rows, dtype=str):
+                yield chunk
+    
+    def iter_jsonl_chunks(self, raw_file_path: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+        """Stream a JSONL file from MinIO in chunks of chunk_rows rows"""
+        raw_file = f"{raw_file_path}.jsonl"
+        with self._open_raw_stream(raw_file) as stream:
+            records = []
+            for line in stream:
+                if line.strip():
+                    records.append(loads(line))
+                if len(records) >= chunk_rows:
+                    yield pd.DataFrame(records)
+                    records = []
+            if records:
+                yield pd.DataFrame(records)
+    
     def set_ingestion_date(self, date_str: str):
         """Set the ingestion date to process"""
         self.ingestion_date = date_str
         logger.info(f"Processing date set to: {date_str}")
         
     def _extract(self) -> Dict[str, Any]:
-        """Extract: Read raw data from MinIO"""
-        logger.info("Reading raw data from MinIO")
+        """Extract: Plan the raw reads for each trusted table
         
-        extracted_data = {}
+        Reading happens per table inside the pipeline run by _load, so a table is
+        only held in memory between its own extract and load.
+        """
+        logger.info("Planning raw data reads from MinIO")
         
-        for table_name in get_all_trusted_tables():
-            try:
-                table_key = table_name.replace('trusted_', '')
-                logger.info(f"Reading raw data for {table_key}")
-                
-                # Read data from RAW layer in MinIO
-                raw_file_path = f"raw/ingestion_date={self.ingestion_date}/{table_key}_{self.ingestion_date}"
-                
-                # Use appropriate extraction method based on data format
-                if table_key == 'events':
-                    df = self.extract_jsonl(raw_file_path)
-                else:
-                    df = self.extract_csv(raw_file_path)
-                
-                if df is not None:
-                    extracted_data[table_key] = {
-                        'dataframe': df,
-                        'trusted_table': table_name
-                    }
-                else:
-                    logger.warning(f"Skipping {table_key} due to read failure")
-                
-            except Exception as e:
-                logger.error(f"Failed to read data for {table_key}: {e}")
-                continue
+        extract_plan = {}
+        for table_name in get_raw_trusted_tables():
+            table_key = table_name.replace('trusted_', '')
+            extract_plan[table_key] = {
+                'raw_file_path': f"raw/ingestion_date={self.ingestion_date}/{table_key}_{self.ingestion_date}",
+                'trusted_table': table_name
+            }
         
-        logger.info(f"Extracted {len(extracted_data)} datasets from raw layer")
-        return extracted_data
+        logger.info(f"Planned {len(extract_plan)} datasets from raw layer")
+        return extract_plan
     
     def _transform(self, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Transform: Apply data transformations and add ingestion_date"""
-        logger.info("Applying data transformations")
+        """Transform: Transformations are applied per table in the pipeline (see _transform_table)"""
+        return extracted_data
+    
+    def _extract_table(self, table_key: str) -> Optional[Dict[str, Any]]:
+        """Read one table's raw data from MinIO"""
+        table_plan = self._table_plan[table_key]
+        logger.info(f"Reading raw data for {table_key}")
         
-        transformed_data = {}
+        if self.engine == 'duckdb':
+            # DuckDB reads the raw object itself while converting
+            return {
+                'source_relation': self._raw_relation_sql(table_key, table_plan),
+                'trusted_table': table_plan['trusted_table']
+            }
         
-        for table_key, source_info in extracted_data.items():
-            try:
-                df = source_info['dataframe']
-                
-                if 'ingestion_date' not in df.columns:
-                    df['ingestion_date'] = self.ingestion_date
-
-                transformed_data[table_key] = {
-                    'dataframe': df,
-                    'trusted_table': source_info['trusted_table']
-                }
-                
-                logger.debug(f"Transformed {len(df)} rows for {source_info['trusted_table']}")
-                
-            except Exception as e:
-                logger.error(f"Failed to transform data for {table_key}: {e}")
+        if self.memory_budget:
+            # Lazy chunk stream - rows are read as the load step consumes them
+            if table_key == 'events':
+                chunks = self.iter_jsonl_chunks(table_plan['raw_file_path'], self.chunk_rows)
+            else:
+                chunks = self.iter_csv_chunks(table_plan['raw_file_path'], self.chunk_rows)
+            return {
+                'chunks': chunks,
+                'trusted_table': table_plan['trusted_table']
+            }
+        
+        # Use appropriate extraction method based on data format
+        if table_key == 'events':
+            df = self.extract_jsonl(table_plan['raw_file_path'],
+                                    get_table_categorical_cols(table_plan['trusted_table']))
+        else:
+            df = self.extract_csv(table_plan['raw_file_path'])
+        
+        if df is None:
+            logger.warning(f"Skipping {table_key} due to read failure")
+            return None
+        
+        return {
+            'dataframe': df,
+            'trusted_table': table_plan['trusted_table']
+        }
+    
+    def _raw_relation_sql(self, table_key: str, table_plan: Dict[str, Any]) -> str:
+        """DuckDB table function reading a raw object with the trusted column types"""
+        trusted_table = table_plan['trusted_table']
+        if table_key == 'events':
+            schema = get_trusted_schema(trusted_table)
+            derived_cols = {col for col, _, _ in get_table_derived_cols(trusted_table)}
+            columns_sql = ", ".join(
+                f"'{col}': '{dtype}'" for col, dtype in schema['columns']
+                if col not in schema['partition_cols'] and col not in derived_cols
+            )
+            raw_url = self.datalake.minio.get_object_url(self._resolve_raw_object(f"{table_plan['raw_file_path']}.jsonl"))
+            return f"read_json('{raw_url}', format = 'newline_delimited', columns = {{{columns_sql}}})"
+        
+        # Read CSV values as text and let the trusted casts decide the types
+        # (DuckDB decompresses .gz/.zst objects by their extension)
+        raw_url = self.datalake.minio.get_object_url(self._resolve_raw_object(f"{table_plan['raw_file_path']}.csv"))
+        return f"read_csv('{raw_url}', header = true, all_varchar = true)"
+    
+    def _trusted_object_key(self, location_suffix: str) -> str:
+        """Object key of this run's file in a trusted partition"""
+        return (f"{self.trusted_prefix}/{location_suffix}/ingestion_date={self.ingestion_date}/"
+                f"part-{self.write_token}.parquet")
+    
+    def _transform_frame(self, df: pd.DataFrame, trusted_table: str) -> pd.DataFrame:
+        """Row-level transformations shared by whole-table and chunked processing"""
+        # Parse typed columns once here, vectorized, instead of in every query
+        for col, dtype in get_trusted_schema(trusted_table)['columns']:
+            if dtype == 'TIMESTAMP' and col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce', format='ISO8601').astype('datetime64[us]')
+        for col, source_col, pattern in get_table_derived_cols(trusted_table):
+            if source_col in df.columns:
+                extracted = df[source_col].astype('string').str.extract(pattern, expand=False)
+                df[col] = pd.to_numeric(extracted, errors='coerce').astype('Int32')
+        # Low-cardinality text as categoricals: written as parquet dictionary columns
+        for col in get_table_categorical_cols(trusted_table):
+            if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype('category')
+        
+        if 'ingestion_date' not in df.columns:
+            df['ingestion_date'] = self.ingestion_date
+        return df
+    
+    def _transform_table(self, table_key: str, source_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply data transformations to one table and add ingestion_date"""
+        if 'source_relation' in source_info:
+            # Transformations are part of the single conversion statement run at load
+            return source_info
+        
+        if 'chunks' in source_info:
+            # Sorting happens in DuckDB when the spilled chunks are written out
+            return {
+                'chunks': (self._transform_frame(chunk, source_info['trusted_table'])
+                           for chunk in source_info['chunks']),
+                'trusted_table': source_info['trusted_table']
+            }
+        
+        df = self._transform_frame(source_info['dataframe'], source_info['trusted_table'])
+        
+        # Write in the configured sort order so compaction and min/max stats stay useful
+        sort_cols = [col for col in get_table_sort_cols(source_info['trusted_table'])
+                     if col in df.columns]
+        if sort_cols:
+            df = df.sort_values(sort_cols, kind='stable', ignore_index=True)
+        
+        logger.debug(f"Transformed {len(df)} rows for {source_info['trusted_table']}")
+        return {
+            'dataframe': df,
+            'trusted_table': source_info['trusted_table']
+        }
+    
+    def _load_table(self, table_key: str, table_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Write one transformed table as parquet to its trusted S3 location"""
+        if self.dimension_mode == 'scd2' and table_data['trusted_table'] in get_scd2_tables():
+            return self._load_table_scd2(table_key, table_data)
+        if 'source_relation' in table_data:
+            return self._load_table_sql(table_key, table_data)
+        if 'chunks' in table_data:
+            return self._load_table_spilled(table_key, table_data)
+        
+        trusted_table_name = table_data['trusted_table']
+        df = table_data['dataframe']
+        
+        logger.info(f"Writing {table_key} to parquet ({len(df)} rows)")
+        
+        # Write to MinIO as parquet
+        object_key = self._trusted_object_key(table_key)
+        local_path = self._local_copy_path(table_key, trusted_table_name)
+        if not self._upload_trusted_frame(df, trusted_table_name, object_key, local_path):
+            raise Exception("Failed to write to MinIO")
+        
+        logger.success(f"Wrote parquet file for {trusted_table_name} to {object_key}")
+        return {'rows': len(df), 'object_key': object_key, 'local_path': local_path}
+    
+    def _trusted_arrow_table(self, df: pd.DataFrame, trusted_table: str) -> pa.Table:
+        """Frame as an Arrow table with the registry's column types (categoricals stay dictionaries)"""
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        column_types = dict(get_trusted_schema(trusted_table)['columns'])
+        fields = []
+        for field in table.schema:
+            if field.name not in column_types:
+                fields.append(field)
                 continue
+            target = arrow_type(column_types[field.name])
+            if pa.types.is_dictionary(field.type):
+                target = pa.dictionary(field.type.index_type, target)
+            fields.append(pa.field(field.name, target))
+        return table.cast(pa.schema(fields))
+    
+    def _upload_trusted_frame(self, df: pd.DataFrame, trusted_table: str, object_key: str,
+                              local_path: Optional[Path] = None) -> bool:
+        """Write a frame as a trusted parquet object, through local_path when given"""
+        table = self._trusted_arrow_table(df, trusted_table)
+        if local_path is not None:
+            pq.write_table(table, local_path, compression='snappy')
+            return self.datalake.minio.upload_file(local_path, object_key)
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression='snappy')
+        return self.datalake.minio.upload_bytes(buffer.getvalue(), object_key)
+    
+    def _local_copy_path(self, table_key: str, trusted_table_name: str) -> Optional[Path]:
+        """Where to keep a local copy of a written table for enrichment, None when none is needed"""
+        if not self.enrich or trusted_table_name not in {
+            get_trusted_schema(enriched_table)['enrich_from'] for enriched_table in get_enriched_tables()
+        }:
+            return None
+        if self.local_copy_dir is None:
+            self.local_copy_dir = Path(tempfile.mkdtemp(prefix="streampro-local-",
+                                                        dir=self.spill_dir or settings.SPILL_DIRECTORY))
+        return self.local_copy_dir / f"{table_key}-{self.write_token}.parquet"
+    
+    def _load_table_sql(self, table_key: str, table_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert one table raw -> trusted with a single DuckDB COPY, without pandas"""
+        trusted_table_name = table_data['trusted_table']
+        object_key = self._trusted_object_key(table_key)
+        local_path = self._local_copy_path(table_key, trusted_table_name)
+        
+        select_sql = build_trusted_select(
+            trusted_table_name,
+            table_data['source_relation'],
+            {'ingestion_date': self.ingestion_date}
+        )
+        # Written locally first when enrichment reads the file back
+        target = str(local_path) if local_path is not None else self.datalake.minio.get_object_url(object_key)
+        copy_sql = f"""
+            COPY ({select_sql})
+            TO '{target}' (FORMAT PARQUET, COMPRESSION SNAPPY)
+        """
         
-        logger.info(f"Transformed {len(transformed_data)} datasets")
-        return transformed_data
+        logger.info(f"Converting {table_key} to parquet with DuckDB")
+        # DuckDB parallelizes each statement itself; tables take turns on the S3-configured connection
+        with self._duckdb_lock:
+            rows = self.datalake.duckdb.execute_query(copy_sql).fetchone()[0]
+        if local_path is not None and not self.datalake.minio.upload_file(local_path, object_key):
+            raise Exception("Failed to write to MinIO")
+        
+        logger.success(f"Wrote parquet file for {trusted_table_name} to {object_key} ({rows} rows)")
+        return {'rows': rows, 'object_key': object_key, 'local_path': local_path}
+    
+    def _load_table_spilled(self, table_key: str, table_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Spill chunks to local parquet, then sort and write them with DuckDB under the memory limit"""
+        trusted_table_name = table_data['trusted_table']
+        table_spill_dir = self.spill_dir / table_key
+        table_spill_dir.mkdir(parents=True, exist_ok=True)
+        
+        try:
+            rows = 0
+            spill_bytes = 0
+            columns = set()
+            for chunk_index, chunk in enumerate(table_data['chunks']):
+                chunk_path = table_spill_dir / f"chunk-{chunk_index:05d}.parquet"
+                pq.write_table(self._trusted_arrow_table(chunk, trusted_table_name), chunk_path)
+                rows += len(chunk)
+                spill_bytes += chunk_path.stat().st_size
+                columns.update(chunk.columns)
+            
+            if rows == 0:
+                raise Exception(f"No rows read for {table_key}")
+            
+            logger.info(f"Writing {table_key} to parquet ({rows} rows, "
+                        f"{format_bytes(spill_bytes)} spilled)")
+            
+            sort_cols = [col for col in get_table_sort_cols(trusted_table_name) if col in columns]
+            order_by = f" ORDER BY {', '.join(sort_cols)}" if sort_cols else ""
+            local_path = self._local_copy_path(table_key, trusted_table_name)
+            output_path = local_path or table_spill_dir / "data.parquet"
+            
+            # Separate cursor per worker thread; the memory limit is shared by the database
+            cursor = self.datalake.duckdb.streaming_cursor()
+            try:
+                cursor.execute(f"""
+                    COPY (
+                        SELECT * FROM read_parquet('{table_spill_dir}/chunk-*.parquet', union_by_name = true)
+                        {order_by}
+                    ) TO '{output_path}' (FORMAT PARQUET, COMPRESSION SNAPPY)
+                """)
+            finally:
+                cursor.close()
+            
+            object_key = self._trusted_object_key(table_key)
+            if not self.datalake.minio.upload_file(output_path, object_key):
+                raise Exception("Failed to write to MinIO")
+            
+            logger.success(f"Wrote parquet file for {trusted_table_name} to {object_key}")
+            return {'rows': rows, 'object_key': object_key, 'spill_bytes': spill_bytes,
+                    'local_path': local_path}
+        finally:
+            shutil.rmtree(table_spill_dir, ignore_errors=True)
+    
+    def _load_table_scd2(self, table_key: str, table_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Append a dimension snapshot's new, changed and deleted rows to its SCD2 history
+        
+        Only the history is written: its partition is committed to the <table>_history
+        manifest, and readers of the current dimension - enrichment, cohorts, the
+        trusted views - read the versions with valid_to IS NULL from it.
+        
+        The current version of each key comes from the history partitions before this
+        ingestion_date, so a rerun replaces its own partition. Dates are expected to be
+        processed in order; a later partition is not rewritten by an earlier date.
+        """
+        trusted_table_name = table_data['trusted_table']
+        work_dir = Path(tempfile.mkdtemp(prefix=f"streampro-scd2-{table_key}-",
+                                         dir=self.spill_dir or settings.SPILL_DIRECTORY))
+        snapshot_view = f"scd2_snapshot_{table_key}"
+        
+        try:
+            partition_values = {'ingestion_date': self.ingestion_date}
+            if 'source_relation' in table_data:
+                snapshot_relation = build_trusted_select(trusted_table_name, table_data['source_relation'],
+                                                         partition_values)
+            elif 'chunks' in table_data:
+                for chunk_index, chunk in enumerate(table_data['chunks']):
+                    chunk.to_parquet(work_dir / f"chunk-{chunk_index:05d}.parquet", index=False)
+                snapshot_relation = build_trusted_select(
+                    trusted_table_name,
+                    f"read_parquet('{work_dir}/chunk-*.parquet', union_by_name = true)",
+                    partition_values
+                )
+            else:
+                snapshot_relation = build_trusted_select(trusted_table_name, snapshot_view, partition_values)
+            
+            previous_date = (date.fromisoformat(self.ingestion_date) - timedelta(days=1)).isoformat()
+            history_files = self.datalake.list_scd2_history_files(trusted_table_name, end_date=previous_date)
+            history_relation = (self.datalake.duckdb.read_parquet_expr(history_files)
+                                if history_files else None)
+            # The snapshot is read from the source once and merged from its local file
+            snapshot_path = work_dir / "snapshot.parquet"
+            merge_sql = build_scd2_merge(trusted_table_name, f"read_parquet('{snapshot_path}')",
+                                         history_relation, self.ingestion_date)
+            sort_cols = get_table_sort_cols(trusted_table_name)
+            order_by = f" ORDER BY {', '.join(sort_cols)}" if sort_cols else ""
+            
+            output_path = work_dir / "data.parquet"
+            logger.info(f"Merging {table_key} snapshot into SCD2 history ({len(history_files)} partitions)")
+            with self._duckdb_lock:
+                if 'dataframe' in table_data:
+                    self.datalake.duckdb.conn.register(snapshot_view, table_data['dataframe'])
+                try:
+                    rows = self.datalake.duckdb.execute_query(
+                        f"COPY (SELECT * FROM ({snapshot_relation}){order_by}) "
+                        f"TO '{snapshot_path}' (FORMAT PARQUET, COMPRESSION SNAPPY)"
+                    ).fetchone()[0]
+                    changed_rows = self.datalake.duckdb.execute_query(
+                        f"COPY ({merge_sql}) TO '{output_path}' (FORMAT PARQUET, COMPRESSION SNAPPY)"
+                    ).fetchone()[0]
+                finally:
+                    if 'dataframe' in table_data:
+                        self.datalake.duckdb.conn.unregister(snapshot_view)
+            
+            # Published by the manifest commit in _load, like any other table's file
+            object_key = self._trusted_object_key(get_scd2_location_suffix(trusted_table_name))
+            if not self.datalake.minio.upload_file(output_path, object_key):
+                raise Exception("Failed to write to MinIO")
+            logger.success(f"Wrote {changed_rows} changed rows of {trusted_table_name} "
+                           f"({rows} in the snapshot) to {object_key}")
+            return {'rows': rows, 'object_key': object_key, 'history_rows': changed_rows}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
     
     def _load(self, transformed_data: Dict[str, Any]) -> ProcessingResult:
-        """Load: Write transformed dataframes as parquet files to trusted S3 locations"""
-        logger.info("Writing parquet files to trusted S3 locations")
+        """Load: Run extract -> transform -> load for each table in a pipelined executor"""
+        logger.info(f"Processing {len(transformed_data)} tables with {self.workers} workers "
+                    f"(queue size {self.queue_size})")
+        
+        self._table_plan = transformed_data
+        pipeline = TablePipeline(
+            extract_fn=self._extract_table,
+            transform_fn=self._transform_table,
+            load_fn=self._load_table,
+            workers=self.workers,
+            queue_size=self.queue_size
+        )
+        outcomes = pipeline.run(list(transformed_data.keys()))
+        trusted_tables = {table_key: self._output_table(plan['trusted_table'])
+                          for table_key, plan in transformed_data.items()}
+        self._commit_outcomes(outcomes, trusted_tables)
+        
+        if self.enrich:
+            for enriched_table in get_enriched_tables():
+                outcome = self._run_enrichment(enriched_table, outcomes)
+                outcomes[outcome.table] = outcome
+                trusted_tables[outcome.table] = enriched_table
+                self._commit_outcomes({outcome.table: outcome}, trusted_tables, outcomes)
+        
+        # Re-index the partitions just committed so readers can skip files by min/max
+        for table_key, outcome in outcomes.items():
+            trusted_table_name = trusted_tables[table_key]
+            if outcome.success and get_table_index_cols(trusted_table_name):
+                self.datalake.update_zone_map(trusted_table_name, self.ingestion_date)
         
         tables_created = []
-        total_tables = len(transformed_data)
-        successful_loads = 0
         failed_loads = []
-        
-        # Write transformed data as parquet files
-        for table_key, table_data in transformed_data.items():
-            try:
-                trusted_table_name = table_data['trusted_table']
-                # Get the transformed dataframe
-                df = table_data['dataframe']
-                
-                logger.info(f"Writing {table_key} to parquet ({len(df)} rows)")
-                
-                # Write to MinIO as parquet
-                object_key = f"{self.trusted_prefix}/{table_key}/ingestion_date={self.ingestion_date}/data.parquet"
-                success = self.datalake.minio.upload_dataframe(
-                    df=df,
-                    object_name=object_key,
-                    format='parquet'
-                )
-                
-                if success:
-                    tables_created.append(trusted_table_name)
-                    successful_loads += 1
-                    logger.success(f"Wrote parquet file for {trusted_table_name} to {object_key}")
-                else:
-                    raise Exception("Failed to write to MinIO")
-                    
-            except Exception as e:
+        for table_key, outcome in outcomes.items():
+            trusted_table_name = trusted_tables[table_key]
+            if outcome.success:
+                tables_created.append(trusted_table_name)
+            else:
                 failed_loads.append({
-                    'table': table_data['trusted_table'],
-                    'error': str(e)
+                    'table': trusted_table_name,
+                    'error': outcome.error
                 })
-                logger.error(f"Failed to write {table_data['trusted_table']}: {e}")
+                logger.error(f"Failed to write {trusted_table_name}: {outcome.error}")
         
         # Determine overall success
         success = len(failed_loads) == 0
         
-        message = f"Created {successful_loads} trusted parquet tables"
+        message = f"Created {len(tables_created)} trusted parquet tables"
         if failed_loads:
             message += f", {len(failed_loads)} failed"
         
@@ -196,20 +642,171 @@ class RawToTrustedProcessor(BaseProcessor):
             success=success,
             message=message,
             metadata={
-                'successful_loads': successful_loads,
+                'successful_loads': len(tables_created),
                 'failed_loads': failed_loads,
                 'tables_processed': list(transformed_data.keys()),
+                'table_timings': {table_key: outcome.timings for table_key, outcome in outcomes.items()},
+                'table_rows': {table_key: outcome.rows for table_key, outcome in outcomes.items()},
+                'table_bytes': {table_key: outcome.result['bytes'] for table_key, outcome in outcomes.items()
+                                if outcome.success and 'bytes' in outcome.result},
+                'memory_budget_bytes': self.memory_budget,
+                'peak_memory_bytes': peak_rss_bytes(),
+                'spill_bytes': sum(outcome.result.get('spill_bytes', 0) for outcome in outcomes.values()),
                 'trusted_prefix': self.trusted_prefix,
                 'ingestion_date': self.ingestion_date,
+                'conversion_engine': self.engine,
+                'dimension_mode': self.dimension_mode,
                 'format': 'PARQUET',
                 'compression': 'SNAPPY',
                 'partitioned': True,
                 'trino_enabled': True
             },
-            rows_processed=total_tables,
+            rows_processed=sum(outcome.rows for outcome in outcomes.values()),
             tables_created=tables_created
         )
     
+    def _output_table(self, trusted_table_name: str) -> str:
+        """Table a trusted table's partition is committed to: its SCD2 history in scd2 mode"""
+        if self.dimension_mode == 'scd2' and trusted_table_name in get_scd2_tables():
+            return f"{trusted_table_name}{SCD2_SUFFIX}"
+        return trusted_table_name
+    
+    def _commit_outcomes(self, new_outcomes: Dict[str, TableOutcome], trusted_tables: Dict[str, str],
+                         outcomes: Optional[Dict[str, TableOutcome]] = None) -> None:
+        """Publish each written partition by committing it to its table's manifest
+        
+        Until the commit, readers keep seeing the partition's previous files. A
+        failed commit marks the table failed (in outcomes, default new_outcomes).
+        """
+        outcomes = new_outcomes if outcomes is None else outcomes
+        for table_key, outcome in list(new_outcomes.items()):
+            trusted_table_name = trusted_tables[table_key]
+            if not outcome.success:
+                continue
+            try:
+                manifest = self.datalake.commit_partition(trusted_table_name, self.ingestion_date,
+                                                          [outcome.result['object_key']])
+                outcome.result['bytes'] = manifest.files[outcome.result['object_key']]['bytes']
+            except Exception as e:
+                logger.error(f"Failed to commit {trusted_table_name}: {e}")
+                outcomes[table_key] = TableOutcome(table_key, False, error=f"Commit failed: {e}",
+                                                   timings=outcome.timings)
+    
+    def _run_enrichment(self, table_name: str, outcomes: Dict[str, TableOutcome]) -> TableOutcome:
+        """Build one enriched table once its source and dimension partitions are written"""
+        schema = get_trusted_schema(table_name)
+        table_key = schema['location_suffix']
+        
+        inputs = [schema['enrich_from']] + [dim_table for dim_table, _, _ in schema['dimension_joins']]
+        missing = [
+            input_table for input_table in inputs
+            if not getattr(outcomes.get(get_trusted_schema(input_table)['location_suffix']), 'success', False)
+        ]
+        if missing:
+            return TableOutcome(table_key, False, error=f"Inputs not written: {', '.join(missing)}")
+        
+        # The source partition is this run's file; read the local copy kept when it was written
+        source_result = outcomes[get_trusted_schema(schema['enrich_from'])['location_suffix']].result
+        source_paths = [source_result['local_path']] if source_result.get('local_path') else None
+        
+        started = time.perf_counter()
+        try:
+            result = self._load_enriched(table_name, source_paths)
+        except Exception as e:
+            logger.error(f"Failed to enrich {table_name}: {e}")
+            return TableOutcome(table_key, False, error=str(e),
+                                timings={'load': time.perf_counter() - started})
+        return TableOutcome(table_key, True, rows=result['rows'], result=result,
+                            timings={'load': time.perf_counter() - started})
+    
+    def _download_partition(self, table_name: str, work_dir: Path) -> List[Path]:
+        """Download this ingestion_date's committed parquet files of a trusted table"""
+        location_suffix = get_trusted_schema(table_name)['location_suffix']
+        
+        paths = []
+        for object_name in self.datalake.list_partition_objects(table_name, self.ingestion_date):
+            local_path = work_dir / location_suffix / Path(object_name).name
+            local_path.parent.mkdir(parents=True, exist_ok=True)
+            if not self.datalake.minio.download_file(object_name, local_path):
+                raise Exception(f"Could not download {object_name}")
+            paths.append(local_path)
+        
+        if not paths:
+            raise Exception(f"No {table_name} files for ingestion_date={self.ingestion_date}")
+        return paths
+    
+    def _load_enriched(self, table_name: str, source_paths: Optional[List[Path]] = None) -> Dict[str, Any]:
+        """Write an enriched table by streaming its source partition through broadcast joins
+        
+        Dimension partitions are small and held in memory. The source partition is
+        read in batches with its join keys dictionary-encoded straight from parquet,
+        so memory stays bounded and each distinct key is looked up once per batch.
+        Categorical columns stay dictionary-encoded through to the output file.
+        source_paths are local copies of the source partition; it is downloaded without them.
+        """
+        schema = get_trusted_schema(table_name)
+        column_types = dict(schema['columns'])
+        categorical_cols = set(get_table_categorical_cols(table_name))
+        work_dir = Path(tempfile.mkdtemp(prefix="streampro-enrich-",
+                                         dir=self.spill_dir or settings.SPILL_DIRECTORY))
+        
+        try:
+            joins = []
+            for dim_table, key, dim_columns in schema['dimension_joins']:
+                if self._output_table(dim_table) != dim_table:
+                    # Kept as SCD2 history: the versions current at this ingestion_date
+                    current_sql = self.datalake.scd2_current_select(dim_table, self.ingestion_date)
+                    if current_sql is None:
+                        raise Exception(f"No {dim_table} history up to ingestion_date={self.ingestion_date}")
+                    with self._duckdb_lock:
+                        dimension = self.datalake.duckdb.execute_query(current_sql).fetch_arrow_table()
+                else:
+                    dimension = pa.concat_tables(
+                        [pq.read_table(path) for path in self._download_partition(dim_table, work_dir)],
+                        promote_options="default"
+                    )
+                joins.append(BroadcastJoin(dimension, key, dim_columns))
+            
+            output_path = work_dir / "data.parquet"
+            writer = None
+            rows = 0
+            try:
+                for path in source_paths or self._download_partition(schema['enrich_from'], work_dir):
+                    file_cols = set(pq.read_schema(path).names)
+                    parquet_file = pq.ParquetFile(
+                        path, read_dictionary=[join.key for join in joins] + sorted(categorical_cols & file_cols)
+                    )
+                    for batch in parquet_file.iter_batches(batch_size=self.chunk_rows or ENRICH_BATCH_ROWS):
+                        arrays = {name: (batch.column(name) if name in categorical_cols
+                                         else decode_dictionary(batch.column(name)))
+                                  for name in batch.schema.names}
+                        for join in joins:
+                            for col, values in join.apply(batch).items():
+                                values = values.cast(arrow_type(column_types[col]))
+                                arrays[col] = values.dictionary_encode() if col in categorical_cols else values
+                        
+                        names = [col for col, _ in schema['columns'] if col in arrays]
+                        enriched = pa.Table.from_arrays([arrays[col] for col in names], names=names)
+                        if writer is None:
+                            writer = pq.ParquetWriter(output_path, enriched.schema, compression='snappy')
+                        writer.write_table(enriched)
+                        rows += enriched.num_rows
+            finally:
+                if writer is not None:
+                    writer.close()
+            
+            if writer is None:
+                raise Exception(f"No rows to enrich from {schema['enrich_from']}")
+            
+            object_key = self._trusted_object_key(schema['location_suffix'])
+            if not self.datalake.minio.upload_file(output_path, object_key):
+                raise Exception("Failed to write to MinIO")
+            
+            logger.success(f"Wrote parquet file for {table_name} to {object_key} ({rows} rows)")
+            return {'rows': rows, 'object_key': object_key}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
     def _post_process(self, load_result: ProcessingResult) -> None:
         """Post-process: Create DuckDB views pointing to trusted parquet files"""
         logger.info("Creating DuckDB views for trusted parquet files")
@@ -219,14 +816,22 @@ class RawToTrustedProcessor(BaseProcessor):
         logger.info(f"Processing date: {load_result.metadata['ingestion_date']}")
         logger.info(f"Target format: {load_result.metadata['format']} with {load_result.metadata['compression']} compression")
         logger.info(f"Partitioned tables for optimized queries")
+        logger.info(f"Peak memory: {format_bytes(load_result.metadata['peak_memory_bytes'])} "
+                    f"(budget: {format_bytes(load_result.metadata['memory_budget_bytes'])}, "
+                    f"spilled: {format_bytes(load_result.metadata['spill_bytes'])})")
         
-        # Set up all trusted tables from parquet files - DuckDB makes this trivial!
-        success = self.datalake.setup_trusted_tables_from_parquet(self.ingestion_date)
+        # Expose the new partitions as views - nothing is re-materialized in memory
+        success = self.datalake.setup_trusted_views(self.ingestion_date)
+        if self.dimension_mode == 'scd2':
+            self.datalake.setup_scd2_views()
         
         if success:
             # Get stats for each table to show what's available
             external_tables_created = []
+            views = self.datalake.duckdb.list_views()
             for table_name in get_all_trusted_tables():
+                if table_name not in views:
+                    continue
                 try:
                     stats = self.datalake.get_table_stats(table_name)
                     if stats.get('row_count', 0) > 0:
@@ -259,4 +864,8 @@ class RawToTrustedProcessor(BaseProcessor):
     def cleanup(self):
         """Cleanup resources"""
         if hasattr(self, 'datalake'):
-            self.datalake.close()
\ No newline at end of file
+            self.datalake.close()
+        if self.spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+        if self.local_copy_dir:
+            shutil.rmtree(self.local_copy_dir, ignore_errors=True)
\ No newline at end of file
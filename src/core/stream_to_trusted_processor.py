@@ -0,0 +1,334 @@
+import json
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from loguru import logger
+import pandas as pd
+
+from src.core.base_processor import ProcessingResult
+from src.core.raw_to_trusted_processor import RawToTrustedProcessor
+from src.core.defaults import DEFAULT_STREAM_POLL_SECONDS, DEFAULT_STREAM_BATCH_FILES
+
+try:
+    from src.utils.config import settings
+except ImportError:
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+    from src.utils.config import settings
+
+from src.utils.schema_registry import get_trusted_schema, get_table_sort_cols
+from src.utils.tracing import flush_tracing
+
+STREAM_TABLE = 'trusted_events'
+EVENT_FILE_SUFFIXES = ('.jsonl', '.json')
+# Committed batches whose latencies feed the rolling percentiles
+LATENCY_WINDOW = 1000
+# Most recent skipped landing objects listed in the checkpoint; older ones are only counted
+MAX_FAILED_OBJECTS = 1000
+
+
+class StreamMetrics:
+    """Throughput and end-to-end latency of committed micro-batches
+
+    Latency is measured per landing object, from its last-modified time to the
+    commit of the batch that made it queryable in the trusted layer.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.batches = 0
+        self.objects = 0
+        self.rows = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+        self.last_batch: Optional[Dict[str, Any]] = None
+
+    def record(self, batch: Dict[str, Any], latencies: List[float]) -> None:
+        self.batches += 1
+        self.objects += batch['objects']
+        self.rows += batch['rows']
+        self.bytes += batch['bytes']
+        self.busy_seconds += batch['seconds']
+        self.latencies.extend(latencies)
+        self.last_batch = batch
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 3)
+
+        return {
+            'batches': self.batches,
+            'objects': self.objects,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'rows_per_second': round(self.rows / self.busy_seconds, 1) if self.busy_seconds else None,
+            'latency_p50_seconds': percentile(0.50),
+            'latency_p95_seconds': percentile(0.95),
+            'latency_max_seconds': round(latencies[-1], 3) if latencies else None,
+            'last_batch': self.last_batch
+        }
+
+
+class StreamToTrustedProcessor(RawToTrustedProcessor):
+    """Move new landing event files into the trusted layer in micro-batches
+
+    Polls the landing prefix for event files (notify() wakes it early), copies
+    each new file to raw, converts a micro-batch of them into one trusted parquet
+    file and then commits the batch's offset. A restart resumes after the last
+    committed offset; a batch that was written but not committed is rewritten
+    under the same file name in the same partition (its ingestion_date is pinned
+    in the checkpoint before anything is written), so it is not duplicated.
+    """
+
+    def __init__(self, processor_id: str = "stream_to_trusted_processor", minio_client=None):
+        super().__init__(processor_id, minio_client=minio_client)
+        self.description = "Stream landing event files into the trusted layer in micro-batches"
+
+        self.landing_prefix = settings.LANDING_PREFIX
+        self.poll_interval = DEFAULT_STREAM_POLL_SECONDS
+        self.max_batch_files = DEFAULT_STREAM_BATCH_FILES
+        self.max_batches: Optional[int] = None
+        self.idle_timeout: Optional[float] = None
+        self.fixed_ingestion_date: Optional[str] = None
+        self.metrics = StreamMetrics()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+
+    def set_args(self, args):
+        """Set arguments from job manager"""
+        super().set_args(args)
+        # Without --ingestion_date each batch lands in the partition of the day it is processed
+        self.fixed_ingestion_date = getattr(args, 'ingestion_date', None) if args else None
+
+        if args and getattr(args, 'poll_interval', None) is not None:
+            self.poll_interval = args.poll_interval
+        if args and getattr(args, 'max_batch_files', None):
+            self.max_batch_files = args.max_batch_files
+        if args and getattr(args, 'max_batches', None):
+            self.max_batches = args.max_batches
+        if args and getattr(args, 'idle_timeout', None) is not None:
+            self.idle_timeout = args.idle_timeout
+
+    def notify(self, object_name: Optional[str] = None) -> None:
+        """Wake the poll loop now, e.g. from a bucket notification for object_name"""
+        logger.debug(f"Notified of {object_name or 'new landing objects'}")
+        self._wakeup.set()
+
+    def stop(self) -> None:
+        """Stop after the batch in progress is committed"""
+        self._stopping.set()
+        self._wakeup.set()
+
+    @property
+    def checkpoint_key(self) -> str:
+        location_suffix = get_trusted_schema(STREAM_TABLE)['location_suffix']
+        return f"{self.trusted_prefix}/_stream/{location_suffix}/checkpoint.json"
+
+    def _extract(self) -> Dict[str, Any]:
+        """Extract: Load the last committed offset"""
+        data = self.datalake.minio.read_bytes(self.checkpoint_key)
+        if data:
+            checkpoint = json.loads(data)
+            logger.info(f"Resuming after batch {checkpoint['batch_id']} "
+                        f"(offset {checkpoint['offset']['last_modified']})")
+            return checkpoint
+
+        logger.info("No stream checkpoint found, starting from the beginning of landing")
+        return {'batch_id': 0, 'offset': {'last_modified': None, 'objects': []}, 'failed': [], 'failed_total': 0}
+
+    def _transform(self, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Transform: Transformations are applied per micro-batch (see _run_batch)"""
+        return extracted_data
+
+    def _load(self, transformed_data: Dict[str, Any]) -> ProcessingResult:
+        """Load: Poll landing and commit micro-batches until stopped, idle or at max_batches"""
+        checkpoint = transformed_data
+        logger.info(f"Streaming {self.landing_prefix}/ into {STREAM_TABLE} "
+                    f"(poll every {self.poll_interval}s, up to {self.max_batch_files} files per batch)")
+
+        batches_run = 0
+        idle_since = time.monotonic()
+        try:
+            while not self._stopping.is_set():
+                pending = self._pending_objects(checkpoint)
+                if pending:
+                    try:
+                        checkpoint = self._run_batch(pending[:self.max_batch_files], checkpoint)
+                    except Exception as e:
+                        # Nothing was committed; the same objects are retried on the next poll
+                        logger.error(f"Micro-batch {checkpoint['batch_id'] + 1} failed: {e}")
+                    else:
+                        batches_run += 1
+                        idle_since = time.monotonic()
+                        if self.max_batches and batches_run >= self.max_batches:
+                            break
+                        if len(pending) > self.max_batch_files:
+                            continue  # Work through a backlog without waiting
+                    finally:
+                        # Write the batch's spans out instead of holding them for the whole run
+                        flush_tracing()
+                elif self.idle_timeout is not None and time.monotonic() - idle_since >= self.idle_timeout:
+                    logger.info(f"No new landing objects for {self.idle_timeout}s, stopping")
+                    break
+
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+        except KeyboardInterrupt:
+            logger.info("Stream interrupted, stopping after the last committed batch")
+
+        summary = self.metrics.summary()
+        return ProcessingResult(
+            success=True,
+            message=f"Committed {summary['batches']} micro-batches ({summary['rows']:,} rows)",
+            metadata={
+                'stream_metrics': summary,
+                'batch_id': checkpoint['batch_id'],
+                'offset': checkpoint['offset'],
+                'failed_objects': checkpoint['failed'],
+                'failed_total': checkpoint.get('failed_total', len(checkpoint['failed'])),
+                'trusted_prefix': self.trusted_prefix,
+                'ingestion_date': self.ingestion_date
+            },
+            rows_processed=summary['rows'],
+            tables_created=[STREAM_TABLE] if summary['batches'] else []
+        )
+
+    def _pending_objects(self, checkpoint: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Landing event files after the committed offset, oldest first"""
+        watermark = checkpoint['offset']['last_modified']
+        watermark = datetime.fromisoformat(watermark) if watermark else None
+        seen_at_watermark = set(checkpoint['offset']['objects'])
+
+        pending = []
+        for obj in self.datalake.minio.list_object_info(prefix=f"{self.landing_prefix}/"):
+            file_name = Path(obj['name']).name
+            if not (file_name.startswith('events') and file_name.endswith(EVENT_FILE_SUFFIXES)):
+                continue
+            # Objects sharing the watermark's timestamp are told apart by name
+            if (watermark is None or obj['last_modified'] > watermark
+                    or (obj['last_modified'] == watermark and obj['name'] not in seen_at_watermark)):
+                pending.append(obj)
+
+        return sorted(pending, key=lambda obj: (obj['last_modified'], obj['name']))
+
+    def _run_batch(self, objects: List[Dict[str, Any]], checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert one micro-batch of landing files into a trusted file, then commit its offset"""
+        started = time.perf_counter()
+        batch_id = checkpoint['batch_id'] + 1
+        self.ingestion_date = self._pin_ingestion_date(checkpoint, batch_id)
+
+        frames = []
+        failed = []
+        for obj in objects:
+            try:
+                data = self.datalake.minio.read_bytes(obj['name'])
+                if data is None:
+                    raise Exception("object could not be read")
+                records = [json.loads(line) for line in data.decode('utf-8').splitlines() if line.strip()]
+                frames.append(pd.DataFrame(records))
+            except Exception as e:
+                # A malformed file must not stall the stream; it is recorded and skipped
+                logger.error(f"Skipping {obj['name']}: {e}")
+                failed.append({'object': obj['name'], 'error': str(e)})
+                continue
+
+            raw_key = f"{self.raw_prefix}/ingestion_date={self.ingestion_date}/{Path(obj['name']).name}"
+            if not self.datalake.minio.copy_object(
+                obj['name'], raw_key,
+                metadata={'source-etag': obj['etag'], 'source-size': str(obj['size'])}
+            ):
+                raise Exception(f"Failed to copy {obj['name']} to raw")
+
+        rows = 0
+        object_key = None
+        frames = [frame for frame in frames if not frame.empty]
+        if frames:
+            df = self._transform_frame(pd.concat(frames, ignore_index=True), STREAM_TABLE)
+            sort_cols = [col for col in get_table_sort_cols(STREAM_TABLE) if col in df.columns]
+            if sort_cols:
+                df = df.sort_values(sort_cols, kind='stable', ignore_index=True)
+
+            location_suffix = get_trusted_schema(STREAM_TABLE)['location_suffix']
+            object_key = (f"{self.trusted_prefix}/{location_suffix}/ingestion_date={self.ingestion_date}/"
+                          f"part-stream-{batch_id:08d}.parquet")
+            if not self._upload_trusted_frame(df, STREAM_TABLE, object_key):
+                raise Exception("Failed to write to MinIO")
+            self.datalake.commit_partition(STREAM_TABLE, self.ingestion_date, [object_key], replace=False)
+            self.datalake.update_zone_map(STREAM_TABLE, self.ingestion_date, [object_key])
+            rows = len(df)
+
+        # Commit: the offset moves past every object of the batch, including skipped ones
+        last_modified = objects[-1]['last_modified']
+        previous = checkpoint['offset']
+        seen = previous['objects'] if previous['last_modified'] == last_modified.isoformat() else []
+        committed_at = datetime.now(timezone.utc)
+        latencies = [(committed_at - obj['last_modified']).total_seconds() for obj in objects]
+        batch_metrics = {
+            'batch_id': batch_id,
+            'objects': len(objects),
+            'rows': rows,
+            'bytes': sum(obj['size'] for obj in objects),
+            'seconds': round(time.perf_counter() - started, 3),
+            'latency_max_seconds': round(max(latencies), 3),
+            'object_key': object_key
+        }
+        self.metrics.record(batch_metrics, latencies)
+
+        new_checkpoint = {
+            'batch_id': batch_id,
+            'offset': {
+                'last_modified': last_modified.isoformat(),
+                'objects': seen + [obj['name'] for obj in objects if obj['last_modified'] == last_modified]
+            },
+            'failed': (checkpoint['failed'] + failed)[-MAX_FAILED_OBJECTS:],
+            'failed_total': checkpoint.get('failed_total', len(checkpoint['failed'])) + len(failed),
+            'committed_at': committed_at.isoformat(),
+            'metrics': self.metrics.summary()
+        }
+        self._write_checkpoint(new_checkpoint)
+
+        logger.success(f"Batch {batch_id}: {len(objects)} files, {rows:,} rows -> {object_key} "
+                       f"in {batch_metrics['seconds']:.2f}s, latency up to {batch_metrics['latency_max_seconds']:.1f}s")
+        return new_checkpoint
+
+    def _pin_ingestion_date(self, checkpoint: Dict[str, Any], batch_id: int) -> str:
+        """Partition of a batch, recorded in the checkpoint before the batch writes anything
+
+        A batch retried after a crash (even past UTC midnight) finds its pinned date
+        and rewrites the same partition; --ingestion_date still takes precedence.
+        """
+        pending = checkpoint.get('pending')
+        if (pending and pending['batch_id'] == batch_id
+                and self.fixed_ingestion_date in (None, pending['ingestion_date'])):
+            return pending['ingestion_date']
+
+        ingestion_date = self.fixed_ingestion_date or datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        checkpoint['pending'] = {'batch_id': batch_id, 'ingestion_date': ingestion_date}
+        self._write_checkpoint(checkpoint)
+        return ingestion_date
+
+    def _write_checkpoint(self, checkpoint: Dict[str, Any]) -> None:
+        if not self.datalake.minio.upload_bytes(json.dumps(checkpoint, indent=2).encode('utf-8'),
+                                                self.checkpoint_key, content_type='application/json'):
+            raise Exception("Failed to commit stream checkpoint")
+
+    def _post_process(self, load_result: ProcessingResult) -> None:
+        """Post-process: Log the stream's throughput and latency"""
+        summary = load_result.metadata['stream_metrics']
+        if summary['batches']:
+            logger.info(f"Stream summary: {summary['batches']} batches, {summary['objects']} files, "
+                        f"{summary['rows']:,} rows, {summary['rows_per_second']} rows/s, "
+                        f"latency p50 {summary['latency_p50_seconds']}s / p95 {summary['latency_p95_seconds']}s")
+        else:
+            logger.info("No new landing files were committed")
+        if load_result.metadata['failed_total']:
+            logger.warning(f"Landing objects skipped so far: {load_result.metadata['failed_total']} "
+                           f"(the last {MAX_FAILED_OBJECTS} listed in {self.checkpoint_key})")
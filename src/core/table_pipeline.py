@@ -0,0 +1,149 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from loguru import logger
+
+from src.utils.tracing import attach, current_span, span
+
+# Marks the end of the extracted-table stream for a load worker
+_DONE = object()
+
+
+@dataclass
+class TableOutcome:
+    """Result of running one table through the pipeline"""
+    table: str
+    success: bool
+    rows: int = 0
+    error: Optional[str] = None
+    result: Dict[str, Any] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class TablePipeline:
+    """Run extract -> transform -> load per table, overlapping tables with each other
+
+    Extract workers read tables concurrently and hand them to load workers through a
+    bounded queue: when loads fall behind, extract workers block instead of piling
+    more datasets into memory. Each table is dropped as soon as its load finishes.
+    """
+
+    def __init__(self,
+                 extract_fn: Callable[[str], Any],
+                 transform_fn: Callable[[str, Any], Any],
+                 load_fn: Callable[[str, Any], Dict[str, Any]],
+                 workers: int = 4,
+                 queue_size: int = 2):
+        """Initialize the pipeline
+
+        Args:
+            extract_fn: Reads one table, returns its data or None if unavailable
+            transform_fn: Transforms one table's extracted data
+            load_fn: Writes one table's transformed data, returns a result dict
+                (its 'rows' entry is reported on the outcome)
+            workers: Number of extract workers and of transform/load workers
+            queue_size: Maximum number of extracted tables waiting to be loaded
+        """
+        self.extract_fn = extract_fn
+        self.transform_fn = transform_fn
+        self.load_fn = load_fn
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+
+    def run(self, tables: List[str]) -> Dict[str, TableOutcome]:
+        """Process all tables and return an outcome per table"""
+        outcomes: Dict[str, TableOutcome] = {}
+        outcomes_lock = threading.Lock()
+        pending = queue.Queue()
+        for table in tables:
+            pending.put(table)
+        extracted = queue.Queue(maxsize=self.queue_size)
+        # Worker threads start without trace context; their spans nest under the caller's
+        parent_span = current_span()
+
+        def record(outcome: TableOutcome):
+            with outcomes_lock:
+                outcomes[outcome.table] = outcome
+
+        def extract_worker():
+            with attach(parent_span):
+                extract_tables()
+
+        def extract_tables():
+            while True:
+                try:
+                    table = pending.get_nowait()
+                except queue.Empty:
+                    return
+                started = time.perf_counter()
+                try:
+                    with span("table.extract", table=table):
+                        data = self.extract_fn(table)
+                except Exception as e:
+                    logger.error(f"Failed to extract {table}: {e}")
+                    data = None
+                extract_seconds = time.perf_counter() - started
+
+                if data is None:
+                    record(TableOutcome(table, False, error="Extract returned no data",
+                                        timings={'extract': extract_seconds}))
+                    continue
+                # Blocks while the queue is full - backpressure on extraction
+                extracted.put((table, data, extract_seconds))
+                del data
+
+        def load_worker():
+            with attach(parent_span):
+                load_tables()
+
+        def load_tables():
+            while True:
+                item = extracted.get()
+                if item is _DONE:
+                    return
+                table, data, extract_seconds = item
+                del item
+                timings = {'extract': extract_seconds}
+                try:
+                    started = time.perf_counter()
+                    with span("table.transform", table=table):
+                        data = self.transform_fn(table, data)
+                    timings['transform'] = time.perf_counter() - started
+
+                    started = time.perf_counter()
+                    with span("table.load", table=table) as load_span:
+                        result = self.load_fn(table, data) or {}
+                        load_span.set(rows=result.get('rows', 0))
+                    timings['load'] = time.perf_counter() - started
+
+                    record(TableOutcome(table, True, rows=result.get('rows', 0),
+                                        result=result, timings=timings))
+                    logger.debug(f"Pipeline finished {table} in {sum(timings.values()):.2f}s")
+                except Exception as e:
+                    logger.error(f"Failed to process {table}: {e}")
+                    record(TableOutcome(table, False, error=str(e), timings=timings))
+                finally:
+                    # Release the table's memory before picking up the next one
+                    del data
+
+        extract_threads = [
+            threading.Thread(target=extract_worker, name=f"extract-{i}", daemon=True)
+            for i in range(min(self.workers, len(tables)))
+        ]
+        load_threads = [
+            threading.Thread(target=load_worker, name=f"load-{i}", daemon=True)
+            for i in range(min(self.workers, len(tables)))
+        ]
+        for thread in extract_threads + load_threads:
+            thread.start()
+
+        for thread in extract_threads:
+            thread.join()
+        for _ in load_threads:
+            extracted.put(_DONE)
+        for thread in load_threads:
+            thread.join()
+
+        return {table: outcomes[table] for table in tables if table in outcomes}
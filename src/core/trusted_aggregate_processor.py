@@ -0,0 +1,139 @@
+from typing import Dict, Any
+from datetime import datetime
+from loguru import logger
+
+from src.core.base_processor import BaseProcessor, ProcessingResult
+
+try:
+    from src.utils.config import settings
+except ImportError:
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+    from src.utils.config import settings
+
+from src.connect.duckdb_client import DataLakeManager
+from src.utils.schema_registry import (
+    get_all_aggregate_tables,
+    get_aggregate_schema,
+    build_aggregate_select,
+)
+from src.utils.hll import HyperLogLog
+
+
+class TrustedAggregateProcessor(BaseProcessor):
+    """Maintain trusted-layer rollups one ingestion_date partition at a time"""
+
+    def __init__(self, processor_id: str = "trusted_aggregate_processor"):
+        super().__init__(processor_id, "Update trusted aggregates for one ingestion_date")
+
+        self.datalake = DataLakeManager()
+        logger.info("DuckDB Data Lake Manager initialized")
+
+        self.trusted_prefix = settings.TRUSTED_PREFIX
+        self.ingestion_date = datetime.now().strftime("%Y-%m-%d")
+        self.aggregates = get_all_aggregate_tables()
+
+    def set_args(self, args):
+        """Set arguments from job manager"""
+        self.args = args
+        if args and getattr(args, 'ingestion_date', None):
+            self.ingestion_date = args.ingestion_date
+            logger.info(f"Using specified ingestion_date: {self.ingestion_date}")
+        else:
+            logger.info(f"Using current date as ingestion_date: {self.ingestion_date}")
+
+        if args and getattr(args, 'aggregate', None):
+            self.aggregates = [args.aggregate]
+
+    def _partition_key(self, aggregate_name: str) -> str:
+        location_suffix = get_aggregate_schema(aggregate_name)['location_suffix']
+        return f"{self.trusted_prefix}/{location_suffix}/ingestion_date={self.ingestion_date}/data.parquet"
+
+    def _extract(self) -> Dict[str, Any]:
+        """Extract: Resolve the source partition files of each aggregate for this ingestion_date"""
+        logger.info(f"Resolving source partitions for ingestion_date={self.ingestion_date}")
+
+        extracted_data = {}
+        for aggregate_name in self.aggregates:
+            source_table = get_aggregate_schema(aggregate_name)['source_table']
+            files = self.datalake.list_trusted_partition_files(
+                source_table, self.ingestion_date, self.ingestion_date
+            )
+            extracted_data[aggregate_name] = {'source_table': source_table, 'files': files}
+            logger.info(f"{aggregate_name}: {len(files)} {source_table} files")
+
+        return extracted_data
+
+    def _transform(self, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Transform: Build the rollup query for each aggregate partition"""
+        plans = {}
+        for aggregate_name, source in extracted_data.items():
+            if not source['files']:
+                logger.warning(f"No {source['source_table']} partition for "
+                               f"ingestion_date={self.ingestion_date}, skipping {aggregate_name}")
+                continue
+
+            source_relation = self.datalake.duckdb.read_parquet_expr(source['files'])
+            plans[aggregate_name] = build_aggregate_select(
+                aggregate_name, source_relation, {'ingestion_date': self.ingestion_date}
+            )
+
+        return plans
+
+    def _load(self, transformed_data: Dict[str, Any]) -> ProcessingResult:
+        """Load: Compute each rollup partition and overwrite it in the trusted layer"""
+        logger.info("Writing aggregate partitions")
+
+        tables_created = []
+        failed_aggregates = []
+        aggregate_rows = {}
+
+        for aggregate_name, select_sql in transformed_data.items():
+            try:
+                df = self.datalake.duckdb.query_to_df(select_sql)
+                for sketch_col, _, _ in get_aggregate_schema(aggregate_name)['sketches']:
+                    df[sketch_col] = df[sketch_col].map(lambda codes: HyperLogLog.from_register_codes(codes).to_bytes())
+                
+                object_key = self._partition_key(aggregate_name)
+
+                # One file per ingestion_date: reruns replace the partition instead of adding to it
+                if not self.datalake.minio.upload_dataframe(df=df, object_name=object_key, format='parquet'):
+                    raise Exception("Failed to write to MinIO")
+
+                aggregate_rows[aggregate_name] = len(df)
+                tables_created.append(aggregate_name)
+                logger.success(f"Wrote {aggregate_name} partition to {object_key} ({len(df)} rows)")
+            except Exception as e:
+                failed_aggregates.append({'aggregate': aggregate_name, 'error': str(e)})
+                logger.error(f"Failed to update {aggregate_name}: {e}")
+
+        success = len(failed_aggregates) == 0
+        message = f"Updated {len(tables_created)} aggregate partitions"
+        if failed_aggregates:
+            message += f", {len(failed_aggregates)} failed"
+
+        return ProcessingResult(
+            success=success,
+            message=message,
+            metadata={
+                'aggregate_rows': aggregate_rows,
+                'failed_aggregates': failed_aggregates,
+                'ingestion_date': self.ingestion_date
+            },
+            rows_processed=sum(aggregate_rows.values()),
+            tables_created=tables_created
+        )
+
+    def _post_process(self, load_result: ProcessingResult) -> None:
+        """Post-process: Refresh the aggregate views"""
+        if load_result.tables_created:
+            self.datalake.setup_aggregate_views()
+
+        if load_result.metadata['failed_aggregates']:
+            logger.warning(f"Failed aggregates: {len(load_result.metadata['failed_aggregates'])}")
+
+    def cleanup(self):
+        """Cleanup resources"""
+        if hasattr(self, 'datalake'):
+            self.datalake.close()
@@ -0,0 +1,228 @@
+import uuid
+from io import BytesIO
+from typing import Dict, Any, List
+from datetime import datetime
+from loguru import logger
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.core.base_processor import BaseProcessor, ProcessingResult
+from src.core.defaults import DEFAULT_TARGET_FILE_SIZE_MB, DEFAULT_RETENTION_HOURS
+
+try:
+    from src.utils.config import settings
+except ImportError:
+    import sys
+    from pathlib import Path
+    sys.path.append(str(Path(__file__).parent.parent.parent))
+    from src.utils.config import settings
+
+from src.connect.duckdb_client import DataLakeManager
+from src.utils.schema_registry import (
+    get_all_trusted_tables, get_trusted_schema, get_table_sort_cols, get_table_categorical_cols
+)
+
+
+class TrustedCompactionProcessor(BaseProcessor):
+    """Merge small parquet files in trusted partitions up to a target file size"""
+
+    def __init__(self, processor_id: str = "trusted_compaction_processor"):
+        super().__init__(processor_id, "Compact small parquet files in trusted partitions")
+
+        self.datalake = DataLakeManager()
+        logger.info("DuckDB Data Lake Manager initialized")
+
+        self.trusted_prefix = settings.TRUSTED_PREFIX
+        self.ingestion_date = datetime.now().strftime("%Y-%m-%d")
+        self.tables = get_all_trusted_tables()
+        self.target_file_size = DEFAULT_TARGET_FILE_SIZE_MB * 1024 * 1024
+        self.retention_seconds = DEFAULT_RETENTION_HOURS * 3600
+
+    def set_args(self, args):
+        """Set arguments from job manager"""
+        self.args = args
+        if args and getattr(args, 'ingestion_date', None):
+            self.ingestion_date = args.ingestion_date
+            logger.info(f"Using specified ingestion_date: {self.ingestion_date}")
+        else:
+            logger.info(f"Using current date as ingestion_date: {self.ingestion_date}")
+
+        if args and getattr(args, 'table', None):
+            self.tables = [args.table]
+        if args and getattr(args, 'target_file_size_mb', None):
+            self.target_file_size = int(args.target_file_size_mb * 1024 * 1024)
+        if args and getattr(args, 'retention_hours', None) is not None:
+            self.retention_seconds = args.retention_hours * 3600
+
+    def _partition_prefix(self, table_name: str) -> str:
+        location_suffix = get_trusted_schema(table_name)['location_suffix']
+        return f"{self.trusted_prefix}/{location_suffix}/ingestion_date={self.ingestion_date}/"
+
+    def _extract(self) -> Dict[str, Any]:
+        """Extract: Committed parquet files (with sizes) of each trusted partition"""
+        logger.info(f"Reading trusted partitions for ingestion_date={self.ingestion_date}")
+
+        extracted_data = {}
+        for table_name in self.tables:
+            manifest = self.datalake.load_manifest(table_name)
+            if manifest is not None:
+                files = [{'name': name, 'size': manifest.files[name]['bytes']}
+                         for name in manifest.partition_files(self.ingestion_date)]
+            else:
+                files = [
+                    obj for obj in self.datalake.minio.list_object_info(prefix=self._partition_prefix(table_name))
+                    if obj['name'].endswith('.parquet')
+                ]
+            extracted_data[table_name] = sorted(files, key=lambda obj: obj['name'])
+            logger.info(f"{table_name}: {len(files)} files, "
+                        f"{sum(obj['size'] for obj in files):,} bytes")
+
+        return extracted_data
+
+    def _transform(self, extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Transform: Plan bins of small files, each filled up to the target file size"""
+        logger.info(f"Planning compaction with target file size {self.target_file_size:,} bytes")
+
+        plans = {}
+        for table_name, files in extracted_data.items():
+            bins: List[List[Dict[str, Any]]] = []
+            current_bin: List[Dict[str, Any]] = []
+            current_size = 0
+
+            for obj in files:
+                # Files already at the target size are left untouched
+                if obj['size'] >= self.target_file_size:
+                    continue
+                if current_bin and current_size + obj['size'] > self.target_file_size:
+                    bins.append(current_bin)
+                    current_bin, current_size = [], 0
+                current_bin.append(obj)
+                current_size += obj['size']
+            if current_bin:
+                bins.append(current_bin)
+
+            plans[table_name] = {
+                'files': files,
+                'bins': [file_bin for file_bin in bins if len(file_bin) > 1]
+            }
+            logger.info(f"{table_name}: {len(plans[table_name]['bins'])} bins to compact")
+
+        return plans
+
+    def _compact_bin(self, table_name: str, file_bin: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Merge one bin of files into a single sorted parquet file"""
+        # Categorical columns read as dictionaries whichever engine wrote the file,
+        # so the inputs share one schema and the output keeps dictionary encoding
+        categorical_cols = get_table_categorical_cols(table_name)
+        tables = []
+        for obj in file_bin:
+            data = self.datalake.minio.read_bytes(obj['name'])
+            if data is None:
+                raise Exception(f"Could not read {obj['name']}")
+            tables.append(pq.read_table(BytesIO(data), read_dictionary=categorical_cols))
+
+        merged = pa.concat_tables(tables, promote_options="default")
+        sort_cols = [col for col in get_table_sort_cols(table_name) if col in merged.column_names]
+        if sort_cols:
+            merged = merged.sort_by([(col, "ascending") for col in sort_cols])
+
+        buffer = BytesIO()
+        pq.write_table(merged, buffer, compression="snappy")
+        data = buffer.getvalue()
+
+        file_name = f"part-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+        target_key = f"{self._partition_prefix(table_name)}{file_name}"
+
+        # Unread until committed to the manifest together with the removal of its inputs
+        if not self.datalake.minio.upload_bytes(data, target_key):
+            raise Exception(f"Could not write {target_key}")
+
+        logger.info(f"Compacted {len(file_bin)} files ({merged.num_rows:,} rows) into {target_key}")
+        return {'key': target_key, 'size': len(data), 'rows': merged.num_rows}
+
+    def _load(self, transformed_data: Dict[str, Any]) -> ProcessingResult:
+        """Load: Write compacted files, swap them for their inputs in one manifest commit, then vacuum"""
+        logger.info("Compacting trusted partitions")
+
+        table_stats = {}
+        failed_tables = []
+
+        for table_name, plan in transformed_data.items():
+            files_before = len(plan['files'])
+            bytes_before = sum(obj['size'] for obj in plan['files'])
+            files_after, bytes_after = files_before, bytes_before
+
+            outputs = []
+            try:
+                for file_bin in plan['bins']:
+                    outputs.append(self._compact_bin(table_name, file_bin))
+                if outputs:
+                    entries = self.datalake.describe_files(table_name, [output['key'] for output in outputs])
+                    inputs = [obj['name'] for file_bin in plan['bins'] for obj in file_bin]
+
+                    def swap(manifest, entries=entries, inputs=inputs):
+                        missing = [name for name in inputs if name not in manifest.files]
+                        if missing:
+                            # Rewritten concurrently (e.g. to_trusted rerun); the outputs would resurrect them
+                            raise Exception(f"{len(missing)} input files are no longer committed")
+                        manifest.remove_files(inputs)
+                        manifest.add_files(entries)
+
+                    self.datalake.commit_manifest(table_name, f"compact ingestion_date={self.ingestion_date}", swap)
+                    files_after += len(outputs) - len(inputs)
+                    bytes_after += sum(output['size'] for output in outputs) - sum(
+                        obj['size'] for file_bin in plan['bins'] for obj in file_bin)
+                    # Compacted files replace indexed ones; refresh the partition's zone map
+                    self.datalake.update_zone_map(table_name, self.ingestion_date)
+            except Exception as e:
+                failed_tables.append({'table': table_name, 'error': str(e)})
+                logger.error(f"Failed to compact {table_name}: {e}")
+                for output in outputs:
+                    self.datalake.minio.delete_object(output['key'])
+
+            table_stats[table_name] = {
+                'files_before': files_before,
+                'files_after': files_after,
+                'bytes_before': bytes_before,
+                'bytes_after': bytes_after,
+                'files_vacuumed': len(self.datalake.vacuum_manifest(table_name, self.retention_seconds))
+            }
+
+        success = len(failed_tables) == 0
+        compacted = sum(1 for stats in table_stats.values() if stats['files_after'] < stats['files_before'])
+        message = f"Compacted {compacted} trusted partitions"
+        if failed_tables:
+            message += f", {len(failed_tables)} failed"
+
+        return ProcessingResult(
+            success=success,
+            message=message,
+            metadata={
+                'table_stats': table_stats,
+                'failed_tables': failed_tables,
+                'files_before': sum(stats['files_before'] for stats in table_stats.values()),
+                'files_after': sum(stats['files_after'] for stats in table_stats.values()),
+                'bytes_before': sum(stats['bytes_before'] for stats in table_stats.values()),
+                'bytes_after': sum(stats['bytes_after'] for stats in table_stats.values()),
+                'target_file_size': self.target_file_size,
+                'ingestion_date': self.ingestion_date
+            },
+            rows_processed=0,
+            tables_created=[]
+        )
+
+    def _post_process(self, load_result: ProcessingResult) -> None:
+        """Post-process: Log files and bytes before and after compaction"""
+        logger.info(f"Compaction summary for ingestion_date={self.ingestion_date}:")
+        for table_name, stats in load_result.metadata['table_stats'].items():
+            logger.info(f"{table_name}: {stats['files_before']} -> {stats['files_after']} files, "
+                        f"{stats['bytes_before']:,} -> {stats['bytes_after']:,} bytes, "
+                        f"{stats['files_vacuumed']} replaced files vacuumed")
+
+        if load_result.metadata['failed_tables']:
+            logger.warning(f"Failed tables: {len(load_result.metadata['failed_tables'])}")
+
+    def cleanup(self):
+        """Cleanup resources"""
+        if hasattr(self, 'datalake'):
+            self.datalake.close()
@@ -0,0 +1,98 @@
+"""Compare a recorded job run with its rolling baseline
+
+Every job appends its run to the run history (see src/utils/run_history.py).
+This reports the per-stage, per-phase and per-table metrics of one run next to
+the median of the previous successful runs of the same job and environment,
+and exits with 1 when a timing regressed significantly, so it can gate CI or a
+scheduler.
+
+    python src/jobs/compare_runs.py --job to_trusted            # latest to_trusted run
+    python src/jobs/compare_runs.py --run_id 42 --window 30 --all
+    python src/jobs/compare_runs.py --list --job to_raw
+"""
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.utils.run_history import (DEFAULT_BASELINE_RUNS, DEFAULT_MIN_BASELINE_RUNS, DEFAULT_MIN_CHANGE,
+                                   DEFAULT_MIN_SECONDS, DEFAULT_Z_THRESHOLD, open_run_history)
+
+
+def format_value(metric: str, value: float) -> str:
+    if metric.endswith('seconds'):
+        return f"{value:.2f}s"
+    if 'bytes' in metric:
+        return f"{value / 1e6:.1f}MB"
+    return f"{value:,.0f}"
+
+
+def list_runs(history, job_name, limit) -> int:
+    print(f"{'run':>5}  {'job':<14} {'env':<5} {'ingestion_date':<14} {'started_at':<19} {'seconds':>8}  status")
+    for run in history.runs(job_name, limit):
+        status = 'ok' if run['success'] else f"failed: {(run['error'] or '')[:40]}"
+        seconds = f"{run['duration_seconds']:.2f}" if run['duration_seconds'] is not None else '-'
+        print(f"{run['run_id']:>5}  {run['job_name']:<14} {run['env'] or '-':<5} "
+              f"{run['ingestion_date'] or '-':<14} {run['started_at'][:19]:<19} {seconds:>8}  {status}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a job run with its rolling baseline")
+    parser.add_argument("--history", type=str,
+                        help="Run history database (default: RUN_HISTORY_PATH or run_history/runs.sqlite)")
+    parser.add_argument("--env", default="dev", choices=["dev", "test", "prod"],
+                        help="Environment whose settings locate the history (default: dev)")
+    parser.add_argument("--job", type=str, help="Job name, e.g. to_trusted (default: latest run of any job)")
+    parser.add_argument("--run_id", type=int, help="Run to check (default: the job's latest run)")
+    parser.add_argument("--window", type=int, default=DEFAULT_BASELINE_RUNS,
+                        help=f"Previous successful runs in the baseline (default: {DEFAULT_BASELINE_RUNS})")
+    parser.add_argument("--min_runs", type=int, default=DEFAULT_MIN_BASELINE_RUNS,
+                        help=f"Baseline runs a metric needs to be checked (default: {DEFAULT_MIN_BASELINE_RUNS})")
+    parser.add_argument("--z_threshold", type=float, default=DEFAULT_Z_THRESHOLD,
+                        help=f"Robust z-score that counts as significant (default: {DEFAULT_Z_THRESHOLD})")
+    parser.add_argument("--min_change", type=float, default=DEFAULT_MIN_CHANGE,
+                        help=f"Smallest relative slowdown reported, e.g. 0.1 = 10%% (default: {DEFAULT_MIN_CHANGE})")
+    parser.add_argument("--min_seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                        help=f"Smallest absolute slowdown reported, in seconds (default: {DEFAULT_MIN_SECONDS})")
+    parser.add_argument("--all", action="store_true", help="Show every metric, not only regressions and shifts")
+    parser.add_argument("--list", action="store_true", help="List recent runs instead of comparing")
+    parser.add_argument("--limit", type=int, default=20, help="Runs shown by --list (default: 20)")
+    args = parser.parse_args()
+
+    import os
+    os.environ["ENV"] = args.env
+    history = open_run_history(args.history)
+    if args.list:
+        return list_runs(history, args.job, args.limit)
+
+    run, comparisons = history.compare(args.run_id, args.job, args.window, args.min_runs,
+                                       args.z_threshold, args.min_change, args.min_seconds)
+    if run is None:
+        print("No recorded runs found")
+        return 0
+    baseline_runs = len(history.baseline_runs(run, args.window))
+    print(f"Run {run['run_id']} of {run['job_name']} ({run['env']}, {'ok' if run['success'] else 'failed'}) "
+          f"vs. {baseline_runs} previous successful runs")
+    if not comparisons:
+        print(f"Not enough history: metrics need {args.min_runs} baseline runs")
+        return 0
+
+    regressions = [c for c in comparisons if c.regression]
+    shown = comparisons if args.all else [
+        c for c in comparisons if c.regression or abs(c.z_score) >= args.z_threshold
+    ]
+    print(f"{'metric':<44} {'run':>10} {'baseline':>10} {'change':>8} {'z':>7}")
+    for c in shown:
+        flag = "  REGRESSION" if c.regression else ""
+        print(f"{c.label:<44} {format_value(c.metric, c.value):>10} "
+              f"{format_value(c.metric, c.baseline_median):>10} {c.change:>+7.0%} {c.z_score:>7.1f}{flag}")
+    if not shown:
+        print("All metrics within the baseline's range")
+    print(f"{len(regressions)} regressions in {len(comparisons)} metrics")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
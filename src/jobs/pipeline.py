@@ -1,3 +1,4 @@
+import os
 import sys
 import subprocess
 from pathlib import Path
@@ -7,16 +8,17 @@ from loguru import logger
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.core.job_manager import BaseJobManager
+from src.utils.tracing import child_environment, span
 
 
 class PipelineManager(BaseJobManager):
-    """Pipeline orchestrator for running to_raw and to_trusted jobs sequentially"""
+    """Pipeline orchestrator for running to_raw, to_trusted and to_aggregate jobs sequentially"""
     
     def __init__(self):
         super().__init__("pipeline")
         
     def run(self) -> bool:
-        """Run the complete ETL pipeline: to_raw -> to_trusted"""
+        """Run the complete ETL pipeline: to_raw -> to_trusted -> to_aggregate"""
         
         # Get the base directory for job scripts
         jobs_dir = Path(__file__).parent
@@ -28,13 +30,20 @@ class PipelineManager(BaseJobManager):
             common_args.extend(["--ingestion_date", self.args.ingestion_date])
         if self.args.debug:
             common_args.append("--debug")
+        if self.args.run_history:
+            common_args.extend(["--run_history", self.args.run_history])
+        if self.args.no_run_history:
+            common_args.append("--no_run_history")
             
         # Stage 1: Run to_raw job
         self.logger.info("Starting Stage 1: Landing → Raw")
         to_raw_cmd = ["python", str(jobs_dir / "to_raw.py")] + common_args
         
         try:
-            result = subprocess.run(to_raw_cmd, check=True, capture_output=True, text=True)
+            # The stage's span is the parent of the job's spans in the subprocess
+            with span("stage.to_raw", stage=1):
+                result = subprocess.run(to_raw_cmd, check=True, capture_output=True, text=True,
+                                        env={**os.environ, **child_environment()})
             self.logger.success("tage 1 completed: Landing → Raw")
             if self.args.debug and result.stdout:
                 self.logger.debug(f"to_raw output: {result.stdout}")
@@ -51,7 +60,10 @@ class PipelineManager(BaseJobManager):
         to_trusted_cmd = ["python", str(jobs_dir / "to_trusted.py")] + common_args
         
         try:
-            result = subprocess.run(to_trusted_cmd, check=True, capture_output=True, text=True)
+            # The stage's span is the parent of the job's spans in the subprocess
+            with span("stage.to_trusted", stage=2):
+                result = subprocess.run(to_trusted_cmd, check=True, capture_output=True, text=True,
+                                        env={**os.environ, **child_environment()})
             self.logger.success("Stage 2 completed: Raw → Trusted")
             if self.args.debug and result.stdout:
                 self.logger.debug(f"to_trusted output: {result.stdout}")
@@ -63,6 +75,26 @@ class PipelineManager(BaseJobManager):
                 self.logger.error(f"stderr: {e.stderr}")
             return False
             
+        # Stage 3: Run to_aggregate job
+        self.logger.info("Starting Stage 3: Trusted → Aggregates")
+        to_aggregate_cmd = ["python", str(jobs_dir / "to_aggregate.py")] + common_args
+        
+        try:
+            # The stage's span is the parent of the job's spans in the subprocess
+            with span("stage.to_aggregate", stage=3):
+                result = subprocess.run(to_aggregate_cmd, check=True, capture_output=True, text=True,
+                                        env={**os.environ, **child_environment()})
+            self.logger.success("Stage 3 completed: Trusted → Aggregates")
+            if self.args.debug and result.stdout:
+                self.logger.debug(f"to_aggregate output: {result.stdout}")
+        except subprocess.CalledProcessError as e:
+            self.logger.error(f"Stage 3 failed: {e}")
+            if e.stdout:
+                self.logger.error(f"stdout: {e.stdout}")
+            if e.stderr:
+                self.logger.error(f"stderr: {e.stderr}")
+            return False
+            
         self.logger.success("Pipeline completed successfully!")
         return True
 
@@ -0,0 +1,38 @@
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.core.job_manager import JobManager
+from src.utils.schema_registry import get_all_aggregate_tables
+
+
+class AggregateJobManager(JobManager):
+    """Job manager with aggregate-specific arguments"""
+
+    def add_custom_args(self, parser: argparse.ArgumentParser):
+        parser.add_argument("--aggregate", type=str, choices=get_all_aggregate_tables(),
+                            help="Aggregate table to update (default: all)")
+
+
+def create_processor():
+    """Import and build the processor for this job"""
+    from src.core.trusted_aggregate_processor import TrustedAggregateProcessor
+    return TrustedAggregateProcessor("trusted_aggregate_processor")
+
+
+def main():
+    """Main entry point for trusted aggregate job"""
+    # Create job manager
+    job = AggregateJobManager("to_aggregate")
+
+    # Processor is built (and its dependencies imported) only when the job runs
+    job.set_processor_factory(create_processor)
+
+    # Execute job
+    return job.execute()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.core.job_manager import JobManager
+from src.core.defaults import DEFAULT_TARGET_FILE_SIZE_MB, DEFAULT_RETENTION_HOURS
+from src.utils.schema_registry import get_all_trusted_tables
+
+
+class CompactionJobManager(JobManager):
+    """Job manager with compaction-specific arguments"""
+
+    def add_custom_args(self, parser: argparse.ArgumentParser):
+        parser.add_argument("--table", type=str, choices=get_all_trusted_tables(),
+                            help="Trusted table to compact (default: all)")
+        parser.add_argument("--target_file_size_mb", type=float, default=DEFAULT_TARGET_FILE_SIZE_MB,
+                            help=f"Target parquet file size in MB (default: {DEFAULT_TARGET_FILE_SIZE_MB})")
+        parser.add_argument("--retention_hours", type=float, default=DEFAULT_RETENTION_HOURS,
+                            help="Delete files dropped from a table's manifest more than this many hours "
+                                 f"ago (default: {DEFAULT_RETENTION_HOURS})")
+
+
+def create_processor():
+    """Import and build the processor for this job"""
+    from src.core.trusted_compaction_processor import TrustedCompactionProcessor
+    return TrustedCompactionProcessor("trusted_compaction_processor")
+
+
+def main():
+    """Main entry point for trusted compaction job"""
+    # Create job manager
+    job = CompactionJobManager("to_compact")
+
+    # Processor is built (and its dependencies imported) only when the job runs
+    job.set_processor_factory(create_processor)
+
+    # Execute job
+    return job.execute()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,37 @@
 import sys
+import argparse
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.core.job_manager import JobManager
-from src.core.landing_to_raw_processor import LandingToRawProcessor
+from src.core.defaults import RAW_COMPRESSIONS, DEFAULT_RAW_COMPRESSION
+
+
+class RawJobManager(JobManager):
+    """Job manager with landing -> raw specific arguments"""
+
+    def add_custom_args(self, parser: argparse.ArgumentParser):
+        parser.add_argument("--force_copy", action="store_true",
+                            help="Copy every file even if the raw object is unchanged")
+        parser.add_argument("--raw_compression", choices=RAW_COMPRESSIONS, default=DEFAULT_RAW_COMPRESSION,
+                            help="Recompress raw files while copying them (zstd needs the zstandard "
+                                 f"package); the trusted stage reads any of them (default: {DEFAULT_RAW_COMPRESSION})")
+
+
+def create_processor():
+    """Import and build the processor for this job"""
+    from src.core.landing_to_raw_processor import LandingToRawProcessor
+    return LandingToRawProcessor("landing_to_raw_processor")
 
 
 def main():
     """Main entry point for raw data processing job"""
     # Create job manager
-    job = JobManager("to_raw")
+    job = RawJobManager("to_raw")
     
-    # Create and set processor
-    processor = LandingToRawProcessor("landing_to_raw_processor")
-    job.set_processor(processor)
+    # Processor is built (and its dependencies imported) only when the job runs
+    job.set_processor_factory(create_processor)
     
     # Execute job
     return job.execute()
@@ -1,20 +1,84 @@
 import sys
+import argparse
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from src.core.job_manager import JobManager
-from src.core.raw_to_trusted_processor import RawToTrustedProcessor
+from src.core.defaults import (
+    ENGINES,
+    DEFAULT_ENGINE,
+    DEFAULT_PIPELINE_WORKERS,
+    DEFAULT_PIPELINE_QUEUE_SIZE,
+    DIMENSION_MODES,
+    DEFAULT_DIMENSION_MODE,
+    DEFAULT_PARSE_WORKERS,
+    DEFAULT_STREAM_POLL_SECONDS,
+    DEFAULT_STREAM_BATCH_FILES,
+)
+
+
+class TrustedJobManager(JobManager):
+    """Job manager with raw -> trusted specific arguments"""
+
+    def add_custom_args(self, parser: argparse.ArgumentParser):
+        parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                            help="pandas: parse in Python; duckdb: one native DuckDB COPY per table "
+                                 f"(default: {DEFAULT_ENGINE})")
+        parser.add_argument("--workers", type=int, default=DEFAULT_PIPELINE_WORKERS,
+                            help=f"Tables processed concurrently (default: {DEFAULT_PIPELINE_WORKERS})")
+        parser.add_argument("--queue_size", type=int, default=DEFAULT_PIPELINE_QUEUE_SIZE,
+                            help="Extracted tables allowed to wait for loading "
+                                 f"(default: {DEFAULT_PIPELINE_QUEUE_SIZE})")
+        parser.add_argument("--max_memory", type=str,
+                            help="Memory budget, e.g. 2GB; processes in chunks and spills to disk "
+                                 "instead of exceeding it (default: unbounded)")
+        parser.add_argument("--enrich", action="store_true",
+                            help="Also write trusted_events_enriched (events with video genre/duration "
+                                 "and user tier/age group attached)")
+        parser.add_argument("--dimension_mode", choices=DIMENSION_MODES, default=DEFAULT_DIMENSION_MODE,
+                            help="snapshot: write users/videos/devices in full every day; scd2: only append "
+                                 "their new/changed/deleted rows to <table>_history, read back as the "
+                                 f"current dimension (default: {DEFAULT_DIMENSION_MODE})")
+        parser.add_argument("--parse_workers", type=int, default=DEFAULT_PARSE_WORKERS,
+                            help="Processes decoding the events JSONL in parallel byte ranges; 0 = one "
+                                 f"per CPU, 1 = in-process (default: {DEFAULT_PARSE_WORKERS})")
+        parser.add_argument("--stream", action="store_true",
+                            help="Watch landing and convert new event files to trusted_events in "
+                                 "micro-batches instead of running one daily batch")
+        parser.add_argument("--poll_interval", type=float, default=DEFAULT_STREAM_POLL_SECONDS,
+                            help=f"Seconds between landing polls in --stream mode (default: {DEFAULT_STREAM_POLL_SECONDS})")
+        parser.add_argument("--max_batch_files", type=int, default=DEFAULT_STREAM_BATCH_FILES,
+                            help=f"Landing files per micro-batch (default: {DEFAULT_STREAM_BATCH_FILES})")
+        parser.add_argument("--max_batches", type=int,
+                            help="Stop after this many micro-batches (default: run until interrupted)")
+        parser.add_argument("--idle_timeout", type=float,
+                            help="Stop after this many seconds without new landing files "
+                                 "(default: run until interrupted)")
+        parser.add_argument("--local_root", type=str,
+                            help="Use this local directory as the object store instead of MinIO")
+
+
+def create_processor(args=None):
+    """Import and build the processor for this job"""
+    if args is not None and getattr(args, 'stream', False):
+        from src.core.stream_to_trusted_processor import StreamToTrustedProcessor
+        minio_client = None
+        if args.local_root:
+            from src.connect.local_store import LocalObjectStore
+            minio_client = LocalObjectStore(args.local_root)
+        return StreamToTrustedProcessor("stream_to_trusted_processor", minio_client=minio_client)
+    from src.core.raw_to_trusted_processor import RawToTrustedProcessor
+    return RawToTrustedProcessor("raw_to_trusted_processor")
 
 
 def main():
     """Main entry point for trusted data processing job"""
     # Create job manager
-    job = JobManager("to_trusted")
+    job = TrustedJobManager("to_trusted")
     
-    # Create and set processor
-    processor = RawToTrustedProcessor("raw_to_trusted_processor")
-    job.set_processor(processor)
+    # Processor is built (and its dependencies imported) only when the job runs
+    job.set_processor_factory(lambda: create_processor(job.args))
     
     # Execute job
     return job.execute()
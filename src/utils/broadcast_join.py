@@ -0,0 +1,43 @@
+from typing import Dict, List
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+class BroadcastJoin:
+    """Attach columns of a small dimension table to batches of a large fact table
+
+    The dimension is held in memory and reused for every fact batch (a broadcast
+    join). Fact keys are dictionary encoded, so only each distinct key is probed
+    against the dimension; rows then pick up dimension values with integer takes.
+    Keys missing from the dimension give nulls, as in a left join.
+    """
+
+    def __init__(self, dimension: pa.Table, key: str, columns: List[str]):
+        """Initialize the join
+
+        Args:
+            dimension: Dimension rows; the first row wins for duplicate keys
+            key: Join key column, present in both the dimension and the fact batches
+            columns: Dimension columns to attach
+        """
+        self.key = key
+        self.keys = decode_dictionary(dimension.column(key).combine_chunks())
+        self.columns = {col: dimension.column(col).combine_chunks() for col in columns}
+
+    def apply(self, batch: pa.RecordBatch) -> Dict[str, pa.Array]:
+        """Dimension columns aligned with the rows of one fact batch"""
+        keys = batch.column(self.key)
+        if not pa.types.is_dictionary(keys.type):
+            keys = pc.dictionary_encode(keys)
+
+        # One hash probe per distinct key, then a gather per row
+        key_positions = pc.index_in(keys.dictionary, value_set=self.keys.cast(keys.dictionary.type))
+        row_positions = pc.take(key_positions, keys.indices)
+        return {col: pc.take(values, row_positions) for col, values in self.columns.items()}
+
+
+def decode_dictionary(array: pa.Array) -> pa.Array:
+    """Plain array of a dictionary-encoded array's values (other arrays are returned as is)"""
+    if pa.types.is_dictionary(array.type):
+        return array.cast(array.type.value_type)
+    return array
@@ -0,0 +1,105 @@
+"""Streaming compression of raw objects
+
+Raw CSV/JSONL objects may be stored gzip- or zstd-compressed, marked by a
+.gz/.zst suffix after their usual extension (events_2025-09-09.jsonl.zst).
+Compression and decompression both work on streams in fixed-size chunks, so
+memory use does not grow with the object size. zstd needs the optional
+zstandard package; gzip uses the standard library.
+"""
+import gzip
+import io
+import zlib
+from typing import BinaryIO, List, Optional
+
+RAW_CODEC_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+STREAM_CHUNK_BYTES = 1024 * 1024
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd raw compression needs the zstandard package (pip install zstandard)") from e
+    return zstandard
+
+
+def codec_for_key(object_name: str) -> Optional[str]:
+    """Codec of a raw object from its suffix, None when it is stored uncompressed"""
+    for codec, suffix in RAW_CODEC_SUFFIXES.items():
+        if object_name.endswith(suffix):
+            return codec
+    return None
+
+
+def compressed_key(object_name: str, codec: Optional[str]) -> str:
+    """Object name of object_name stored with codec (None or 'none' for uncompressed)"""
+    return object_name + RAW_CODEC_SUFFIXES.get(codec, '')
+
+
+def uncompressed_key(object_name: str) -> str:
+    """object_name without its codec suffix"""
+    codec = codec_for_key(object_name)
+    return object_name[:-len(RAW_CODEC_SUFFIXES[codec])] if codec else object_name
+
+
+def raw_key_variants(object_name: str) -> List[str]:
+    """Every name object_name can be stored under, uncompressed first"""
+    return [object_name] + [object_name + suffix for suffix in RAW_CODEC_SUFFIXES.values()]
+
+
+def _compressor(codec: str, level: Optional[int]):
+    """Incremental compressor with compress(data) and flush()"""
+    if codec == 'gzip':
+        # wbits=31 writes a gzip header and trailer, readable by gzip/DuckDB
+        return zlib.compressobj(level if level is not None else GZIP_LEVEL, zlib.DEFLATED, 31)
+    if codec == 'zstd':
+        return _zstandard().ZstdCompressor(level=level if level is not None else ZSTD_LEVEL).compressobj()
+    raise ValueError(f"Unknown raw codec: {codec}")
+
+
+class CompressingReader(io.RawIOBase):
+    """Readable stream of the compressed bytes of another stream
+
+    Pulls STREAM_CHUNK_BYTES at a time from source, so it can be handed to an
+    uploader as the body of a streaming (multipart) upload.
+    """
+
+    def __init__(self, source: BinaryIO, codec: str, level: Optional[int] = None):
+        self.source = source
+        self.compressor = _compressor(codec, level)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._buffer = b''
+        self._done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._buffer and not self._done:
+            chunk = self.source.read(STREAM_CHUNK_BYTES)
+            if chunk:
+                self.bytes_in += len(chunk)
+                self._buffer = self.compressor.compress(chunk)
+            else:
+                self._buffer = self.compressor.flush()
+                self._done = True
+
+        size = min(len(b), len(self._buffer))
+        b[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        self.bytes_out += size
+        return size
+
+
+def open_decompressed(stream: BinaryIO, codec: Optional[str]) -> BinaryIO:
+    """Readable stream of the decompressed bytes of stream (stream itself when codec is None)"""
+    if codec is None:
+        return stream
+    if codec == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if codec == 'zstd':
+        return _zstandard().ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+    raise ValueError(f"Unknown raw codec: {codec}")
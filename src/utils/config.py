@@ -36,7 +36,14 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: Optional[str] = None
     MINIO_SECURE: Optional[bool] = None
     MINIO_BUCKET: Optional[str] = None
-    
+
+    # MinIO request policy (seconds); unset values use src/connect/request_policy.py defaults
+    MINIO_CONNECT_TIMEOUT: Optional[float] = None
+    MINIO_READ_TIMEOUT: Optional[float] = None
+    MINIO_WRITE_TIMEOUT: Optional[float] = None
+    MINIO_MAX_ATTEMPTS: Optional[int] = None
+    MINIO_HEDGE_PERCENTILE: Optional[float] = None
+
     # Storage Layers
     LANDING_PREFIX: Optional[str] = None
     RAW_PREFIX: Optional[str] = None
@@ -49,12 +56,48 @@ class Settings(BaseSettings):
     TRINO_CATALOG: Optional[str] = None
     TRINO_SCHEMA: Optional[str] = None
     
+    # Resource limits
+    MAX_MEMORY: Optional[str] = None
+    SPILL_DIRECTORY: Optional[str] = None
+    
+    # DuckDB
+    DUCKDB_EXTENSION_DIRECTORY: Optional[str] = None
+    # Profile queries and log those slower than this many ms (unset: profiling off)
+    DUCKDB_SLOW_QUERY_MS: Optional[float] = None
+    DUCKDB_SLOW_QUERY_LOG: Optional[str] = None
+    
     # Logging
     LOG_LEVEL: Optional[str] = None
     
+    # Run history database (default: run_history/runs.sqlite)
+    RUN_HISTORY_PATH: Optional[str] = None
+    
     class Config:
         case_sensitive = True
 
 
-# Create default settings instance (dev)
-settings = get_settings()
\ No newline at end of file
+class LazySettings:
+    """Settings proxy that is built on first attribute access
+    
+    Importing this module stays cheap, and jobs that set ENV from --env after
+    their imports still get that environment's settings. The instance is rebuilt
+    if ENV changes afterwards.
+    """
+    
+    def __init__(self):
+        self._settings: Optional[Settings] = None
+        self._env: Optional[str] = None
+    
+    def _load(self) -> Settings:
+        env_name = os.getenv("ENV", "dev").lower()
+        if self._settings is None or env_name != self._env:
+            self._settings = get_settings()
+            self._env = env_name
+        return self._settings
+    
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+
+# Default settings instance, resolved from ENV (dev if unset) on first use
+settings = LazySettings()
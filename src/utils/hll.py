@@ -0,0 +1,169 @@
+"""HyperLogLog sketches for mergeable approximate distinct counts
+
+A sketch keeps 2**precision one-byte registers. Merging two sketches takes the
+register-wise maximum, so per-partition sketches combine into the sketch of the
+union of their values without revisiting any rows.
+
+Error bound: the relative standard error of an estimate is 1.04 / sqrt(2**precision),
+0.81% at the default precision of 14 (16 KiB per sketch). About 95% of estimates fall
+within two standard errors (+-1.6%); small cardinalities are close to exact.
+
+Values are hashed as the low 64 bits of the MD5 of their string form, which DuckDB
+computes as md5_number_lower(). Sketches are built in SQL (register_codes_sql): each
+group keeps only its distinct (register, rank) codes, so memory is bounded by the
+sketch size rather than by the number of distinct values.
+"""
+import hashlib
+import math
+from typing import Iterable, Optional, Union
+
+import numpy as np
+
+DEFAULT_PRECISION = 14
+MIN_PRECISION = 4
+MAX_PRECISION = 18
+HASH_BITS = 64
+# Leading byte of serialized sketches; bumped when the hash function changes
+FORMAT_VERSION = 2
+# A register code is register_index * RANK_CODES + rank (rank <= 61 fits in 6 bits)
+RANK_CODES = 64
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch over 64-bit hashes of string values"""
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[np.ndarray] = None):
+        if not MIN_PRECISION <= precision <= MAX_PRECISION:
+            raise ValueError(f"precision must be between {MIN_PRECISION} and {MAX_PRECISION}")
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    @classmethod
+    def from_values(cls, values: Iterable, precision: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        """Sketch of the non-null values"""
+        sketch = cls(precision)
+        sketch.add_values(values)
+        return sketch
+
+    @classmethod
+    def from_register_codes(cls, codes: Iterable[int], precision: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        """Sketch of the register codes selected by register_codes_sql"""
+        sketch = cls(precision)
+        codes = np.fromiter(codes, dtype=np.int64)
+        if len(codes):
+            np.maximum.at(sketch.registers, codes // RANK_CODES, (codes % RANK_CODES).astype(np.uint8))
+        return sketch
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        """Sketch serialized with to_bytes"""
+        if data[0] != FORMAT_VERSION:
+            raise ValueError(f"HyperLogLog sketch format {data[0]} is not {FORMAT_VERSION}, rebuild it")
+        precision = data[1]
+        registers = np.frombuffer(data, dtype=np.uint8, offset=2).copy()
+        if len(registers) != 1 << precision:
+            raise ValueError("Corrupt HyperLogLog sketch")
+        return cls(precision, registers)
+
+    @classmethod
+    def merge_bytes(cls, sketches: Iterable[Union[bytes, None]]) -> "HyperLogLog":
+        """Union of serialized sketches (None entries are skipped)"""
+        merged = None
+        for data in sketches:
+            if data is None:
+                continue
+            sketch = cls.from_bytes(data)
+            merged = sketch if merged is None else merged.merge(sketch)
+        return merged if merged is not None else cls()
+
+    def to_bytes(self) -> bytes:
+        """Format and precision bytes followed by the registers"""
+        return bytes([FORMAT_VERSION, self.precision]) + self.registers.tobytes()
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of estimate()"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add_values(self, values: Iterable) -> None:
+        """Add values, compared by their string form"""
+        rank_bits = HASH_BITS - self.precision
+        mask = (1 << rank_bits) - 1
+        for value in values:
+            if value is None or value != value:
+                continue
+            hashed = _hash(str(value))
+            # rank = leading zeros in the remaining bits + 1
+            rank = rank_bits - (hashed & mask).bit_length() + 1
+            index = hashed >> rank_bits
+            if rank > self.registers[index]:
+                self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge sketches of precision {self.precision} and {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> float:
+        """Estimated number of distinct values
+
+        Uses Ertl's improved raw estimator, which stays unbiased from empty
+        sketches to very large cardinalities without empirical correction tables.
+        """
+        m = len(self.registers)
+        q = HASH_BITS - self.precision
+        counts = np.bincount(self.registers, minlength=q + 2)
+        if counts[0] == m:
+            return 0.0
+
+        z = m * _tau(1 - counts[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + counts[k])
+        z += m * _sigma(counts[0] / m)
+        return m * m / (2 * math.log(2) * z)
+
+
+def register_codes_sql(column: str, precision: int = DEFAULT_PRECISION) -> str:
+    """DuckDB aggregate collecting the distinct register codes of a column
+
+    Matches add_values: the rank is taken from the binary string of the remaining
+    bits, so it stays exact for every precision.
+    """
+    rank_bits = HASH_BITS - precision
+    hashed = f"md5_number_lower(CAST(\"{column}\" AS VARCHAR))"
+    remainder = f"({hashed} & {(1 << rank_bits) - 1}::UBIGINT)"
+    rank = f"CASE WHEN {remainder} = 0 THEN {rank_bits + 1} ELSE {rank_bits + 1} - length(bin({remainder})) END"
+    return f"list(DISTINCT ({hashed} >> {rank_bits}) * {RANK_CODES} + {rank})"
+
+
+def _hash(value: str) -> int:
+    """Low 64 bits of the MD5 digest, as DuckDB's md5_number_lower()"""
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[8:], 'little')
+
+
+def _sigma(x: float) -> float:
+    if x == 1:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        z_old = z
+        z += x * y
+        y += y
+        if z == z_old:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0 or x == 1:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        z_old = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == z_old:
+            return z / 3
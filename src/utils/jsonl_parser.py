@@ -0,0 +1,288 @@
+"""Parallel JSONL decoding across a process pool
+
+The decompressed object is loaded once into a shared memory block and split
+into newline-aligned byte ranges. Worker processes attach to the block, decode
+their range with orjson (the stdlib json module when it is not installed) and
+write the rows back as an Arrow IPC stream in a shared memory block of their
+own, so neither the input nor the decoded columns are pickled between
+processes. Ranges come back in file order, or as soon as each is done with
+ordered=False.
+
+Columns named in dictionary_columns come back dictionary encoded, so
+to_pandas() gives categoricals rather than one Python string per row.
+
+Inputs below min_parallel_bytes are decoded in-process the same way; starting
+workers costs more than it saves there.
+"""
+import json
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed, wait
+from itertools import chain
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pyarrow as pa
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+DEFAULT_RANGE_BYTES = 16 * 1024 * 1024
+MIN_PARALLEL_BYTES = 32 * 1024 * 1024
+# Window scanned for the end of a line when placing a range boundary
+BOUNDARY_SCAN_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def records_to_table(records: List[Dict[str, Any]], dictionary_columns: Iterable[str] = ()) -> pa.Table:
+    """Columnar table of decoded JSON objects; columns in order of first appearance
+
+    Keys missing from a record give nulls. A column whose values Arrow cannot
+    hold in one type (e.g. numbers mixed with text) is kept as text. Text
+    columns named in dictionary_columns are dictionary encoded.
+    """
+    dictionary_columns = set(dictionary_columns)
+    columns = {}
+    for name in dict.fromkeys(chain.from_iterable(records)):
+        values = [record.get(name) for record in records]
+        try:
+            column = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            column = pa.array([None if v is None else str(v) for v in values], pa.string())
+        if name in dictionary_columns and pa.types.is_string(column.type):
+            column = column.dictionary_encode()
+        columns[name] = column
+    return pa.table(columns)
+
+
+def unify_tables(tables: List[pa.Table], dictionary_columns: Iterable[str] = ()) -> pa.Table:
+    """Concatenate tables decoded from separate ranges of the same input
+
+    Column types are promoted where Arrow can (e.g. int64 and double). A column
+    whose types cannot be unified (e.g. numbers in one range, text in another)
+    is kept as text in every range, as records_to_table does for one range.
+    """
+    dictionary_columns = set(dictionary_columns)
+    fields = {}
+    for table in tables:
+        for field in table.schema:
+            fields.setdefault(field.name, []).append(field)
+    text_columns = set()
+    for name, column_fields in fields.items():
+        try:
+            pa.unify_schemas([pa.schema([field]) for field in column_fields], promote_options='permissive')
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            text_columns.add(name)
+    if text_columns:
+        tables = [_columns_as_text(table, text_columns & set(table.column_names), dictionary_columns)
+                  for table in tables]
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+def _columns_as_text(table: pa.Table, names: Iterable[str], dictionary_columns: Iterable[str]) -> pa.Table:
+    for name in names:
+        # str() of the decoded values, so the text matches a single-range decode
+        column = pa.array([None if v is None else str(v) for v in table.column(name).to_pylist()], pa.string())
+        if name in dictionary_columns:
+            column = column.dictionary_encode()
+        table = table.set_column(table.schema.get_field_index(name), name, column)
+    return table
+
+
+def decode_lines(data: bytes, dictionary_columns: Iterable[str] = ()) -> pa.Table:
+    """Decode the JSON lines of data (blank lines are skipped) into a table"""
+    return records_to_table([loads(line) for line in data.splitlines() if line.strip()], dictionary_columns)
+
+
+def line_aligned_ranges(buffer: memoryview, range_bytes: int) -> List[Tuple[int, int]]:
+    """Split buffer into (start, end) ranges of about range_bytes that end after a newline"""
+    size = len(buffer)
+    ranges = []
+    start = 0
+    while start < size:
+        end = min(start + range_bytes, size)
+        while end < size:
+            window = bytes(buffer[end - 1:end - 1 + BOUNDARY_SCAN_BYTES])
+            newline = window.find(b'\n')
+            if newline >= 0:
+                end += newline
+                break
+            end += len(window) - 1
+        end = min(end, size)
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def _decode_range(input_name: str, start: int, end: int,
+                  dictionary_columns: Tuple[str, ...] = ()) -> Tuple[Optional[str], int, int]:
+    """Worker: decode one range of the shared input into a shared Arrow IPC block
+
+    Returns (block name, IPC size, rows); the caller reads and unlinks the block.
+    """
+    source = SharedMemory(name=input_name)
+    try:
+        table = decode_lines(bytes(source.buf[start:end]), dictionary_columns)
+    finally:
+        source.close()
+    if table.num_rows == 0:
+        return None, 0, 0
+
+    sizer = pa.MockOutputStream()
+    _write_ipc(sizer, table)
+    output = SharedMemory(create=True, size=sizer.size())
+    try:
+        _write_ipc(pa.FixedSizeBufferWriter(pa.py_buffer(output.buf)), table)
+    except BaseException:
+        output.close()
+        output.unlink()
+        raise
+    output.close()
+    return output.name, sizer.size(), table.num_rows
+
+
+def _write_ipc(sink, table: pa.Table) -> None:
+    # Returns with no Arrow buffer left pointing into the sink's memory
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+
+
+def _take_block(name: Optional[str], size: int) -> Optional[pa.Table]:
+    """Table written by a worker; the block is copied out and unlinked"""
+    if name is None:
+        return None
+    block = SharedMemory(name=name)
+    try:
+        data = bytes(block.buf[:size])
+    finally:
+        block.close()
+        block.unlink()
+    return pa.ipc.open_stream(pa.BufferReader(data)).read_all()
+
+
+def _discard_block(future: Future) -> None:
+    """Unlink the output block of a finished task whose table will not be read"""
+    if future.done() and not future.cancelled() and future.exception() is None:
+        name, _, _ = future.result()
+        if name is not None:
+            block = SharedMemory(name=name)
+            block.close()
+            block.unlink()
+
+
+def _read_into_shared_memory(stream: BinaryIO, size: Optional[int]) -> Tuple[Optional[SharedMemory], int]:
+    """Copy a stream into a new shared memory block; returns (block, bytes), (None, 0) when empty
+
+    With a known size the stream is read straight into the block; otherwise it is
+    read whole first. The block may be larger than the bytes copied (page rounding).
+    """
+    if size is None:
+        data = stream.read()
+        if not data:
+            return None, 0
+        block = SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        return block, len(data)
+    if size == 0:
+        return None, 0
+    block = SharedMemory(create=True, size=size)
+    try:
+        offset = 0
+        while offset < size:
+            read = stream.readinto(block.buf[offset:min(offset + READ_CHUNK_BYTES, size)])
+            if not read:
+                raise EOFError(f"Stream ended after {offset} of {size} bytes")
+            offset += read
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    return block, size
+
+
+class ParallelJsonlParser:
+    """Decode JSONL into Arrow tables with a pool of worker processes"""
+
+    def __init__(self, workers: Optional[int] = None, ordered: bool = True,
+                 range_bytes: int = DEFAULT_RANGE_BYTES, min_parallel_bytes: int = MIN_PARALLEL_BYTES,
+                 dictionary_columns: Iterable[str] = ()):
+        """Initialize the parser
+
+        Args:
+            workers: Worker processes (default: one per CPU; 1 decodes in-process)
+            ordered: Yield ranges in file order; False yields each as soon as it is decoded
+            range_bytes: Approximate bytes per range (task)
+            min_parallel_bytes: Smaller inputs are decoded in-process
+            dictionary_columns: Text columns to dictionary encode
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.ordered = ordered
+        self.range_bytes = range_bytes
+        self.min_parallel_bytes = min_parallel_bytes
+        self.dictionary_columns = tuple(dictionary_columns)
+
+    def iter_tables(self, stream: BinaryIO, size: Optional[int] = None) -> Iterator[pa.Table]:
+        """Tables of consecutive line ranges of a binary stream of JSON lines
+
+        Args:
+            stream: Readable binary stream, e.g. a decompressed raw object
+            size: Bytes in the stream when known, to load it without an extra copy
+        """
+        if self.workers <= 1 or (size is not None and size < self.min_parallel_bytes):
+            table = decode_lines(stream.read(), self.dictionary_columns)
+            if table.num_rows:
+                yield table
+            return
+
+        block, size = _read_into_shared_memory(stream, size)
+        if block is None:
+            return
+        try:
+            if size < self.min_parallel_bytes:
+                table = decode_lines(bytes(block.buf[:size]), self.dictionary_columns)
+                if table.num_rows:
+                    yield table
+                return
+            data = block.buf[:size]
+            try:
+                ranges = line_aligned_ranges(data, min(self.range_bytes, -(-size // self.workers)))
+            finally:
+                data.release()
+            yield from self._decode_ranges(block.name, ranges)
+        finally:
+            block.close()
+            block.unlink()
+
+    def _decode_ranges(self, input_name: str, ranges: List[Tuple[int, int]]) -> Iterator[pa.Table]:
+        # Spawned workers: forking a process that runs threads (the table pipeline) is unsafe
+        with ProcessPoolExecutor(min(self.workers, len(ranges)), mp_context=get_context('spawn')) as pool:
+            futures = [pool.submit(_decode_range, input_name, start, end, self.dictionary_columns)
+                       for start, end in ranges]
+            pending = set(futures)
+            try:
+                for future in (futures if self.ordered else as_completed(futures)):
+                    name, size, _ = future.result()
+                    pending.discard(future)
+                    table = _take_block(name, size)
+                    if table is not None:
+                        yield table
+            finally:
+                # Stopped early or failed: drop the output of tasks that were not read
+                for future in pending:
+                    future.cancel()
+                wait(pending)
+                for future in pending:
+                    _discard_block(future)
+
+    def read_table(self, stream: BinaryIO, size: Optional[int] = None) -> pa.Table:
+        """Whole stream as one table; ranges whose columns differ are unified"""
+        tables = list(self.iter_tables(stream, size))
+        if not tables:
+            return pa.table({})
+        if len(tables) == 1:
+            return tables[0]
+        return unify_tables(tables, self.dictionary_columns)
@@ -0,0 +1,114 @@
+"""Versioned manifests of committed trusted files
+
+Each trusted table has a log of manifest versions at
+trusted/_manifest/<location>/v<version>.json. A version lists every file of the
+table's current snapshot with its ingestion_date partition, row count, size and
+min/max of the index columns. Writers put new files under the table prefix,
+where they stay invisible to manifest readers, then publish them by creating the
+next version; a version is only ever created once, so concurrent writers detect
+each other and retry on top of the newer version. Files dropped from the snapshot
+are kept, listed under 'removed', until a vacuum deletes them after a retention
+period, so a reader planning from an older version can still finish its scan.
+"""
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+MANIFEST_PREFIX = '_manifest'
+LATEST_MANIFEST = '_latest.json'
+
+
+def manifest_version_name(version: int) -> str:
+    """File name of a manifest version, sortable by version"""
+    return f"v{version:010d}.json"
+
+
+class TableManifest:
+    """One snapshot of a trusted table: the files a reader should scan"""
+
+    def __init__(self, table_name: str, version: int = 0,
+                 files: Optional[Dict[str, Dict[str, Any]]] = None,
+                 removed: Optional[Dict[str, Dict[str, Any]]] = None,
+                 commit: Optional[Dict[str, Any]] = None):
+        """Initialize the manifest
+
+        Args:
+            table_name: Trusted table the files belong to
+            version: Manifest version, 0 for a table without committed versions
+            files: Object name -> {'ingestion_date', 'rows', 'bytes', 'min', 'max', 'version'}
+            removed: Object name -> {'version', 'removed_at'} of files awaiting vacuum
+            commit: Operation, parent version, time and token of the commit that made this version
+        """
+        self.table_name = table_name
+        self.version = version
+        self.files = files or {}
+        self.removed = removed or {}
+        self.commit = commit or {}
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "TableManifest":
+        """Manifest serialized with to_json"""
+        document = json.loads(data)
+        return cls(document['table'], document['version'], document['files'],
+                   document.get('removed'), document.get('commit'))
+
+    def to_json(self) -> bytes:
+        """JSON document of the manifest"""
+        return json.dumps({
+            'table': self.table_name,
+            'version': self.version,
+            'commit': self.commit,
+            'files': self.files,
+            'removed': self.removed
+        }, sort_keys=True).encode('utf-8')
+
+    def next_version(self, operation: str) -> "TableManifest":
+        """Copy of this manifest as the next version, to apply a change to"""
+        document = json.loads(self.to_json())
+        return TableManifest(self.table_name, self.version + 1, document['files'], document['removed'], {
+            'operation': operation,
+            'parent_version': self.version,
+            'committed_at': datetime.now(timezone.utc).isoformat(),
+            # Tells the writer whether a version it could not confirm is its own
+            'token': uuid.uuid4().hex
+        })
+
+    def add_files(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Add or replace files (object name -> entry without 'version')"""
+        for object_name, entry in entries.items():
+            self.files[object_name] = {**entry, 'version': self.version}
+            self.removed.pop(object_name, None)
+
+    def remove_files(self, object_names: List[str]) -> None:
+        """Drop files from the snapshot; they are deleted by a later vacuum"""
+        removed_at = datetime.now(timezone.utc).isoformat()
+        for object_name in object_names:
+            if self.files.pop(object_name, None) is not None:
+                self.removed[object_name] = {'version': self.version, 'removed_at': removed_at}
+
+    def replace_partition(self, ingestion_date: str, entries: Dict[str, Dict[str, Any]]) -> None:
+        """Make entries the only files of one ingestion_date partition"""
+        self.remove_files([name for name in self.partition_files(ingestion_date) if name not in entries])
+        self.add_files(entries)
+
+    def partition_files(self, ingestion_date: str) -> List[str]:
+        """Object names of one ingestion_date partition"""
+        return sorted(name for name, entry in self.files.items() if entry['ingestion_date'] == ingestion_date)
+
+    def files_between(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[str]:
+        """Object names of the partitions within [start_date, end_date] (open ends allowed)"""
+        return sorted(
+            name for name, entry in self.files.items()
+            if (not start_date or entry['ingestion_date'] >= start_date)
+            and (not end_date or entry['ingestion_date'] <= end_date)
+        )
+
+    def expired_files(self, cutoff: datetime) -> List[str]:
+        """Removed files dropped from the snapshot before cutoff"""
+        return sorted(name for name, entry in self.removed.items()
+                      if datetime.fromisoformat(entry['removed_at']) < cutoff)
+
+    @property
+    def rows(self) -> int:
+        return sum(entry['rows'] for entry in self.files.values())
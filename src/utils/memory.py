@@ -0,0 +1,37 @@
+import re
+import sys
+import resource
+from typing import Optional
+
+_UNITS = {
+    "": 1,
+    "B": 1,
+    "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4,
+    "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3, "TIB": 1024 ** 4,
+}
+
+
+def parse_memory_size(value: str) -> int:
+    """Parse a memory size such as '512MB', '2GB' or '1.5GiB' into bytes"""
+    match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*([A-Za-z]*)\s*", str(value))
+    if not match or match.group(2).upper() not in _UNITS:
+        raise ValueError(f"Invalid memory size: {value}")
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def format_bytes(num_bytes: Optional[float]) -> str:
+    """Format a byte count for logs, e.g. 1.5GB"""
+    if num_bytes is None:
+        return "n/a"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(num_bytes) < 1000:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1000
+    return f"{num_bytes:.1f}TB"
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,122 @@
+"""Slow-query capture from DuckDB's profiler
+
+With profiling on, DuckDB keeps the profile of the last statement of a
+connection: overall latency, CPU time, rows and bytes read, and the operator
+tree with per-operator timing and cardinality (what EXPLAIN ANALYZE prints).
+SlowQueryLog keeps the summarized profiles of statements over a latency
+threshold in memory and appends them, with full SQL, parameters and the
+rendered plan, as JSON lines to a log file.
+
+A SELECT's totals are only final once its result has been fetched, so a slow
+statement is captured right away but completed when the connection runs its
+next statement or the log is read.
+
+Needs DuckDB 1.2 or later (profiling_coverage, get_profiling_information with
+a format, and the metric names read below); pyproject pins it.
+"""
+import json
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Union
+
+DEFAULT_SLOW_QUERY_LOG = 'run_history/slow_queries.jsonl'
+DEFAULT_KEEP_PROFILES = 50
+# Operators listed per profile, most expensive first
+TOP_OPERATORS = 10
+
+
+def _operators(node: Dict[str, Any], depth: int = 0) -> List[Dict[str, Any]]:
+    """Operators of a DuckDB JSON profile tree, depth first"""
+    operators = []
+    for child in node.get('children', []):
+        operators.append({
+            'operator': child.get('operator_name') or child.get('operator_type'),
+            'depth': depth,
+            'seconds': child.get('operator_timing', 0.0),
+            'rows': child.get('operator_cardinality', 0),
+            'rows_scanned': child.get('operator_rows_scanned', 0),
+            'extra_info': child.get('extra_info', {})
+        })
+        operators.extend(_operators(child, depth + 1))
+    return operators
+
+
+def summarize_profile(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """Totals and the most expensive operators of a DuckDB JSON profile"""
+    operators = _operators(profile)
+    return {
+        'latency_seconds': profile.get('latency', 0.0),
+        'cpu_seconds': profile.get('cpu_time', 0.0),
+        'rows_returned': profile.get('rows_returned', 0),
+        'rows_scanned': profile.get('cumulative_rows_scanned', 0),
+        'bytes_read': profile.get('total_bytes_read', 0),
+        'bytes_written': profile.get('total_bytes_written', 0),
+        'peak_buffer_memory': profile.get('system_peak_buffer_memory', 0),
+        'peak_temp_dir_size': profile.get('system_peak_temp_dir_size', 0),
+        'operators': sorted(operators, key=lambda op: op['seconds'], reverse=True)[:TOP_OPERATORS]
+    }
+
+
+class SlowQueryLog:
+    """Profiles of statements slower than threshold_ms: the last `keep` in memory, all in log_path"""
+
+    def __init__(self, threshold_ms: float, log_path: Optional[Union[str, Path]] = DEFAULT_SLOW_QUERY_LOG,
+                 keep: int = DEFAULT_KEEP_PROFILES):
+        self.threshold_ms = threshold_ms
+        self.log_path = Path(log_path) if log_path else None
+        self.profiles: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self._pending: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        if self.log_path:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def is_slow(self, seconds: float) -> bool:
+        return seconds * 1000 >= self.threshold_ms
+
+    def capture(self, conn, query: str, parameters: Optional[List[Any]], seconds: float) -> Dict[str, Any]:
+        """Record the profile of the statement conn just ran; completed by the next finalize()"""
+        self.finalize(conn)
+        entry = {
+            'captured_at': datetime.now(timezone.utc).isoformat(),
+            'sql': query,
+            'parameters': parameters,
+            'seconds': seconds
+        }
+        self._read_profile(conn, entry)
+        with self._lock:
+            self._pending = entry
+            self.profiles.append(entry)
+        return entry
+
+    def finalize(self, conn) -> None:
+        """Complete the pending profile (its result has been consumed by now) and write it out
+
+        Call before the connection runs another statement, which replaces the profile.
+        """
+        with self._lock:
+            entry, self._pending = self._pending, None
+        if entry is None:
+            return
+        self._read_profile(conn, entry)
+        if self.log_path:
+            with self._lock, open(self.log_path, 'a') as log:
+                log.write(json.dumps(entry, default=str) + '\n')
+
+    @staticmethod
+    def _read_profile(conn, entry: Dict[str, Any]) -> None:
+        try:
+            profile = json.loads(conn.get_profiling_information(format='json'))
+            # Another statement ran on the connection in between; keep what was captured
+            if profile.get('query_name', '').strip() != entry['sql'].strip():
+                return
+            entry['profile'] = summarize_profile(profile)
+            entry['plan'] = conn.get_profiling_information(format='query_tree')
+        except Exception as e:
+            entry.setdefault('profile_error', str(e))
+
+    def recent(self, n: int = 10) -> List[Dict[str, Any]]:
+        """Last n slow-query profiles, newest first"""
+        with self._lock:
+            return list(self.profiles)[-n:][::-1]
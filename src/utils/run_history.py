@@ -0,0 +1,267 @@
+"""Run history of jobs and regression checks against it
+
+Every job run is appended to a local SQLite database: one row in `runs` (job,
+environment, ingestion_date, outcome, duration, arguments, host, git commit)
+and its measurements in `run_metrics` as (scope, name, metric, value) rows:
+
+- ('job', '', 'seconds' | 'rows' | ...) for the run as a whole
+- ('phase', 'extract' | 'transform' | 'load' | ..., 'seconds') per processor phase
+- ('table', <table>, 'extract_seconds' | 'load_seconds' | 'seconds' | 'rows' | 'bytes')
+
+compare() checks one run against a rolling baseline of the previous successful
+runs of the same job and environment. A metric counts as a regression when it is
+both far outside the baseline's spread (robust z-score from median and MAD) and
+meaningfully worse in relative and absolute terms, so noisy metrics and tiny
+changes do not raise alarms.
+"""
+import json
+import os
+import platform
+import socket
+import sqlite3
+import statistics
+import subprocess
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Baseline: previous successful runs considered, and how many a metric needs
+DEFAULT_BASELINE_RUNS = 20
+DEFAULT_MIN_BASELINE_RUNS = 5
+# A regression is at least this many robust standard deviations ...
+DEFAULT_Z_THRESHOLD = 3.5
+# ... and this much worse than the baseline median
+DEFAULT_MIN_CHANGE = 0.10
+# Timings slower by less than this are noise, however steady the baseline (e.g. no-op phases)
+DEFAULT_MIN_SECONDS = 0.05
+# Spread floor, as a share of the median, so perfectly stable baselines still need a real change
+MIN_RELATIVE_SPREAD = 0.02
+# Scales the median absolute deviation to a standard deviation for normal data
+MAD_SCALE = 1.4826
+
+# Metrics where larger is worse; other metrics (rows, bytes) are reported as shifts
+COST_SUFFIX = 'seconds'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_name TEXT NOT NULL,
+    env TEXT,
+    ingestion_date TEXT,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    duration_seconds REAL,
+    success INTEGER NOT NULL,
+    error TEXT,
+    args TEXT,
+    environment TEXT,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_job ON runs (job_name, env, run_id);
+CREATE TABLE IF NOT EXISTS run_metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id),
+    scope TEXT NOT NULL,
+    name TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS run_metrics_by_run ON run_metrics (run_id);
+"""
+
+MetricKey = Tuple[str, str, str]
+
+
+@dataclass
+class MetricComparison:
+    """One metric of a run next to its baseline"""
+    scope: str
+    name: str
+    metric: str
+    value: float
+    baseline_median: float
+    baseline_runs: int
+    z_score: float
+    change: float
+    regression: bool
+
+    @property
+    def label(self) -> str:
+        return '.'.join(part for part in (self.scope, self.name, self.metric) if part)
+
+
+def collect_environment() -> Dict[str, Any]:
+    """Host, interpreter and code version a run executed with"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=2, cwd=Path(__file__).parent).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'hostname': socket.gethostname(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'git_commit': commit
+    }
+
+
+def extract_metrics(duration_seconds: Optional[float], metadata: Dict[str, Any]) -> Dict[MetricKey, float]:
+    """Metrics of a run from its JobResult metadata, keyed by (scope, name, metric)"""
+    metrics: Dict[MetricKey, float] = {}
+    if duration_seconds is not None:
+        metrics[('job', '', 'seconds')] = duration_seconds
+    for key in ('rows_processed', 'bytes_copied', 'bytes_written', 'bytes_before', 'bytes_after',
+                'spill_bytes', 'peak_memory_bytes'):
+        if isinstance(metadata.get(key), (int, float)):
+            metrics[('job', '', key)] = metadata[key]
+
+    for phase, seconds in (metadata.get('phase_seconds') or {}).items():
+        metrics[('phase', phase, 'seconds')] = seconds
+
+    # raw -> trusted: per-table pipeline timings, rows and bytes
+    for table, timings in (metadata.get('table_timings') or {}).items():
+        for step, seconds in timings.items():
+            metrics[('table', table, f'{step}_seconds')] = seconds
+        if timings:
+            metrics[('table', table, 'seconds')] = sum(timings.values())
+    for table, rows in (metadata.get('table_rows') or {}).items():
+        metrics[('table', table, 'rows')] = rows
+    for table, size in (metadata.get('table_bytes') or {}).items():
+        metrics[('table', table, 'bytes')] = size
+    # compaction and aggregates
+    for table, stats in (metadata.get('table_stats') or {}).items():
+        for key in ('bytes_before', 'bytes_after', 'files_before', 'files_after'):
+            if key in stats:
+                metrics[('table', table, key)] = stats[key]
+    for table, rows in (metadata.get('aggregate_rows') or {}).items():
+        metrics[('table', table, 'rows')] = rows
+    return metrics
+
+
+class RunHistory:
+    """SQLite store of job runs and their metrics"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Jobs may finish concurrently (e.g. backfills); wait for the writer lock
+        self.conn = sqlite3.connect(str(self.path), timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def record(self, job_name: str, success: bool, started_at: datetime, ended_at: Optional[datetime],
+               args: Optional[Dict[str, Any]] = None, metadata: Optional[Dict[str, Any]] = None,
+               error: Optional[str] = None, environment: Optional[Dict[str, Any]] = None) -> int:
+        """Append a run and its metrics; returns the run_id"""
+        args = args or {}
+        metadata = metadata or {}
+        duration = (ended_at - started_at).total_seconds() if ended_at else None
+        metrics = extract_metrics(duration, metadata)
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (job_name, env, ingestion_date, started_at, ended_at, duration_seconds, "
+                "success, error, args, environment, metadata) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_name, args.get('env'), args.get('ingestion_date') or metadata.get('ingestion_date'),
+                 started_at.isoformat(), ended_at.isoformat() if ended_at else None, duration,
+                 int(success), error, json.dumps(args, default=str),
+                 json.dumps(environment or collect_environment(), default=str),
+                 json.dumps(metadata, default=str))
+            )
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO run_metrics (run_id, scope, name, metric, value) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, scope, name, metric, float(value)) for (scope, name, metric), value in metrics.items()]
+            )
+        return run_id
+
+    def runs(self, job_name: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent runs first"""
+        query = "SELECT run_id, job_name, env, ingestion_date, started_at, duration_seconds, success, error FROM runs"
+        params: List[Any] = []
+        if job_name:
+            query += " WHERE job_name = ?"
+            params.append(job_name)
+        query += " ORDER BY run_id DESC LIMIT ?"
+        params.append(limit)
+        columns = ['run_id', 'job_name', 'env', 'ingestion_date', 'started_at', 'duration_seconds',
+                   'success', 'error']
+        return [dict(zip(columns, row)) for row in self.conn.execute(query, params)]
+
+    def run(self, run_id: Optional[int] = None, job_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """A run by id, or the latest run (of job_name)"""
+        if run_id is not None:
+            row = self.conn.execute("SELECT run_id, job_name, env, success FROM runs WHERE run_id = ?",
+                                    (run_id,)).fetchone()
+        elif job_name:
+            row = self.conn.execute("SELECT run_id, job_name, env, success FROM runs WHERE job_name = ? "
+                                    "ORDER BY run_id DESC LIMIT 1", (job_name,)).fetchone()
+        else:
+            row = self.conn.execute("SELECT run_id, job_name, env, success FROM runs "
+                                    "ORDER BY run_id DESC LIMIT 1").fetchone()
+        return dict(zip(['run_id', 'job_name', 'env', 'success'], row)) if row else None
+
+    def metrics(self, run_ids: Iterable[int]) -> Dict[int, Dict[MetricKey, float]]:
+        """run_id -> (scope, name, metric) -> value"""
+        run_ids = list(run_ids)
+        result: Dict[int, Dict[MetricKey, float]] = {run_id: {} for run_id in run_ids}
+        if not run_ids:
+            return result
+        placeholders = ', '.join('?' * len(run_ids))
+        for run_id, scope, name, metric, value in self.conn.execute(
+                f"SELECT run_id, scope, name, metric, value FROM run_metrics WHERE run_id IN ({placeholders})",
+                run_ids):
+            result[run_id][(scope, name, metric)] = value
+        return result
+
+    def baseline_runs(self, run: Dict[str, Any], window: int = DEFAULT_BASELINE_RUNS) -> List[int]:
+        """Ids of the previous successful runs of the same job and environment"""
+        rows = self.conn.execute(
+            "SELECT run_id FROM runs WHERE job_name = ? AND env IS ? AND success = 1 AND run_id < ? "
+            "ORDER BY run_id DESC LIMIT ?",
+            (run['job_name'], run['env'], run['run_id'], window)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def compare(self, run_id: Optional[int] = None, job_name: Optional[str] = None,
+                window: int = DEFAULT_BASELINE_RUNS, min_runs: int = DEFAULT_MIN_BASELINE_RUNS,
+                z_threshold: float = DEFAULT_Z_THRESHOLD, min_change: float = DEFAULT_MIN_CHANGE,
+                min_seconds: float = DEFAULT_MIN_SECONDS) -> Tuple[Optional[Dict[str, Any]], List[MetricComparison]]:
+        """Compare a run (default: the latest, of job_name) with its rolling baseline
+
+        Returns the run and one comparison per metric that has at least min_runs
+        baseline values, regressions first.
+        """
+        run = self.run(run_id, job_name)
+        if run is None:
+            return None, []
+        baseline_ids = self.baseline_runs(run, window)
+        all_metrics = self.metrics([run['run_id']] + baseline_ids)
+        current = all_metrics[run['run_id']]
+
+        comparisons = []
+        for key, value in current.items():
+            history = [all_metrics[baseline_id][key] for baseline_id in baseline_ids if key in all_metrics[baseline_id]]
+            if len(history) < min_runs:
+                continue
+            median = statistics.median(history)
+            mad = statistics.median(abs(h - median) for h in history)
+            spread = max(MAD_SCALE * mad, MIN_RELATIVE_SPREAD * abs(median), 1e-9)
+            z_score = (value - median) / spread
+            change = (value - median) / median if median else 0.0
+            scope, name, metric = key
+            regression = (metric.endswith(COST_SUFFIX) and z_score >= z_threshold and change >= min_change
+                          and value - median >= min_seconds)
+            comparisons.append(MetricComparison(scope, name, metric, value, median, len(history),
+                                                z_score, change, regression))
+        comparisons.sort(key=lambda c: (not c.regression, -abs(c.z_score)))
+        return run, comparisons
+
+
+def open_run_history(path: Optional[Union[str, Path]] = None) -> RunHistory:
+    """Run history at path, RUN_HISTORY_PATH from settings, or the default location"""
+    if path is None:
+        from src.core.defaults import DEFAULT_RUN_HISTORY_PATH
+        from src.utils.config import settings
+        path = settings.RUN_HISTORY_PATH or DEFAULT_RUN_HISTORY_PATH
+    return RunHistory(path)
@@ -11,6 +11,9 @@ TRUSTED_SCHEMAS = {
             ('ingestion_date', 'VARCHAR')
         ],
         'partition_cols': ['ingestion_date'],
+        'primary_key': ['user_id'],
+        'sort_cols': ['user_id'],
+        'index_cols': ['user_id'],
         'location_suffix': 'users'
     },
     
@@ -24,6 +27,9 @@ TRUSTED_SCHEMAS = {
             ('ingestion_date', 'VARCHAR')
         ],
         'partition_cols': ['ingestion_date'],
+        'primary_key': ['video_id'],
+        'sort_cols': ['video_id'],
+        'index_cols': ['video_id'],
         'location_suffix': 'videos'
     },
     
@@ -36,17 +42,19 @@ TRUSTED_SCHEMAS = {
             ('ingestion_date', 'VARCHAR')
         ],
         'partition_cols': ['ingestion_date'],
+        'primary_key': ['device', 'os', 'model'],
+        'sort_cols': ['device', 'os', 'model'],
         'location_suffix': 'devices'
     },
     
     'trusted_events': {
         'columns': [
-            ('timestamp', 'VARCHAR'),
+            ('timestamp', 'TIMESTAMP'),
             ('account_id', 'VARCHAR'),
             ('video_id', 'VARCHAR'),
             ('user_id', 'VARCHAR'),
             ('event_name', 'VARCHAR'),
-            ('value', 'DECIMAL(2,1)'),
+            ('value', 'DOUBLE'),
             ('device', 'VARCHAR'),
             ('app_version', 'VARCHAR'),
             ('device_os', 'VARCHAR'),
@@ -54,17 +62,132 @@ TRUSTED_SCHEMAS = {
             ('ip', 'VARCHAR'),
             ('country', 'VARCHAR'),
             ('session_id', 'VARCHAR'),
+            ('session_day', 'INTEGER'),
+            ('sub_session', 'INTEGER'),
             ('ingestion_date', 'VARCHAR')
         ],
+        # Low-cardinality text kept dictionary encoded: pandas category, Arrow dictionary,
+        # DuckDB ENUM in tables loaded from the trusted files
+        'categorical_cols': ['event_name', 'device', 'device_os', 'app_version', 'network_type', 'country'],
+        # Parsed once at trusted time from session ids like user_{id}_sess_{day}_{sub}:
+        # (column, source column, regex whose first group holds the value)
+        'derived_cols': [
+            ('session_day', 'session_id', r'_sess_(\d+)_\d+$'),
+            ('sub_session', 'session_id', r'_sess_\d+_(\d+)$')
+        ],
         'partition_cols': ['ingestion_date'],
+        'sort_cols': ['user_id', 'session_id', 'timestamp'],
+        # Min/max kept per file and row group in the table's zone map (trusted/_index/)
+        'index_cols': ['user_id', 'session_id', 'timestamp', 'video_id'],
         'location_suffix': 'events'
+    },
+    
+    # Optional wide events table (to_trusted --enrich), built from the trusted
+    # events partition rather than from a raw file
+    'trusted_events_enriched': {
+        'columns': [
+            ('timestamp', 'TIMESTAMP'),
+            ('account_id', 'VARCHAR'),
+            ('video_id', 'VARCHAR'),
+            ('user_id', 'VARCHAR'),
+            ('event_name', 'VARCHAR'),
+            ('value', 'DOUBLE'),
+            ('device', 'VARCHAR'),
+            ('app_version', 'VARCHAR'),
+            ('device_os', 'VARCHAR'),
+            ('network_type', 'VARCHAR'),
+            ('ip', 'VARCHAR'),
+            ('country', 'VARCHAR'),
+            ('session_id', 'VARCHAR'),
+            ('session_day', 'INTEGER'),
+            ('sub_session', 'INTEGER'),
+            ('genre', 'VARCHAR'),
+            ('duration_seconds', 'INTEGER'),
+            ('subscription_tier', 'VARCHAR'),
+            ('age_group', 'VARCHAR'),
+            ('ingestion_date', 'VARCHAR')
+        ],
+        'categorical_cols': ['event_name', 'device', 'device_os', 'app_version', 'network_type', 'country',
+                             'genre', 'subscription_tier', 'age_group'],
+        'enrich_from': 'trusted_events',
+        # Dimensions joined on while writing: (dimension table, join key, columns)
+        'dimension_joins': [
+            ('trusted_videos', 'video_id', ['genre', 'duration_seconds']),
+            ('trusted_users', 'user_id', ['subscription_tier', 'age_group'])
+        ],
+        'partition_cols': ['ingestion_date'],
+        'sort_cols': ['user_id', 'session_id', 'timestamp'],
+        'index_cols': ['user_id', 'session_id', 'timestamp', 'video_id'],
+        'location_suffix': 'events_enriched'
+    }
+}
+
+# Extra columns of the SCD2 history kept for dimension snapshots (to_trusted
+# --dimension_mode scd2). valid_to is derived at read time from the next version.
+SCD2_COLUMNS = [
+    ('row_hash', 'VARCHAR'),
+    ('valid_from', 'DATE'),
+    ('is_deleted', 'BOOLEAN')
+]
+SCD2_SUFFIX = '_history'
+
+
+# Rollups over trusted tables, maintained one ingestion_date partition at a time.
+# Distinct counts are kept as fixed-size HyperLogLog sketches, which merge across
+# partitions and dimensions instead of needing a rescan of the source.
+AGGREGATE_SCHEMAS = {
+    'agg_device_dropoff_daily': {
+        'source_table': 'trusted_events',
+        # (column, type, expression over the source table)
+        'dimensions': [
+            ('event_date', 'VARCHAR', 'CAST(CAST("timestamp" AS TIMESTAMP) AS DATE)'),
+            ('device_os', 'VARCHAR', 'device_os'),
+            ('app_version', 'VARCHAR', 'app_version'),
+            ('network_type', 'VARCHAR', 'network_type')
+        ],
+        # (column, type, aggregate expression) - merged by summing
+        'measures': [
+            ('event_count', 'BIGINT', 'COUNT(*)'),
+            ('watch_time_seconds', 'DOUBLE',
+             "SUM(CASE WHEN event_name = 'watch_time' THEN value ELSE 0 END)")
+        ],
+        # (sketch column, source column, estimated count column) - see src/utils/hll.py
+        'sketches': [
+            ('user_id_hll', 'user_id', 'unique_users'),
+            ('session_id_hll', 'session_id', 'unique_sessions')
+        ],
+        'date_col': 'event_date',
+        'partition_cols': ['ingestion_date'],
+        'location_suffix': 'aggregates/device_dropoff_daily'
+    },
+    'agg_distinct_sketch_daily': {
+        'source_table': 'trusted_events',
+        'dimensions': [
+            ('event_date', 'VARCHAR', 'CAST(CAST("timestamp" AS TIMESTAMP) AS DATE)'),
+            ('device_os', 'VARCHAR', 'device_os'),
+            ('app_version', 'VARCHAR', 'app_version'),
+            ('country', 'VARCHAR', 'country')
+        ],
+        'measures': [
+            ('event_count', 'BIGINT', 'COUNT(*)')
+        ],
+        'sketches': [
+            ('user_id_hll', 'user_id', 'approx_users'),
+            ('session_id_hll', 'session_id', 'approx_sessions')
+        ],
+        'date_col': 'event_date',
+        'partition_cols': ['ingestion_date'],
+        'location_suffix': 'aggregates/distinct_sketch_daily'
     }
 }
 
 
 def get_trusted_schema(table_name: str) -> Dict:
-    """Get schema definition for a trusted table"""
+    """Get schema definition for a trusted table, including a dimension's SCD2 history (<table>_history)"""
     if table_name not in TRUSTED_SCHEMAS:
+        dimension = table_name[:-len(SCD2_SUFFIX)] if table_name.endswith(SCD2_SUFFIX) else None
+        if dimension in get_scd2_tables():
+            return get_scd2_schema(dimension)
         raise ValueError(f"Unknown trusted table: {table_name}")
     return TRUSTED_SCHEMAS[table_name]
 
@@ -74,6 +197,48 @@ def get_all_trusted_tables() -> List[str]:
     return list(TRUSTED_SCHEMAS.keys())
 
 
+def get_raw_trusted_tables() -> List[str]:
+    """Get trusted tables converted from raw files (excludes tables built from other trusted tables)"""
+    return [name for name, schema in TRUSTED_SCHEMAS.items() if 'enrich_from' not in schema]
+
+
+def get_enriched_tables() -> List[str]:
+    """Get trusted tables built by joining dimensions onto another trusted table"""
+    return [name for name, schema in TRUSTED_SCHEMAS.items() if 'enrich_from' in schema]
+
+
+def get_scd2_tables() -> List[str]:
+    """Get dimension tables that can be kept as SCD2 history (tables with a primary_key)"""
+    return [name for name, schema in TRUSTED_SCHEMAS.items() if 'primary_key' in schema]
+
+
+def get_scd2_location_suffix(table_name: str) -> str:
+    """Get the location of a dimension table's SCD2 history"""
+    return get_trusted_schema(table_name)['location_suffix'] + SCD2_SUFFIX
+
+
+def get_scd2_columns(table_name: str) -> List[Tuple[str, str]]:
+    """Get stored column definitions of a dimension table's SCD2 history"""
+    schema = get_trusted_schema(table_name)
+    columns = [(col, dtype) for col, dtype in schema['columns'] if col not in schema['partition_cols']]
+    columns += SCD2_COLUMNS
+    columns += [(col, dtype) for col, dtype in schema['columns'] if col in schema['partition_cols']]
+    return columns
+
+
+def get_scd2_schema(table_name: str) -> Dict:
+    """Get the schema of a dimension table's SCD2 history, stored and committed like a trusted table"""
+    schema = get_trusted_schema(table_name)
+    return {
+        'columns': get_scd2_columns(table_name),
+        'partition_cols': schema['partition_cols'],
+        'primary_key': schema['primary_key'],
+        'sort_cols': schema['primary_key'],
+        'index_cols': schema.get('index_cols', []),
+        'location_suffix': get_scd2_location_suffix(table_name)
+    }
+
+
 def get_table_columns(table_name: str) -> List[Tuple[str, str]]:
     """Get column definitions for a table"""
     schema = get_trusted_schema(table_name)
@@ -86,6 +251,223 @@ def get_table_partition_cols(table_name: str) -> List[str]:
     return schema['partition_cols']
 
 
+def get_table_sort_cols(table_name: str) -> List[str]:
+    """Get sort columns that trusted files are written in"""
+    schema = get_trusted_schema(table_name)
+    return schema.get('sort_cols', [])
+
+
+def get_table_index_cols(table_name: str) -> List[str]:
+    """Get columns whose min/max are kept in the table's zone map"""
+    schema = get_trusted_schema(table_name)
+    return schema.get('index_cols', [])
+
+
+def get_table_categorical_cols(table_name: str) -> List[str]:
+    """Get low-cardinality text columns kept dictionary encoded"""
+    schema = get_trusted_schema(table_name)
+    return schema.get('categorical_cols', [])
+
+
+def get_table_derived_cols(table_name: str) -> List[Tuple[str, str, str]]:
+    """Get columns parsed from other columns: (column, source column, regex)"""
+    schema = get_trusted_schema(table_name)
+    return schema.get('derived_cols', [])
+
+
+def build_trusted_select(table_name: str, source_relation: str,
+                         partition_values: Dict[str, str]) -> str:
+    """Build a SELECT shaping a raw relation into a trusted table's columns, types and sort order"""
+    schema = get_trusted_schema(table_name)
+    derived = {col: (source_col, pattern) for col, source_col, pattern in schema.get('derived_cols', [])}
+    
+    select_cols = []
+    for col, dtype in schema['columns']:
+        if col in derived:
+            source_col, pattern = derived[col]
+            select_cols.append(
+                f"TRY_CAST(regexp_extract(\"{source_col}\", '{pattern}', 1) AS {dtype}) AS \"{col}\""
+            )
+        elif col in schema['partition_cols']:
+            select_cols.append(f"CAST('{partition_values[col]}' AS {dtype}) AS \"{col}\"")
+        else:
+            select_cols.append(f"CAST(\"{col}\" AS {dtype}) AS \"{col}\"")
+    
+    query = f"SELECT {', '.join(select_cols)} FROM {source_relation}"
+    if schema.get('sort_cols'):
+        query += " ORDER BY " + ", ".join(f"\"{col}\"" for col in schema['sort_cols'])
+    
+    return query
+
+
+def build_scd2_merge(table_name: str, snapshot_relation: str, history_relation: str,
+                     ingestion_date: str) -> str:
+    """Build the SELECT of the SCD2 records a dimension snapshot adds to its history
+    
+    Rows are hashed and compared with the latest version of their key in history;
+    only new and changed rows are returned, plus a tombstone (is_deleted) for each
+    key that left the snapshot. All records get valid_from = ingestion_date.
+    
+    Args:
+        table_name: Dimension table with a primary_key
+        snapshot_relation: Relation holding the snapshot in the table's trusted columns
+        history_relation: Relation over the history partitions before ingestion_date,
+            or None when there is no history yet
+        ingestion_date: Date of the snapshot (YYYY-MM-DD)
+    """
+    schema = get_trusted_schema(table_name)
+    keys = schema['primary_key']
+    value_cols = [col for col, _ in schema['columns'] if col not in schema['partition_cols']]
+    key_types = dict(schema['columns'])
+    
+    # Unit separator between values and NUL for NULL, so ('a', NULL) and ('a', '') differ
+    hash_sql = "md5(concat_ws(chr(31), " + ", ".join(
+        f"coalesce(CAST(\"{col}\" AS VARCHAR), chr(0))" for col in value_cols
+    ) + "))"
+    key_match = " AND ".join(f"s.\"{key}\" = c.\"{key}\"" for key in keys)
+    key_list = ", ".join(f"\"{key}\"" for key in keys)
+    
+    if history_relation:
+        current_sql = f"""
+            SELECT {key_list}, arg_max(row_hash, valid_from) AS row_hash,
+                   arg_max(is_deleted, valid_from) AS is_deleted
+            FROM {history_relation} GROUP BY {key_list}"""
+    else:
+        current_sql = "SELECT " + ", ".join(
+            f"CAST(NULL AS {key_types[key]}) AS \"{key}\"" for key in keys
+        ) + ", CAST(NULL AS VARCHAR) AS row_hash, CAST(NULL AS BOOLEAN) AS is_deleted WHERE false"
+    
+    record_cols = ", ".join(f"\"{col}\"" for col in value_cols)
+    snapshot_cols = ", ".join(f"s.\"{col}\"" for col in value_cols)
+    partition_sql = ", ".join(
+        f"CAST('{ingestion_date}' AS VARCHAR) AS \"{col}\"" for col in schema['partition_cols']
+    )
+    tombstone_cols = ", ".join(
+        f"c.\"{col}\"" if col in keys else f"CAST(NULL AS {key_types[col]}) AS \"{col}\""
+        for col in value_cols
+    )
+    
+    return f"""
+        WITH snapshot AS (
+            SELECT * FROM (
+                SELECT {record_cols}, {hash_sql} AS row_hash FROM {snapshot_relation}
+            ) QUALIFY row_number() OVER (PARTITION BY {key_list} ORDER BY row_hash) = 1
+        ),
+        current_version AS ({current_sql}
+        )
+        SELECT {snapshot_cols}, s.row_hash,
+               DATE '{ingestion_date}' AS valid_from, false AS is_deleted, {partition_sql}
+        FROM snapshot s LEFT JOIN current_version c ON {key_match}
+        WHERE c.row_hash IS NULL OR c.is_deleted OR c.row_hash <> s.row_hash
+        UNION ALL
+        SELECT {tombstone_cols}, c.row_hash,
+               DATE '{ingestion_date}' AS valid_from, true AS is_deleted, {partition_sql}
+        FROM current_version c
+        WHERE NOT c.is_deleted AND NOT EXISTS (SELECT 1 FROM snapshot s WHERE {key_match})
+        ORDER BY {key_list}
+    """
+
+
+def build_scd2_view_select(table_name: str, history_relation: str) -> str:
+    """Build the SELECT exposing SCD2 history as versions with valid_from/valid_to
+    
+    valid_to is the valid_from of the key's next record (NULL for the current
+    version); tombstones only close versions and are not returned.
+    """
+    keys = get_trusted_schema(table_name)['primary_key']
+    key_list = ", ".join(f"\"{key}\"" for key in keys)
+    return f"""
+        SELECT * EXCLUDE (is_deleted) FROM (
+            SELECT *, lead(valid_from) OVER (PARTITION BY {key_list} ORDER BY valid_from) AS valid_to
+            FROM {history_relation}
+        ) WHERE NOT is_deleted
+    """
+
+
+def build_scd2_current_select(table_name: str, history_relation: str) -> str:
+    """Build the SELECT of a dimension's current rows (valid_to IS NULL) in its trusted columns
+    
+    ingestion_date is the date the current version was written.
+    """
+    columns = ", ".join(f"\"{col}\"" for col, _ in get_trusted_schema(table_name)['columns'])
+    return f"""
+        SELECT {columns} FROM ({build_scd2_view_select(table_name, history_relation)})
+        WHERE valid_to IS NULL
+    """
+
+
+def get_aggregate_schema(aggregate_name: str) -> Dict:
+    """Get definition of an aggregate table"""
+    if aggregate_name not in AGGREGATE_SCHEMAS:
+        raise ValueError(f"Unknown aggregate table: {aggregate_name}")
+    return AGGREGATE_SCHEMAS[aggregate_name]
+
+
+def get_all_aggregate_tables() -> List[str]:
+    """Get list of all aggregate table names"""
+    return list(AGGREGATE_SCHEMAS.keys())
+
+
+def get_aggregate_columns(aggregate_name: str) -> List[Tuple[str, str]]:
+    """Get stored column definitions of an aggregate table"""
+    schema = get_aggregate_schema(aggregate_name)
+    columns = [(col, dtype) for col, dtype, _ in schema['dimensions']]
+    columns += [(col, dtype) for col, dtype, _ in schema['measures']]
+    columns += [(sketch_col, 'BLOB') for sketch_col, _, _ in schema['sketches']]
+    columns += [(col, 'VARCHAR') for col in schema['partition_cols']]
+    return columns
+
+
+def build_aggregate_select(aggregate_name: str, source_relation: str,
+                           partition_values: Dict[str, str]) -> str:
+    """Build the SELECT computing one partition of an aggregate from its source rows
+    
+    Sketch columns come back as the group's distinct HyperLogLog register codes
+    (bounded by the sketch size); the caller turns them into sketches before writing.
+    """
+    from src.utils.hll import register_codes_sql
+
+    schema = get_aggregate_schema(aggregate_name)
+    
+    select_cols = [f"CAST({expr} AS {dtype}) AS \"{col}\"" for col, dtype, expr in schema['dimensions']]
+    select_cols += [f"CAST({expr} AS {dtype}) AS \"{col}\"" for col, dtype, expr in schema['measures']]
+    select_cols += [
+        f"{register_codes_sql(source_col)} AS \"{sketch_col}\""
+        for sketch_col, source_col, _ in schema['sketches']
+    ]
+    select_cols += [f"CAST('{partition_values[col]}' AS VARCHAR) AS \"{col}\"" for col in schema['partition_cols']]
+    
+    group_by = ", ".join(str(i + 1) for i in range(len(schema['dimensions'])))
+    return (f"SELECT {', '.join(select_cols)} FROM {source_relation} "
+            f"GROUP BY {group_by} ORDER BY {group_by}")
+
+
+def build_aggregate_merge(aggregate_name: str, relation: str, dimensions: List[str],
+                          where: str = "") -> str:
+    """Build a query merging aggregate rows up to the given dimensions
+    
+    Sums the measures for any subset of the dimensions and any range of partitions.
+    Sketch columns come back as lists of the sketches to merge.
+    """
+    schema = get_aggregate_schema(aggregate_name)
+    known = [col for col, _, _ in schema['dimensions']]
+    unknown = [dim for dim in dimensions if dim not in known]
+    if unknown:
+        raise ValueError(f"Unknown dimensions for {aggregate_name}: {unknown}")
+    
+    select_cols = [f"\"{dim}\"" for dim in dimensions]
+    select_cols += [f"CAST(SUM(\"{col}\") AS {dtype}) AS \"{col}\"" for col, dtype, _ in schema['measures']]
+    select_cols += [f"list(\"{sketch_col}\") AS \"{sketch_col}\"" for sketch_col, _, _ in schema['sketches']]
+    
+    query = f"SELECT {', '.join(select_cols)} FROM {relation}"
+    if where:
+        query += f" WHERE {where}"
+    if dimensions:
+        group_by = ", ".join(select_cols[:len(dimensions)])
+        query += f" GROUP BY {group_by} ORDER BY {group_by}"
+    return query
+
+
 def build_table_ddl(table_name: str, s3_location: str) -> str:
     """Build CREATE TABLE DDL for external table"""
     schema = get_trusted_schema(table_name)
@@ -0,0 +1,276 @@
+"""Nested tracing spans exported as Chrome trace files
+
+Spans nest pipeline -> job -> processor phase -> table -> storage/SQL call and
+carry attributes such as rows, bytes or the object key. Tracing is off unless a
+job starts it (--trace_dir, or TRACEPARENT inherited from a parent process);
+span() is then a no-op, so instrumented code pays next to nothing.
+
+Trace context crosses process boundaries as a W3C traceparent string
+(00-<trace id>-<parent span id>-01) in the TRACEPARENT environment variable,
+next to TRACE_DIRECTORY. Each process writes its spans to
+<trace dir>/<trace id>/<job>-<pid>.json in the Chrome Trace Event format (long-running
+processes flush finished spans early to <job>-<pid>-<n>.json, see flush_tracing), and the
+process that started the trace merges them into <trace dir>/<trace id>.json,
+which Perfetto (ui.perfetto.dev), chrome://tracing or speedscope show as a
+flame graph.
+"""
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACEPARENT_ENV = 'TRACEPARENT'
+TRACE_DIRECTORY_ENV = 'TRACE_DIRECTORY'
+# Attribute values longer than this (e.g. SQL text) are cut
+MAX_ATTRIBUTE_CHARS = 2000
+
+
+class Span:
+    """One timed operation; attributes can be added until it ends"""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'start_us', 'end_us', 'attributes', 'thread_id', 'thread_name')
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_us = time.time_ns() // 1000
+        self.end_us: Optional[int] = None
+        self.attributes = attributes
+        thread = threading.current_thread()
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+
+    def set(self, **attributes: Any) -> None:
+        """Add or replace attributes"""
+        self.attributes.update(attributes)
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is off"""
+
+    span_id = None
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+
+class Tracer:
+    """Collects the spans of one process for one trace"""
+
+    def __init__(self, trace_id: str, directory: Path, process_name: str,
+                 parent_span_id: Optional[str] = None, is_root: bool = True):
+        self.trace_id = trace_id
+        self.directory = directory
+        self.process_name = process_name
+        self.parent_span_id = parent_span_id
+        self.is_root = is_root
+        self.spans: List[Span] = []
+        self._flushes = 0
+        self._lock = threading.Lock()
+
+    def finish(self, span: Span) -> None:
+        span.end_us = time.time_ns() // 1000
+        with self._lock:
+            self.spans.append(span)
+
+    def chrome_events(self, spans: Optional[List[Span]] = None) -> List[Dict[str, Any]]:
+        """Spans (default: the finished spans held) as Chrome trace events: complete ('X')
+        events plus process/thread names"""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = [
+            {'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': 0, 'args': {'name': self.process_name}}
+        ]
+        threads = {}
+        if spans is None:
+            with self._lock:
+                spans = list(self.spans)
+        for span in spans:
+            threads[span.thread_id] = span.thread_name
+            args = {key: _attribute_value(value) for key, value in span.attributes.items()}
+            args.update({'span_id': span.span_id, 'parent_id': span.parent_id})
+            events.append({
+                'ph': 'X', 'name': span.name, 'cat': span.name.split('.')[0],
+                'pid': pid, 'tid': span.thread_id,
+                'ts': span.start_us, 'dur': max(span.end_us - span.start_us, 1),
+                'args': args
+            })
+        for thread_id, thread_name in threads.items():
+            events.append({'ph': 'M', 'name': 'thread_name', 'pid': pid, 'tid': thread_id,
+                           'args': {'name': thread_name}})
+        return events
+
+    def write(self) -> Path:
+        """Write the spans not flushed yet to <directory>/<trace id>/<process>-<pid>.json"""
+        return self._write_spans(self._take_spans(), f"{self.process_name}-{os.getpid()}.json")
+
+    def flush(self) -> Optional[Path]:
+        """Write the spans finished so far to their own file and stop holding them
+
+        Returns the file, or None when no span finished since the last flush.
+        """
+        spans = self._take_spans()
+        if not spans:
+            return None
+        self._flushes += 1
+        return self._write_spans(spans, f"{self.process_name}-{os.getpid()}-{self._flushes:05d}.json")
+
+    def _take_spans(self) -> List[Span]:
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def _write_spans(self, spans: List[Span], file_name: str) -> Path:
+        trace_dir = self.directory / self.trace_id
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        path = trace_dir / file_name
+        path.write_text(json.dumps({'traceEvents': self.chrome_events(spans), 'displayTimeUnit': 'ms'}))
+        return path
+
+
+def _attribute_value(value: Any) -> Any:
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = str(value)
+    return text if len(text) <= MAX_ATTRIBUTE_CHARS else text[:MAX_ATTRIBUTE_CHARS] + '...'
+
+
+_tracer: Optional[Tracer] = None
+
+
+def parse_traceparent(value: str) -> Optional[Dict[str, str]]:
+    """trace_id and parent span id of a W3C traceparent, None when malformed"""
+    parts = value.strip().split('-')
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return {'trace_id': parts[1], 'parent_id': parts[2]}
+
+
+def start_tracing(process_name: str, directory: Optional[str] = None) -> Optional[Tracer]:
+    """Start tracing this process
+
+    Joins the trace in TRACEPARENT when a parent process passed one, otherwise
+    starts a new trace when directory is given. Returns None (tracing stays off)
+    when neither applies.
+    """
+    global _tracer
+    parent = parse_traceparent(os.environ.get(TRACEPARENT_ENV, ''))
+    directory = directory or os.environ.get(TRACE_DIRECTORY_ENV)
+    if not directory:
+        return None
+    if parent:
+        _tracer = Tracer(parent['trace_id'], Path(directory), process_name, parent['parent_id'], is_root=False)
+    else:
+        _tracer = Tracer(secrets.token_hex(16), Path(directory), process_name)
+    return _tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def finish_tracing() -> Optional[Path]:
+    """Write this process's spans; the trace's root process also merges all of them
+
+    Returns the merged trace file (root) or this process's span file.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    path = tracer.write()
+    if tracer.is_root:
+        return merge_trace(tracer.directory, tracer.trace_id)
+    return path
+
+
+def flush_tracing() -> Optional[Path]:
+    """Write the spans finished so far and drop them from memory; a no-op while tracing is off
+
+    Long-running jobs (e.g. --stream) call this per unit of work, so spans do not pile up.
+    """
+    tracer = _tracer
+    return tracer.flush() if tracer is not None else None
+
+
+def merge_trace(directory: Path, trace_id: str) -> Path:
+    """Combine the span files of every process of a trace into <directory>/<trace id>.json"""
+    events: List[Dict[str, Any]] = []
+    for path in sorted((directory / trace_id).glob('*.json')):
+        events.extend(json.loads(path.read_text())['traceEvents'])
+    merged = directory / f"{trace_id}.json"
+    merged.write_text(json.dumps({
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+        'otherData': {'trace_id': trace_id}
+    }))
+    return merged
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Time the enclosed block as a child of the current span
+
+    Yields the span (or a no-op stand-in while tracing is off) so the block can add
+    attributes with span.set(rows=..., bytes=...). An exception is recorded as the
+    'error' attribute and re-raised.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    parent = _current_span.get()
+    current = Span(name, parent.span_id if parent else tracer.parent_span_id, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.finish(current)
+
+
+def current_span() -> Optional[Span]:
+    """Innermost open span of this thread, None outside spans or while tracing is off"""
+    return _current_span.get() if _tracer is not None else None
+
+
+@contextmanager
+def attach(parent: Optional[Span]) -> Iterator[None]:
+    """Make parent the current span in a worker thread, so its spans nest under it
+
+    Threads start with an empty context; pass them current_span() of the code that
+    started them.
+    """
+    if parent is None or _tracer is None:
+        yield
+        return
+    token = _current_span.set(parent)
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+
+
+def child_environment(parent: Optional[Span] = None) -> Dict[str, str]:
+    """Environment variables that let a subprocess join this trace under parent (default: current span)"""
+    tracer = _tracer
+    if tracer is None:
+        return {}
+    parent = parent or _current_span.get()
+    parent_id = parent.span_id if parent else (tracer.parent_span_id or secrets.token_hex(8))
+    return {
+        TRACEPARENT_ENV: f"00-{tracer.trace_id}-{parent_id}-01",
+        TRACE_DIRECTORY_ENV: str(tracer.directory)
+    }
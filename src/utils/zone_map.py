@@ -0,0 +1,112 @@
+"""Min/max zone maps of trusted parquet files
+
+A table's zone map is one small JSON document at trusted/_index/<location>.json
+holding, per parquet file and per row group, the min/max of the table's index
+columns as recorded in the parquet footers. Readers use it to skip files that
+cannot match a predicate without opening them.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+INDEX_PREFIX = '_index'
+NUMERIC_TYPES = ('INTEGER', 'BIGINT', 'DOUBLE', 'DECIMAL')
+
+# Equality value, or an inclusive (low, high) range with None for an open end
+Predicate = Any
+
+
+class ZoneMap:
+    """Per-file and per-row-group min/max of a trusted table's index columns"""
+
+    def __init__(self, table_name: str, column_types: Dict[str, str],
+                 files: Optional[Dict[str, Dict[str, Any]]] = None):
+        """Initialize the zone map
+
+        Args:
+            table_name: Trusted table the files belong to
+            column_types: Registry type of each index column, used to compare values
+            files: Object name -> {'rows', 'min', 'max', 'row_groups': [{'rows', 'min', 'max'}]}
+        """
+        self.table_name = table_name
+        self.column_types = column_types
+        self.files = files or {}
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "ZoneMap":
+        """Zone map serialized with to_json"""
+        document = json.loads(data)
+        return cls(document['table'], document['column_types'], document['files'])
+
+    def to_json(self) -> bytes:
+        """JSON document of the zone map"""
+        return json.dumps({
+            'table': self.table_name,
+            'column_types': self.column_types,
+            'files': self.files
+        }, sort_keys=True).encode('utf-8')
+
+    def replace_partition(self, partition_prefix: str,
+                          row_groups: Dict[str, List[Tuple[int, Dict[str, Any], Dict[str, Any]]]]) -> None:
+        """Replace the entries of every file under partition_prefix
+
+        Args:
+            partition_prefix: Object prefix of the partition, e.g. trusted/events/ingestion_date=2025-09-09/
+            row_groups: Object name -> [(rows, {column: min}, {column: max})] in row group order
+        """
+        self.files = {name: entry for name, entry in self.files.items()
+                      if not name.startswith(partition_prefix)}
+        self.add_files(row_groups)
+
+    def add_files(self, row_groups: Dict[str, List[Tuple[int, Dict[str, Any], Dict[str, Any]]]]) -> None:
+        """Add or replace the entries of individual files (same row_groups format as replace_partition)"""
+        for object_name, groups in row_groups.items():
+            self.files[object_name] = {
+                'rows': sum(rows for rows, _, _ in groups),
+                'min': self._combine([mins for _, mins, _ in groups], min),
+                'max': self._combine([maxs for _, _, maxs in groups], max),
+                'row_groups': [{'rows': rows, 'min': mins, 'max': maxs} for rows, mins, maxs in groups]
+            }
+
+    def matching_files(self, predicates: Dict[str, Predicate]) -> List[str]:
+        """Object names of files that may hold rows matching every predicate"""
+        return sorted(name for name, entry in self.files.items() if self._may_match(entry, predicates))
+
+    def matching_row_groups(self, predicates: Dict[str, Predicate]) -> Dict[str, List[int]]:
+        """Row group ids, per candidate file, that may hold matching rows"""
+        matches = {}
+        for name in self.matching_files(predicates):
+            groups = [index for index, group in enumerate(self.files[name]['row_groups'])
+                      if self._may_match(group, predicates)]
+            if groups:
+                matches[name] = groups
+        return matches
+
+    def _may_match(self, zone: Dict[str, Any], predicates: Dict[str, Predicate]) -> bool:
+        for col, predicate in predicates.items():
+            low, high = predicate if isinstance(predicate, tuple) else (predicate, predicate)
+            zone_min, zone_max = zone['min'].get(col), zone['max'].get(col)
+            # Columns without statistics cannot rule a zone out
+            if zone_min is None or zone_max is None:
+                continue
+            if high is not None and self._coerce(col, zone_min) > self._coerce(col, high):
+                return False
+            if low is not None and self._coerce(col, zone_max) < self._coerce(col, low):
+                return False
+        return True
+
+    def _combine(self, zones: List[Dict[str, Any]], pick) -> Dict[str, Any]:
+        combined = {}
+        for col in self.column_types:
+            values = [zone[col] for zone in zones if zone.get(col) is not None]
+            combined[col] = pick(values, key=lambda value: self._coerce(col, value)) if values else None
+        return combined
+
+    def _coerce(self, col: str, value: Any) -> Any:
+        dtype = self.column_types.get(col, 'VARCHAR')
+        if dtype == 'TIMESTAMP':
+            return pd.Timestamp(value)
+        if dtype.startswith(NUMERIC_TYPES):
+            return float(value)
+        return str(value)
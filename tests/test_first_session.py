@@ -0,0 +1,81 @@
+"""AnalysisMetrics and CohortEngine pick the same first session and dominant genre on ties"""
+import json
+from argparse import Namespace
+
+import pytest
+
+from src.analytics.cohort import CohortEngine
+from src.analytics.metrics import AnalysisMetrics
+from src.connect.duckdb_client import DataLakeManager
+from src.connect.local_store import LocalObjectStore
+from src.core.raw_to_trusted_processor import RawToTrustedProcessor
+
+INGESTION_DATE = '2025-09-09'
+# user_1: two sessions starting at the same instant; the first one (by session_id)
+# splits its watch time evenly between two genres, and has a video without a genre
+EVENTS = [
+    ('user_1', 'user_1_sess_1_2', 'video_1', 'play', '10:00:00', 0.0),
+    ('user_1', 'user_1_sess_1_2', 'video_1', 'watch_time', '10:00:05', 90.0),
+    ('user_1', 'user_1_sess_1_1', 'video_2', 'play', '10:00:00', 0.0),
+    ('user_1', 'user_1_sess_1_1', 'video_2', 'watch_time', '10:00:05', 40.0),
+    ('user_1', 'user_1_sess_1_1', 'video_3', 'watch_time', '10:00:06', 40.0),
+    ('user_1', 'user_1_sess_1_1', 'video_4', 'watch_time', '10:00:07', 60.0),
+    ('user_2', 'user_2_sess_1_1', 'video_1', 'watch_time', '11:00:00', 30.0),
+]
+VIDEOS = [('video_1', 'action'), ('video_2', 'drama'), ('video_3', 'comedy')]
+
+
+def write_raw(store: LocalObjectStore) -> None:
+    base = store.root / f"raw/ingestion_date={INGESTION_DATE}"
+    base.mkdir(parents=True, exist_ok=True)
+    (base / f"users_{INGESTION_DATE}.csv").write_text(
+        "user_id,signup_date,subscription_tier,age_group,gender\n"
+        "user_1,2025-01-01,free,18-24,F\nuser_2,2025-01-01,free,18-24,M\n"
+    )
+    (base / f"videos_{INGESTION_DATE}.csv").write_text(
+        "video_id,title,genre,duration_seconds,patent_id\n"
+        + "".join(f"{video_id},Title,{genre},60,p1\n" for video_id, genre in VIDEOS)
+    )
+    (base / f"devices_{INGESTION_DATE}.csv").write_text("device,os,model,os_version\nphone,ios,x,17.1\n")
+    (base / f"events_{INGESTION_DATE}.jsonl").write_text("".join(
+        json.dumps({
+            'timestamp': f"{INGESTION_DATE}T{time}", 'account_id': 'a1', 'video_id': video_id,
+            'user_id': user_id, 'event_name': event_name, 'value': value, 'device': 'phone',
+            'app_version': session_id[-1], 'device_os': 'ios', 'network_type': 'wifi', 'ip': '10.0.0.1',
+            'country': 'BR', 'session_id': session_id
+        }) + "\n"
+        for user_id, session_id, video_id, event_name, time, value in EVENTS
+    ))
+
+
+@pytest.fixture(scope="module")
+def lake(tmp_path_factory):
+    store = LocalObjectStore(tmp_path_factory.mktemp("lake"))
+    write_raw(store)
+    processor = RawToTrustedProcessor(minio_client=store)
+    processor.set_args(Namespace(ingestion_date=INGESTION_DATE, enrich=False, engine='pandas', parse_workers=1))
+    result = processor.run()
+    assert result.is_success and not result.metadata['failed_loads']
+
+    lake = DataLakeManager(minio_client=store)
+    assert lake.setup_trusted_views()
+    return lake
+
+
+def test_metrics_and_cohorts_agree_on_ties(lake):
+    metrics = AnalysisMetrics(lake.duckdb)
+    metrics.materialize()
+    first_sessions = lake.duckdb.query_to_df(
+        "SELECT user_id, first_session_id, app_version FROM analysis_first_sessions ORDER BY user_id"
+    )
+    dominant = metrics.genre_retention(mode='dominant')
+
+    cohorts = CohortEngine(datalake=lake)
+    cohorts.update(INGESTION_DATE)
+    facts = cohorts.facts().sort_values('user_id')
+
+    assert first_sessions.values.tolist() == [['user_1', 'user_1_sess_1_1', '1'],
+                                              ['user_2', 'user_2_sess_1_1', '1']]
+    assert facts[['user_id', 'first_session_id', 'app_version']].values.tolist() == first_sessions.values.tolist()
+    assert facts['dominant_genre'].tolist() == ['comedy', 'action']
+    assert dict(zip(dominant['genre'], dominant['users'])) == {'action': 1, 'comedy': 1}
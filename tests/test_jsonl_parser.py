@@ -0,0 +1,41 @@
+"""Parallel JSONL parsing: ranges decoded apart give the same table as one in-process decode"""
+import io
+import json
+
+import pytest
+
+from src.utils.jsonl_parser import ParallelJsonlParser, decode_lines
+
+DICTIONARY_COLUMNS = ['event_name', 'value']
+
+
+def jsonl(records) -> bytes:
+    return "".join(json.dumps(record) + "\n" for record in records).encode()
+
+
+def parse_in_ranges(data: bytes, ranges: int = 2):
+    parser = ParallelJsonlParser(workers=ranges, min_parallel_bytes=0, range_bytes=len(data) // ranges,
+                                 dictionary_columns=DICTIONARY_COLUMNS)
+    assert len(list(parser.iter_tables(io.BytesIO(data), len(data)))) == ranges
+    return parser.read_table(io.BytesIO(data), len(data))
+
+
+@pytest.mark.parametrize("first, second", [
+    # Numbers in one range, text in the other
+    ({'value': 7, 'event_name': 'play'}, {'value': 'seven', 'event_name': 'play'}),
+    ({'value': 1.5, 'event_name': 'play'}, {'value': 'high', 'event_name': 3}),
+    ({'value': True, 'event_name': 'play'}, {'value': 2, 'event_name': 'pause'}),
+    # Promoted without falling back to text
+    ({'value': 7, 'event_name': 'play'}, {'value': 7.5, 'event_name': 'play'}),
+    ({'value': None, 'event_name': 'play'}, {'value': 7, 'session_id': 's1'}),
+])
+def test_mixed_type_ranges_match_a_single_range_decode(first, second):
+    records = [dict(first, user_id=f"user_{i}") for i in range(40)] + \
+              [dict(second, user_id=f"user_{i}") for i in range(40, 80)]
+    data = jsonl(records)
+
+    parallel = parse_in_ranges(data)
+    single = decode_lines(data, DICTIONARY_COLUMNS)
+
+    assert parallel.schema == single.schema
+    assert parallel.to_pylist() == single.to_pylist()
@@ -0,0 +1,124 @@
+"""RequestExecutor: retries, single attempts, hedged reads and per-operation timeouts"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.connect.request_policy import RequestExecutor, RequestFailed, RequestPolicy
+
+HEDGE_SAMPLES = 5
+
+
+class FlakyCall:
+    """Callable failing with a transient error for its first failures calls"""
+
+    def __init__(self, failures: int, error: Exception = None):
+        self.failures = failures
+        self.error = error or ConnectionError("connection reset")
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return b"data"
+
+
+class StallingHandler(BaseHTTPRequestHandler):
+    """Answers after ?stall=<seconds>"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(float(self.path.split("stall=")[1]))
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+
+@pytest.fixture
+def executor():
+    executor = RequestExecutor(RequestPolicy(max_attempts=3, backoff_base=0, hedge_percentile=50,
+                                             hedge_min_samples=HEDGE_SAMPLES, hedge_min_delay=0.01,
+                                             timeouts={'get': 0.2, 'head': 2.0}))
+    yield executor
+    executor.close()
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StallingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_transient_errors_are_retried_until_the_attempts_run_out(executor):
+    recovering = FlakyCall(failures=2)
+    assert executor.call('get', recovering) == b"data"
+    assert recovering.calls == 3
+
+    failing = FlakyCall(failures=10)
+    with pytest.raises(RequestFailed):
+        executor.call('get', failing)
+    assert failing.calls == 3
+    assert executor.counters['get']['retries'] == 4
+
+
+def test_permanent_errors_are_not_retried(executor):
+    failing = FlakyCall(failures=10, error=ValueError("bad request"))
+    with pytest.raises(ValueError):
+        executor.call('put', failing)
+    assert failing.calls == 1
+
+
+def test_retry_false_sends_one_attempt(executor):
+    failing = FlakyCall(failures=1)
+    with pytest.raises(RequestFailed):
+        executor.call('put', failing, retry=False)
+    assert failing.calls == 1
+    assert executor.counters['put']['retries'] == 0
+
+
+def test_slow_first_attempt_is_hedged_once_and_the_faster_result_wins(executor):
+    for _ in range(HEDGE_SAMPLES):
+        executor.call('get', lambda: b"warm", hedge=True)
+
+    release = threading.Event()
+    calls = []
+
+    def slow_first():
+        calls.append(threading.current_thread().name)
+        if len(calls) == 1:
+            release.wait(5)
+            return b"slow"
+        return b"fast"
+
+    try:
+        started = time.perf_counter()
+        assert executor.call('get', slow_first, hedge=True) == b"fast"
+        assert time.perf_counter() - started < 1
+    finally:
+        release.set()
+    assert len(calls) == 2
+    assert executor.counters['get']['hedges'] == 1
+    assert executor.counters['get']['hedge_wins'] == 1
+
+
+def test_per_operation_read_timeouts_are_enforced(executor, server):
+    pool = executor.http_client()
+
+    # 'get' allows 0.2s: a 1s stall times out on the single attempt
+    started = time.perf_counter()
+    with pytest.raises(RequestFailed):
+        executor.call('get', lambda: pool.request("GET", f"{server}/?stall=1").data, retry=False)
+    assert time.perf_counter() - started < 0.9
+
+    # 'head' allows 2s, so the same kind of stall completes
+    assert executor.call('head', lambda: pool.request("GET", f"{server}/?stall=0.5").data) == b"ok"
@@ -0,0 +1,91 @@
+"""to_trusted --dimension_mode scd2: only the history is written, readers see its current versions"""
+import json
+from argparse import Namespace
+
+import pytest
+
+from src.analytics.cohort import CohortEngine
+from src.connect.duckdb_client import DataLakeManager
+from src.connect.local_store import LocalObjectStore
+from src.core.raw_to_trusted_processor import RawToTrustedProcessor
+
+# ingestion_date -> ([(user_id, subscription_tier)], [(video_id, genre)])
+DAYS = {
+    '2025-09-09': ([('user_1', 'free'), ('user_2', 'free')], [('video_1', 'drama')]),
+    '2025-09-10': ([('user_1', 'premium'), ('user_2', 'free')], [('video_1', 'drama')]),
+    '2025-09-11': ([('user_1', 'premium')], [('video_1', 'comedy')]),
+}
+
+
+def write_raw(store: LocalObjectStore, ingestion_date: str, users, videos) -> None:
+    base = store.root / f"raw/ingestion_date={ingestion_date}"
+    base.mkdir(parents=True, exist_ok=True)
+    (base / f"users_{ingestion_date}.csv").write_text(
+        "user_id,signup_date,subscription_tier,age_group,gender\n"
+        + "\n".join(f"{user_id},2025-01-01,{tier},18-24,F" for user_id, tier in users) + "\n"
+    )
+    (base / f"videos_{ingestion_date}.csv").write_text(
+        "video_id,title,genre,duration_seconds,patent_id\n"
+        + "\n".join(f"{video_id},Title,{genre},60,p1" for video_id, genre in videos) + "\n"
+    )
+    (base / f"devices_{ingestion_date}.csv").write_text("device,os,model,os_version\nphone,ios,x,17.1\n")
+    (base / f"events_{ingestion_date}.jsonl").write_text("".join(
+        json.dumps({
+            'timestamp': f"{ingestion_date}T10:00:00", 'account_id': 'a1', 'video_id': 'video_1',
+            'user_id': user_id, 'event_name': 'play', 'value': 1.0, 'device': 'phone',
+            'app_version': '1.0', 'device_os': 'ios', 'network_type': 'wifi', 'ip': '10.0.0.1',
+            'country': 'BR', 'session_id': f"{user_id}_sess_1_1"
+        }) + "\n"
+        for user_id, _ in users
+    ))
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    store = LocalObjectStore(tmp_path_factory.mktemp("lake"))
+    for ingestion_date, (users, videos) in DAYS.items():
+        write_raw(store, ingestion_date, users, videos)
+        processor = RawToTrustedProcessor(minio_client=store)
+        processor.set_args(Namespace(ingestion_date=ingestion_date, dimension_mode='scd2', enrich=True,
+                                     engine='pandas', parse_workers=1))
+        result = processor.run()
+        assert result.is_success and not result.metadata['failed_loads']
+    return store
+
+
+@pytest.fixture
+def lake(store):
+    return DataLakeManager(minio_client=store)
+
+
+def test_only_the_history_is_written_and_committed(store, lake):
+    assert store.list_objects("trusted/users/") == []
+    manifest = lake.load_manifest('trusted_users_history')
+    assert sorted({entry['ingestion_date'] for entry in manifest.files.values()}) == list(DAYS)
+    assert lake.uses_scd2_history('trusted_users')
+
+
+def test_trusted_views_hold_the_current_versions(lake):
+    assert lake.setup_trusted_views('2025-09-10')
+    rows = lake.duckdb.query_to_df("SELECT user_id, subscription_tier FROM trusted_users ORDER BY user_id")
+    assert rows.values.tolist() == [['user_1', 'premium'], ['user_2', 'free']]
+
+    assert lake.setup_trusted_views()
+    rows = lake.duckdb.query_to_df("SELECT user_id, subscription_tier FROM trusted_users ORDER BY user_id")
+    assert rows.values.tolist() == [['user_1', 'premium']]
+
+
+def test_enrichment_and_cohorts_read_the_current_dimension(lake):
+    assert lake.setup_trusted_views()
+    rows = lake.duckdb.query_to_df("""
+        SELECT ingestion_date, user_id, subscription_tier, genre
+        FROM trusted_events_enriched ORDER BY ingestion_date, user_id
+    """)
+    assert rows.values.tolist() == [
+        ['2025-09-09', 'user_1', 'free', 'drama'],
+        ['2025-09-09', 'user_2', 'free', 'drama'],
+        ['2025-09-10', 'user_1', 'premium', 'drama'],
+        ['2025-09-10', 'user_2', 'free', 'drama'],
+        ['2025-09-11', 'user_1', 'premium', 'comedy'],
+    ]
+    assert CohortEngine(datalake=lake).genre_lookup() == {'video_1': 'comedy'}
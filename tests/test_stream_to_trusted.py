@@ -0,0 +1,157 @@
+"""Stream processor on a local object store: batches, restarts, pinned partitions and skipped files"""
+import json
+import os
+from argparse import Namespace
+from datetime import datetime
+
+import pyarrow.parquet as pq
+import pytest
+
+import src.core.stream_to_trusted_processor as stream_module
+from src.connect.local_store import LocalObjectStore
+from src.core.stream_to_trusted_processor import StreamToTrustedProcessor
+
+# Landing objects get mtimes one second apart from here, so their order is fixed
+BASE_MTIME = 1_757_400_000
+
+
+class StreamHarness:
+    """Lands event files and runs stream processors against one local store"""
+
+    def __init__(self, store: LocalObjectStore):
+        self.store = store
+        self.landed = 0
+
+    def land(self, rows: int = 0, text: str = None) -> str:
+        """Land an events file of rows events (or of raw text); returns its object name"""
+        self.landed += 1
+        object_name = f"landing/events_{self.landed:03d}.jsonl"
+        if text is None:
+            text = "".join(json.dumps({
+                'timestamp': '2025-09-09T10:00:00', 'user_id': f"user_{self.landed}",
+                'session_id': f"user_{self.landed}_sess_1_{i}", 'video_id': 'video_1',
+                'event_name': 'play', 'value': float(i)
+            }) + "\n" for i in range(rows))
+        path = self.store.root / object_name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+        os.utime(path, (BASE_MTIME + self.landed, BASE_MTIME + self.landed))
+        return object_name
+
+    def run(self, **args) -> StreamToTrustedProcessor:
+        """Run a new processor until no landing file is left (or max_batches)"""
+        processor = StreamToTrustedProcessor(minio_client=self.store)
+        processor.set_args(Namespace(**{'ingestion_date': None, 'poll_interval': 0, 'max_batch_files': 2,
+                                        'idle_timeout': 0, 'max_batches': None, **args}))
+        processor.run()
+        return processor
+
+    def checkpoint(self) -> dict:
+        return json.loads(self.store.read_bytes("trusted/_stream/events/checkpoint.json"))
+
+    def trusted_files(self) -> list:
+        return self.store.list_objects("trusted/events/")
+
+    def trusted_user_ids(self) -> list:
+        return sorted(user_id for name in self.trusted_files()
+                      for user_id in pq.read_table(self.store.root / name).column('user_id').to_pylist())
+
+
+@pytest.fixture
+def stream(tmp_path):
+    return StreamHarness(LocalObjectStore(tmp_path / "lake"))
+
+
+@pytest.fixture
+def utc_date(monkeypatch):
+    """Date the stream processor sees as today (UTC)"""
+    today = ['2025-09-09']
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromisoformat(f"{today[0]}T23:59:59").replace(tzinfo=tz)
+
+    monkeypatch.setattr(stream_module, 'datetime', FrozenDatetime)
+    return today
+
+
+def crash_before_commit(monkeypatch, batch_id: int) -> None:
+    """Kill the stream once batch_id is written, just before its offset is committed"""
+    write_checkpoint = StreamToTrustedProcessor._write_checkpoint
+
+    def crashing(self, checkpoint):
+        if checkpoint['batch_id'] == batch_id and 'committed_at' in checkpoint:
+            monkeypatch.setattr(StreamToTrustedProcessor, '_write_checkpoint', write_checkpoint)
+            raise KeyboardInterrupt
+        write_checkpoint(self, checkpoint)
+
+    monkeypatch.setattr(StreamToTrustedProcessor, '_write_checkpoint', crashing)
+
+
+def test_batches_skip_a_malformed_file(stream, utc_date):
+    stream.land(rows=3)
+    malformed = stream.land(text='{"user_id": "user_2", "timestamp": \n')
+    stream.land(rows=2)
+    stream.land(rows=1)
+    stream.land(rows=4)
+
+    processor = stream.run()
+
+    checkpoint = stream.checkpoint()
+    assert checkpoint['batch_id'] == 3
+    assert [entry['object'] for entry in checkpoint['failed']] == [malformed]
+    assert checkpoint['failed_total'] == 1
+    assert stream.trusted_files() == [f"trusted/events/ingestion_date=2025-09-09/part-stream-{batch_id:08d}.parquet"
+                                      for batch_id in (1, 2, 3)]
+    assert stream.trusted_user_ids() == ['user_1'] * 3 + ['user_3'] * 2 + ['user_4'] + ['user_5'] * 4
+    assert processor.metrics.rows == 10
+
+
+def test_restart_resumes_from_the_checkpoint(stream, utc_date):
+    for _ in range(3):
+        stream.land(rows=2)
+    stream.run(max_batches=1)
+    assert stream.checkpoint()['batch_id'] == 1
+
+    stream.land(rows=2)
+    stream.run()
+
+    assert stream.checkpoint()['batch_id'] == 2
+    assert [name.rsplit('/', 1)[1] for name in stream.trusted_files()] == [
+        'part-stream-00000001.parquet', 'part-stream-00000002.parquet'
+    ]
+    assert stream.trusted_user_ids() == sorted(f"user_{i}" for i in range(1, 5) for _ in range(2))
+
+
+def test_retried_batch_keeps_its_pinned_partition(stream, utc_date, monkeypatch):
+    stream.land(rows=2)
+    stream.land(rows=1)
+    crash_before_commit(monkeypatch, batch_id=1)
+    stream.run()
+    # Written but not committed: the restart must rewrite it, not add a second copy
+    assert stream.checkpoint()['pending'] == {'batch_id': 1, 'ingestion_date': '2025-09-09'}
+    assert len(stream.trusted_files()) == 1
+
+    utc_date[0] = '2025-09-10'
+    stream.land(rows=3)
+    stream.run()
+
+    assert stream.trusted_files() == [
+        "trusted/events/ingestion_date=2025-09-09/part-stream-00000001.parquet",
+        "trusted/events/ingestion_date=2025-09-10/part-stream-00000002.parquet",
+    ]
+    assert stream.trusted_user_ids() == ['user_1'] * 2 + ['user_2'] + ['user_3'] * 3
+
+
+def test_failed_list_is_capped(stream, utc_date, monkeypatch):
+    monkeypatch.setattr(stream_module, 'MAX_FAILED_OBJECTS', 3)
+    malformed = [stream.land(text="not json\n") for _ in range(5)]
+    stream.land(rows=1)
+
+    stream.run(max_batch_files=4)
+
+    checkpoint = stream.checkpoint()
+    assert [entry['object'] for entry in checkpoint['failed']] == malformed[-3:]
+    assert checkpoint['failed_total'] == 5
+    assert stream.trusted_user_ids() == ['user_6']
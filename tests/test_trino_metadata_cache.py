@@ -0,0 +1,130 @@
+"""Trino metadata cache: catalog lookups go through information_schema once per TTL window"""
+import pytest
+
+import src.connect.trino_client as trino_client
+from src.connect.trino_client import TrinoClient
+
+TTL_SECONDS = 300
+
+
+class FakeCursor:
+    """DB-API cursor answering information_schema queries from the connection's catalog"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def execute(self, query, params=None):
+        self.conn.statements.append((" ".join(query.split()), params))
+        if "information_schema.columns" in query:
+            schema, names = params[0], params[1:]
+            self.rows = [
+                (table, *column)
+                for (table_schema, table), columns in sorted(self.conn.catalog.items())
+                if table_schema == schema and table in names
+                for column in columns
+            ]
+        elif "information_schema.tables" in query:
+            self.rows = [(table,) for table_schema, table in sorted(self.conn.catalog) if table_schema == params[0]]
+        else:
+            self.rows = []
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    """DB-API connection that records every statement it runs"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        pass
+
+    def information_schema_queries(self):
+        return [query for query, _ in self.statements if "information_schema" in query]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the cache's expiry checks"""
+    now = [1000.0]
+    monkeypatch.setattr(trino_client.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection({
+        ("default", "raw_users"): [("user_id", "varchar", "YES"), ("signup_date", "varchar", "YES")],
+        ("default", "raw_events"): [("timestamp", "timestamp(3)", "YES"), ("user_id", "varchar", "YES")],
+        ("default", "raw_videos"): [("video_id", "varchar", "YES")],
+    })
+
+
+@pytest.fixture
+def client(conn):
+    return TrinoClient(connection=conn, metadata_ttl_seconds=TTL_SECONDS)
+
+
+def test_describe_tables_fetches_all_tables_in_one_query(client, conn):
+    described = client.describe_tables(["raw_users", "raw_events", "default.raw_videos", "raw_missing"])
+
+    assert described == {
+        "raw_users": [
+            {"column": "user_id", "type": "varchar", "nullable": "YES"},
+            {"column": "signup_date", "type": "varchar", "nullable": "YES"},
+        ],
+        "raw_events": [
+            {"column": "timestamp", "type": "timestamp(3)", "nullable": "YES"},
+            {"column": "user_id", "type": "varchar", "nullable": "YES"},
+        ],
+        "default.raw_videos": [{"column": "video_id", "type": "varchar", "nullable": "YES"}],
+        "raw_missing": [],
+    }
+    assert len(conn.statements) == 1
+    assert conn.statements[0][1] == ["default", "raw_users", "raw_events", "raw_videos", "raw_missing"]
+
+
+def test_lookups_hit_information_schema_once_per_ttl_window(client, conn, clock):
+    client.describe_tables(["raw_users", "raw_events", "raw_missing"])
+    for _ in range(3):
+        assert client.table_exists("raw_users")
+        assert not client.table_exists("raw_missing")
+        assert client.get_table_schema("default.raw_events")[1]["column"] == "user_id"
+    assert len(conn.information_schema_queries()) == 1
+
+    clock[0] += TTL_SECONDS - 1
+    assert client.table_exists("raw_events")
+    assert len(conn.information_schema_queries()) == 1
+
+    clock[0] += 1
+    assert client.table_exists("raw_events")
+    assert len(conn.information_schema_queries()) == 2
+
+
+def test_list_tables_is_cached_per_ttl_window(client, conn, clock):
+    assert client.list_tables() == ["raw_events", "raw_users", "raw_videos"]
+    assert client.list_tables() == ["raw_events", "raw_users", "raw_videos"]
+    assert len(conn.information_schema_queries()) == 1
+
+    clock[0] += TTL_SECONDS
+    client.list_tables()
+    assert len(conn.information_schema_queries()) == 2
+
+
+def test_ddl_drops_cached_metadata(client, conn):
+    assert not client.table_exists("raw_devices")
+    client.list_tables()
+
+    conn.catalog[("default", "raw_devices")] = [("device", "varchar", "YES")]
+    client.execute_query("CREATE TABLE IF NOT EXISTS raw_devices (device VARCHAR)")
+
+    assert client.table_exists("raw_devices")
+    assert "raw_devices" in client.list_tables()
+    assert len(conn.information_schema_queries()) == 4
@@ -0,0 +1,89 @@
+"""Zone map updates on the local object store: concurrent updates must not lose each other"""
+import threading
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from src.connect.duckdb_client import DataLakeManager
+from src.connect.local_store import LocalObjectStore
+
+TABLE = 'trusted_events'
+DATES = ['2025-09-09', '2025-09-10', '2025-09-11', '2025-09-12']
+
+
+def write_partition(store: LocalObjectStore, ingestion_date: str) -> str:
+    """One small events file in the partition; returns its object name"""
+    object_name = f"trusted/events/ingestion_date={ingestion_date}/part-test.parquet"
+    path = store.root / object_name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pq.write_table(pa.table({
+        'timestamp': pa.array([datetime(2025, 9, 9, 10), datetime(2025, 9, 9, 11)], pa.timestamp('us')),
+        'user_id': [f"user_{ingestion_date}_a", f"user_{ingestion_date}_b"],
+        'session_id': ['s1', 's2'],
+        'video_id': ['v1', 'v2'],
+    }), path)
+    return object_name
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalObjectStore(tmp_path / "lake")
+    for ingestion_date in DATES:
+        write_partition(store, ingestion_date)
+    return store
+
+
+def indexed_dates(lake: DataLakeManager):
+    zone_map = lake.load_zone_map(TABLE)
+    return sorted({name.split('ingestion_date=')[1].split('/')[0] for name in zone_map.files})
+
+
+def test_update_interleaved_with_another_writer_keeps_both(store):
+    writer, other = DataLakeManager(minio_client=store), DataLakeManager(minio_client=store)
+    assert writer.update_zone_map(TABLE, DATES[0])
+
+    # The other backfill commits its zone map between this writer's read and write
+    read_bytes = store.read_bytes
+    raced = []
+
+    def read_then_race(object_name):
+        data = read_bytes(object_name)
+        if not raced:
+            raced.append(object_name)
+            assert other.update_zone_map(TABLE, DATES[2])
+        return data
+
+    store.read_bytes = read_then_race
+    assert writer.update_zone_map(TABLE, DATES[1])
+    store.read_bytes = read_bytes
+
+    assert raced
+    assert indexed_dates(writer) == DATES[:3]
+
+
+def test_concurrent_backfills_all_end_up_in_the_zone_map(store):
+    lakes = [DataLakeManager(minio_client=store) for _ in DATES]
+    results = {}
+
+    def backfill(lake, ingestion_date):
+        results[ingestion_date] = lake.update_zone_map(TABLE, ingestion_date)
+
+    threads = [threading.Thread(target=backfill, args=pair) for pair in zip(lakes, DATES)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {ingestion_date: True for ingestion_date in DATES}
+    assert indexed_dates(lakes[0]) == DATES
+
+
+def test_replace_object_rejects_a_stale_etag(store):
+    assert store.create_object(b'v1', 'trusted/_index/test.json')
+    etag = store.stat_object('trusted/_index/test.json')['etag']
+    assert not store.create_object(b'v2', 'trusted/_index/test.json')
+    assert store.replace_object(b'v2', 'trusted/_index/test.json', etag)
+    assert not store.replace_object(b'v3', 'trusted/_index/test.json', etag)
+    assert store.read_bytes('trusted/_index/test.json') == b'v2'